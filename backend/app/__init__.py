@@ -13,17 +13,62 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    if app.config['TRUSTED_PROXY_COUNT']:
+        # Client address and scheme from the reverse proxy, e.g. for the per-IP login limit
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     CORS(app)
 
+    from .utils.database import configure_database
+    configure_database(app)
+
+    from .utils.instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    from .utils.pubsub import init_pubsub
+    from .utils.user_cache import init_user_cache
+    from .utils.passwords import init_passwords
+    from .utils.settings_cache import init_settings_cache
+    from .utils.suppression import init_suppressions
+    init_pubsub(app)
+    init_user_cache(app, jwt)
+    init_passwords(app)
+    init_settings_cache(app)
+    init_suppressions(app)
+
     # Register blueprints
-    from .routes import auth, leads, notifications, settings
+    from .routes import auth, leads, notifications, settings, outbox, campaigns, analytics, suppressions
     app.register_blueprint(auth.bp)
     app.register_blueprint(leads.bp)
     app.register_blueprint(notifications.bp)
     app.register_blueprint(settings.bp)
+    app.register_blueprint(outbox.bp)
+    app.register_blueprint(campaigns.bp)
+    app.register_blueprint(analytics.bp)
+    app.register_blueprint(suppressions.bp)
+
+    # Register CLI commands
+    from .utils.search import search_cli
+    from .utils.follow_ups import follow_ups_cli
+    from .utils.email_outbox import outbox_cli
+    from .utils.analytics import analytics_cli
+    from .utils.reply_sync import replies_cli
+    from .utils.delta_sync import sync_cli
+    from .utils.lead_dedup import dedup_cli
+    from .utils.suppression import suppressions_cli
+    app.cli.add_command(search_cli)
+    app.cli.add_command(follow_ups_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(replies_cli)
+    app.cli.add_command(sync_cli)
+    app.cli.add_command(dedup_cli)
+    app.cli.add_command(suppressions_cli)
 
     return app 
\ No newline at end of file
@@ -0,0 +1,36 @@
+from .. import db
+
+class Metric:
+    EMAIL_SENT = 'email_sent'
+    REPLY_RECEIVED = 'reply_received'
+    LEAD_CONTACTED = 'lead_contacted'  # first logged email with a lead
+
+    @staticmethod
+    def reply(response_type):
+        return f'reply_{response_type}'
+
+    @staticmethod
+    def status(status):
+        return f'status_{status}'  # a lead moved into this status
+
+# Per day, per user counters maintained incrementally by app.utils.analytics
+class DailyStat(db.Model):
+    __tablename__ = 'analytics_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'metric', name='uq_analytics_daily_stats_day_user_metric'),
+        db.Index('ix_analytics_daily_stats_metric_day', 'metric', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    metric = db.Column(db.String(40), nullable=False)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'user_id': self.user_id,
+            'metric': self.metric,
+            'value': self.value
+        }
@@ -0,0 +1,47 @@
+import json
+from datetime import datetime
+from .. import db
+
+class CampaignStatus:
+    QUEUED = 'queued'  # recipients are still being added to the outbox by the workers
+    SENDING = 'sending'
+    PAUSED = 'paused'
+    COMPLETED = 'completed'
+
+class Campaign(db.Model):
+    __tablename__ = 'campaigns'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    subject_template = db.Column(db.String(200), nullable=False)
+    body_template = db.Column(db.Text, nullable=False)
+    filters = db.Column(db.Text)  # JSON: the get_leads filters or lead_ids used to select recipients
+    status = db.Column(db.String(20), nullable=False, default=CampaignStatus.QUEUED)
+    scheduled_follow_up = db.Column(db.DateTime)  # set on each lead the campaign email is delivered to
+    total_recipients = db.Column(db.Integer, nullable=False, default=0)
+    skipped_recipients = db.Column(db.Integer, nullable=False, default=0)
+    # Recipients are queued in lead id order; the last lead queued and when the last batch was
+    enqueued_through = db.Column(db.Integer, nullable=False, default=0)
+    enqueued_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self, progress=None):
+        result = {
+            'id': self.id,
+            'name': self.name,
+            'created_by': self.created_by,
+            'subject_template': self.subject_template,
+            'body_template': self.body_template,
+            'filters': json.loads(self.filters) if self.filters else {},
+            'status': self.status,
+            'total_recipients': self.total_recipients,
+            'skipped_recipients': self.skipped_recipients,
+            'enqueued_at': self.enqueued_at.isoformat() if self.enqueued_at else None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+        if progress is not None:
+            result['progress'] = progress
+        return result
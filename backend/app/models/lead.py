@@ -1,6 +1,7 @@
 from .. import db
 from datetime import datetime
 from enum import Enum
+from .sync import next_change_version
 
 class LeadStatus(str, Enum):
     NEW = 'new'
@@ -17,8 +18,31 @@ class ResponseType(str, Enum):
     FOLLOW_UP_REQUESTED = 'follow_up_requested'
     NO_RESPONSE = 'no_response'
 
+# Who set an email's response_type; only manual labels are used for training
+class ResponseTypeSource:
+    MANUAL = 'manual'
+    RULE = 'rule'
+    MODEL = 'model'
+
 class Lead(db.Model):
     __tablename__ = 'leads'
+    __table_args__ = (
+        # Lead list: newest-first keyset pages, optionally per owner and status
+        db.Index('ix_leads_created_at_id', 'created_at', 'id'),
+        db.Index('ix_leads_assigned_to_created_at_id', 'assigned_to', 'created_at', 'id'),
+        db.Index('ix_leads_status_created_at_id', 'status', 'created_at', 'id'),
+        db.Index('ix_leads_assigned_to_status_created_at', 'assigned_to', 'status', 'created_at'),
+        # Follow-up checks
+        db.Index('ix_leads_assigned_to_next_follow_up', 'assigned_to', 'next_follow_up'),
+        db.Index('ix_leads_next_follow_up', 'next_follow_up'),
+        # Duplicate checks on import
+        db.Index('ix_leads_email', 'email'),
+        # Matching inbound replies to leads by sender address
+        db.Index('ix_leads_email_lower', db.text('lower(email)')),
+        # Delta sync: rows changed since a client's version
+        db.Index('ix_leads_change_version', 'change_version'),
+        db.Index('ix_leads_assigned_to_change_version', 'assigned_to', 'change_version'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -32,6 +56,7 @@ class Lead(db.Model):
     last_contact_date = db.Column(db.DateTime)
     next_follow_up = db.Column(db.DateTime)
     calendly_link = db.Column(db.String(255))
+    change_version = db.Column(db.BigInteger, nullable=False, default=next_change_version, onupdate=next_change_version)
 
     # Relationships
     activities = db.relationship('Activity', backref='lead', lazy=True)
@@ -54,8 +79,24 @@ class Lead(db.Model):
             'calendly_link': self.calendly_link
         }
 
+# Blocking keys (normalized email, domain + name, company + name) that the
+# duplicate checks and `flask dedup` look leads up by; see app.utils.lead_dedup
+class LeadMatchKey(db.Model):
+    __tablename__ = 'lead_match_keys'
+    __table_args__ = (
+        db.Index('ix_lead_match_keys_key_lead_id', 'key', 'lead_id'),
+        db.Index('ix_lead_match_keys_lead_id', 'lead_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+
 class Activity(db.Model):
     __tablename__ = 'activities'
+    __table_args__ = (
+        db.Index('ix_activities_lead_id_created_at', 'lead_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False)
@@ -76,6 +117,10 @@ class Activity(db.Model):
 
 class Note(db.Model):
     __tablename__ = 'notes'
+    __table_args__ = (
+        db.Index('ix_notes_lead_id_created_at', 'lead_id', 'created_at'),
+        db.Index('ix_notes_change_version', 'change_version'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False)
@@ -83,6 +128,7 @@ class Note(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    change_version = db.Column(db.BigInteger, nullable=False, default=next_change_version, onupdate=next_change_version)
 
     def to_dict(self):
         return {
@@ -96,6 +142,12 @@ class Note(db.Model):
 
 class EmailLog(db.Model):
     __tablename__ = 'email_logs'
+    __table_args__ = (
+        db.Index('ix_email_logs_lead_id_sent_at', 'lead_id', 'sent_at'),
+        # Replies synced from Gmail are ingested at most once
+        db.Index('ix_email_logs_gmail_message_id', 'gmail_message_id', unique=True),
+        db.Index('ix_email_logs_change_version', 'change_version'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=False)
@@ -104,8 +156,11 @@ class EmailLog(db.Model):
     subject = db.Column(db.String(200))
     content = db.Column(db.Text)
     response_type = db.Column(db.String(20))  # from ResponseType enum
+    response_type_source = db.Column(db.String(10))  # from ResponseTypeSource
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
     scheduled_follow_up = db.Column(db.DateTime)
+    gmail_message_id = db.Column(db.String(100))  # set for replies synced from the mailbox
+    change_version = db.Column(db.BigInteger, nullable=False, default=next_change_version, onupdate=next_change_version)
 
     def to_dict(self):
         return {
@@ -116,6 +171,7 @@ class EmailLog(db.Model):
             'subject': self.subject,
             'content': self.content,
             'response_type': self.response_type,
+            'response_type_source': self.response_type_source,
             'sent_at': self.sent_at.isoformat(),
             'scheduled_follow_up': self.scheduled_follow_up.isoformat() if self.scheduled_follow_up else None
         } 
\ No newline at end of file
@@ -0,0 +1,20 @@
+from datetime import datetime
+from .. import db
+
+# Gmail history checkpoint per synced mailbox; replies are pulled from here onwards
+class MailboxSyncState(db.Model):
+    __tablename__ = 'mailbox_sync_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    address = db.Column(db.String(120), unique=True, nullable=False)
+    history_id = db.Column(db.String(30), nullable=False)
+    last_synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    messages_ingested = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'address': self.address,
+            'history_id': self.history_id,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+            'messages_ingested': self.messages_ingested
+        }
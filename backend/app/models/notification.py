@@ -14,6 +14,14 @@ class NotificationStatus:
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # Notification list: per user and status, newest first
+        db.Index('ix_notifications_user_id_status_created_at', 'user_id', 'status', 'created_at'),
+        # Follow-up de-duplication
+        db.Index('ix_notifications_lead_id_type_scheduled_for', 'lead_id', 'type', 'scheduled_for'),
+        # Follow-ups starting soon whose owner has not been emailed a reminder
+        db.Index('ix_notifications_type_scheduled_for', 'type', 'scheduled_for'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -24,6 +32,7 @@ class Notification(db.Model):
     status = db.Column(db.String(20), default=NotificationStatus.UNREAD)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     scheduled_for = db.Column(db.DateTime, nullable=True)
+    reminder_queued_at = db.Column(db.DateTime, nullable=True)  # follow-ups: when the reminder email was queued
     
     # Relationships
     user = db.relationship('User', backref='notifications')
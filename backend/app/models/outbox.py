@@ -0,0 +1,65 @@
+from datetime import datetime
+from .. import db
+
+class OutboxStatus:
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    HELD = 'held'  # paused campaign; not picked up by workers
+    SUPPRESSED = 'suppressed'  # recipient on the suppression list or lead lost/not interested; never sent
+
+class OutboxKind:
+    LEAD_EMAIL = 'lead_email'
+    REMINDER = 'reminder'
+    CAMPAIGN = 'campaign'
+
+class OutboundEmail(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # Worker claim query: due queued messages, oldest first
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_claimed_by', 'claimed_by'),
+        db.Index('ix_email_outbox_campaign_id_status', 'campaign_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False, default=OutboxKind.LEAD_EMAIL)
+    lead_id = db.Column(db.Integer, db.ForeignKey('leads.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    campaign_id = db.Column(db.Integer, db.ForeignKey('campaigns.id'), nullable=True)
+    to_address = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    response_type = db.Column(db.String(20))
+    scheduled_follow_up = db.Column(db.DateTime)
+    status = db.Column(db.String(20), nullable=False, default=OutboxStatus.QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(36))
+    last_error = db.Column(db.Text)
+    suppression_reason = db.Column(db.String(20))
+    gmail_message_id = db.Column(db.String(100))
+    email_log_id = db.Column(db.Integer, db.ForeignKey('email_logs.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'lead_id': self.lead_id,
+            'user_id': self.user_id,
+            'campaign_id': self.campaign_id,
+            'to_address': self.to_address,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'suppression_reason': self.suppression_reason,
+            'gmail_message_id': self.gmail_message_id,
+            'email_log_id': self.email_log_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -19,6 +19,13 @@ class Settings(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+# Single row bumped on every settings write; processes compare it to reload their cache
+class SettingsVersion(db.Model):
+    __tablename__ = 'settings_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class SettingsKeys:
     GLOBAL_EMAIL = 'global_email'
     GLOBAL_EMAIL_NAME = 'global_email_name' 
\ No newline at end of file
@@ -0,0 +1,58 @@
+from datetime import datetime
+from .. import db
+
+class SuppressionReason:
+    BOUNCED = 'bounced'
+    UNSUBSCRIBED = 'unsubscribed'
+    COMPLAINED = 'complained'
+    MANUAL = 'manual'
+
+SUPPRESSION_REASONS = {
+    SuppressionReason.BOUNCED, SuppressionReason.UNSUBSCRIBED, SuppressionReason.COMPLAINED, SuppressionReason.MANUAL
+}
+
+class SuppressionKind:
+    ADDRESS = 'address'
+    DOMAIN = 'domain'
+
+# An address (normalized like lead_dedup.normalize_email) or a whole domain
+# that outbound email must not be sent to
+class Suppression(db.Model):
+    __tablename__ = 'suppressions'
+    __table_args__ = (
+        # Processes catch their Bloom filters up with version > the last one they saw
+        db.Index('ix_suppressions_version', 'version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(255), unique=True, nullable=False)
+    kind = db.Column(db.String(10), nullable=False, default=SuppressionKind.ADDRESS)
+    reason = db.Column(db.String(20), nullable=False, default=SuppressionReason.MANUAL)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'value': self.value,
+            'kind': self.kind,
+            'reason': self.reason,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+# Single row: version is bumped by every write (its row lock orders writers, so
+# a process that has seen version N has seen every entry up to N), generation
+# by removals, which Bloom filters cannot apply incrementally. filter holds the
+# serialized filter for filter_generation, complete up to filter_version.
+class SuppressionState(db.Model):
+    __tablename__ = 'suppression_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    filter = db.Column(db.LargeBinary)
+    filter_generation = db.Column(db.Integer)
+    filter_version = db.Column(db.Integer)
+    filter_built_at = db.Column(db.DateTime)
@@ -0,0 +1,77 @@
+from datetime import datetime
+from sqlalchemy import select, update, insert, text
+from .. import db
+
+class SyncEntity:
+    LEAD = 'lead'
+    NOTE = 'note'
+    EMAIL = 'email'
+
+# Single row holding where tombstones were pruned to and, on databases other
+# than PostgreSQL, the last change version handed out.
+class SyncVersion(db.Model):
+    __tablename__ = 'sync_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    pruned_through = db.Column(db.BigInteger, nullable=False, default=0)  # tombstones up to here were deleted
+
+def next_change_version(context):
+    """Column default/onupdate for change_version: one new version per transaction
+
+    Every row written by a transaction, through the ORM or Core, gets the
+    same version. On PostgreSQL that is the writer's transaction id, which
+    takes no lock, so writers do not wait for each other; versions are not
+    committed in order, and readers only trust them up to
+    settled_change_version(). Elsewhere the sync_version row is bumped,
+    which is no extra contention on SQLite's single writer.
+    """
+    connection = context.connection
+    transaction = connection.get_transaction()
+    cached = connection.info.get('change_version')
+    if cached and cached[0] is transaction:
+        return cached[1]
+    if connection.dialect.name == 'postgresql':
+        version = connection.execute(text('SELECT pg_current_xact_id()::text::bigint')).scalar()
+        connection.info['change_version'] = (transaction, version)
+        return version
+    table = SyncVersion.__table__
+    version = connection.execute(
+        update(table).where(table.c.id == 1).values(version=table.c.version + 1).returning(table.c.version)
+    ).scalar()
+    if version is None:
+        # Fresh database created without migrations
+        version = 1
+        connection.execute(insert(table).values(id=1, version=version, pruned_through=0))
+    connection.info['change_version'] = (transaction, version)
+    return version
+
+def settled_change_version(connection):
+    """Highest change version no transaction can still commit rows with
+
+    On PostgreSQL this is just below the oldest transaction still running
+    (pg_snapshot_xmin): every version under it has committed or rolled back.
+    A long-running transaction holds it back, delaying but not losing
+    changes.
+    """
+    if connection.dialect.name == 'postgresql':
+        return connection.execute(text('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')).scalar() - 1
+    table = SyncVersion.__table__
+    return connection.execute(select(table.c.version).where(table.c.id == 1)).scalar() or 0
+
+# Deleted rows, and leads that left a user's view when reassigned
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_version', 'version'),
+        db.Index('ix_sync_tombstones_user_id_version', 'user_id', 'version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(10), nullable=False)  # from SyncEntity
+    entity_id = db.Column(db.Integer, nullable=False)
+    lead_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer)  # lead owner the row was visible to
+    moved = db.Column(db.Boolean, nullable=False, default=False)  # lead reassigned away from user_id, not deleted
+    version = db.Column(db.BigInteger, nullable=False, default=next_change_version)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,6 +1,5 @@
 from .. import db
 from datetime import datetime
-import bcrypt
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -15,6 +14,7 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
+    auth_version = db.Column(db.Integer, nullable=False, default=0)  # bumped to revoke issued tokens
 
     # Relationships
     assigned_leads = db.relationship('Lead', backref='assigned_user', lazy=True, 
@@ -24,11 +24,18 @@ class User(db.Model):
     emails = db.relationship('EmailLog', backref='user', lazy=True)
 
     def set_password(self, password):
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        from ..utils.passwords import get_password_hasher
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        """Verify password, upgrading the stored hash if BCRYPT_ROUNDS changed; the caller commits"""
+        from ..utils.passwords import get_password_hasher
+        hasher = get_password_hasher()
+        if not hasher.verify(password, self.password_hash):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+        return True
 
     def to_dict(self):
         return {
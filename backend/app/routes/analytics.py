@@ -0,0 +1,89 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from datetime import datetime, date, timedelta
+from sqlalchemy import select
+from ..models.user import User
+from .. import db
+from ..utils.analytics import metric_totals, pipeline_counts, summarize, timeseries, EMAIL_METRICS
+
+bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+DEFAULT_RANGE_DAYS = 30
+BUCKETS = ('day', 'week', 'month')
+
+def _parse_range(args):
+    """Return (start, end) dates from ?start_date=&end_date=, defaulting to the last 30 days"""
+    end = date.fromisoformat(args['end_date'][:10]) if args.get('end_date') else datetime.utcnow().date()
+    start = date.fromisoformat(args['start_date'][:10]) if args.get('start_date') else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise ValueError('start_date must not be after end_date')
+    return start, end
+
+def _scoped_user_id(args):
+    """Admins may look at anyone (or everyone); other users only see themselves"""
+    if not current_user.role == 'admin':
+        return current_user.id
+    user_id = args.get('user_id')
+    return int(user_id) if user_id else None
+
+@bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_summary():
+    """Pipeline and outreach metrics for a date range"""
+    try:
+        start, end = _parse_range(request.args)
+        user_id = _scoped_user_id(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date range or user_id'}), 400
+
+    summary = summarize(metric_totals(start, end, user_id), pipeline_counts(user_id))
+    return jsonify({'start_date': start.isoformat(), 'end_date': end.isoformat(), 'user_id': user_id, **summary})
+
+@bp.route('/timeseries', methods=['GET'])
+@jwt_required()
+def get_timeseries():
+    """Metric values per day, week or month"""
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'bucket must be one of {", ".join(BUCKETS)}'}), 400
+
+    try:
+        start, end = _parse_range(request.args)
+        user_id = _scoped_user_id(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date range or user_id'}), 400
+
+    metrics = [metric.strip() for metric in request.args.get('metrics', '').split(',') if metric.strip()]
+    metrics = metrics or EMAIL_METRICS[:3]
+    return jsonify({
+        'bucket': bucket,
+        'metrics': metrics,
+        'series': timeseries(metrics, start, end, bucket, user_id)
+    })
+
+@bp.route('/team', methods=['GET'])
+@jwt_required()
+def get_team():
+    """Per-member metrics for a date range (admins see the whole team)"""
+    try:
+        start, end = _parse_range(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date range'}), 400
+
+    user_id = None if current_user.role == 'admin' else current_user.id
+    totals = metric_totals(start, end, user_id, group_by_user=True)
+    pipelines = pipeline_counts(user_id, group_by_user=True)
+
+    query = select(User.id, User.first_name, User.last_name, User.email).where(User.is_active.is_(True))
+    if user_id is not None:
+        query = query.where(User.id == user_id)
+
+    members = [{
+        'user_id': member.id,
+        'name': f'{member.first_name} {member.last_name}',
+        'email': member.email,
+        **summarize(totals.get(member.id, {}), pipelines.get(member.id, {}))
+    } for member in db.session.execute(query)]
+    members.sort(key=lambda member: member['emails_sent'], reverse=True)
+
+    return jsonify({'start_date': start.isoformat(), 'end_date': end.isoformat(), 'members': members})
@@ -1,8 +1,10 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import create_access_token, jwt_required, current_user
 from datetime import datetime
 from ..models.user import User
 from .. import db
+from ..utils.user_cache import get_user_cache, token_claims
+from ..utils.passwords import PasswordHasherBusy
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -13,10 +15,26 @@ def login():
     if not data or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Missing email or password'}), 400
     
+    limiters = current_app.extensions['login_limiters']
+    keys = {'email': data['email'].strip().lower(), 'ip': request.remote_addr}
+    retry_after = max(limiters[kind].retry_after(key) for kind, key in keys.items())
+    if retry_after:
+        response = jsonify({'error': 'Too many login attempts, please try again later'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not user.check_password(data['password']):
+    try:
+        valid = user is not None and user.check_password(data['password'])
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
+    if not valid:
+        # Only failures count, so a busy office behind one address is not locked out
+        for kind, key in keys.items():
+            limiters[kind].hit(key)
         return jsonify({'error': 'Invalid email or password'}), 401
+    limiters['email'].reset(keys['email'])
     
     if not user.is_active:
         return jsonify({'error': 'Account is deactivated'}), 401
@@ -24,7 +42,7 @@ def login():
     user.last_login = datetime.utcnow()
     db.session.commit()
     
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=user.id, additional_claims=token_claims(user))
     return jsonify({
         'token': access_token,
         'user': user.to_dict()
@@ -33,7 +51,6 @@ def login():
 @bp.route('/register', methods=['POST'])
 @jwt_required()
 def register():
-    current_user = User.query.get(get_jwt_identity())
     if current_user.role != 'admin':
         return jsonify({'error': 'Only admins can register new users'}), 403
     
@@ -52,7 +69,10 @@ def register():
         last_name=data['last_name'],
         role=data['role']
     )
-    new_user.set_password(data['password'])
+    try:
+        new_user.set_password(data['password'])
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503
     
     db.session.add(new_user)
     db.session.commit()
@@ -62,13 +82,12 @@ def register():
 @bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
-    current_user = User.query.get(get_jwt_identity())
-    return jsonify(current_user.to_dict())
+    user = User.query.get_or_404(current_user.id)
+    return jsonify(user.to_dict())
 
 @bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
-    current_user = User.query.get(get_jwt_identity())
     if current_user.role != 'admin':
         return jsonify({'error': 'Only admins can view all users'}), 403
     
@@ -78,7 +97,6 @@ def get_users():
 @bp.route('/users/<int:user_id>', methods=['PUT'])
 @jwt_required()
 def update_user(user_id):
-    current_user = User.query.get(get_jwt_identity())
     if current_user.role != 'admin' and current_user.id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
@@ -90,11 +108,17 @@ def update_user(user_id):
     if 'last_name' in data:
         user.last_name = data['last_name']
     if 'password' in data:
-        user.set_password(data['password'])
-    if 'role' in data and current_user.role == 'admin':
+        try:
+            user.set_password(data['password'])
+        except PasswordHasherBusy:
+            return jsonify({'error': 'Server busy, please try again'}), 503
+    if 'role' in data and current_user.role == 'admin' and data['role'] != user.role:
         user.role = data['role']
-    if 'is_active' in data and current_user.role == 'admin':
+        user.auth_version += 1
+    if 'is_active' in data and current_user.role == 'admin' and data['is_active'] != user.is_active:
         user.is_active = data['is_active']
+        user.auth_version += 1
     
     db.session.commit()
+    get_user_cache().invalidate(user.id)
     return jsonify({'message': 'User updated successfully', 'user': user.to_dict()}) 
\ No newline at end of file
@@ -0,0 +1,89 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from datetime import datetime
+from ..models.campaign import Campaign, CampaignStatus
+from .. import db
+from ..utils.campaigns import create_campaign, campaign_progress, pause_campaign, resume_campaign
+from ..utils.lead_query import InvalidQueryParam
+
+bp = Blueprint('campaigns', __name__, url_prefix='/api/campaigns')
+
+def _get_owned_campaign(campaign_id, current_user):
+    campaign = Campaign.query.get_or_404(campaign_id)
+    if not current_user.role == 'admin' and campaign.created_by != current_user.id:
+        return None
+    return campaign
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def start_campaign():
+    """Create a campaign; outbox workers render the subject/body template for every matching lead and queue the emails"""
+    data = request.get_json()
+
+    required_fields = ['name', 'subject', 'body']
+    if not data or not all(data.get(field) for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    filters = data.get('filters') or {}
+    if not isinstance(filters, dict):
+        return jsonify({'error': 'filters must be an object'}), 400
+
+    try:
+        scheduled_follow_up = datetime.fromisoformat(data['scheduled_follow_up']) if data.get('scheduled_follow_up') else None
+        campaign = create_campaign(
+            name=data['name'],
+            subject_template=data['subject'],
+            body_template=data['body'],
+            filters=filters,
+            current_user=current_user,
+            scheduled_follow_up=scheduled_follow_up
+        )
+    except (ValueError, InvalidQueryParam) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    db.session.commit()
+    return jsonify({'message': 'Campaign queued', 'campaign': campaign.to_dict()}), 202
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_campaigns():
+    query = Campaign.query
+    if not current_user.role == 'admin':
+        query = query.filter_by(created_by=current_user.id)
+    campaigns = query.order_by(Campaign.created_at.desc()).limit(100).all()
+    return jsonify({'campaigns': [campaign.to_dict() for campaign in campaigns]})
+
+@bp.route('/<int:campaign_id>', methods=['GET'])
+@jwt_required()
+def get_campaign(campaign_id):
+    campaign = _get_owned_campaign(campaign_id, current_user)
+    if not campaign:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(campaign.to_dict(progress=campaign_progress(campaign)))
+
+@bp.route('/<int:campaign_id>/pause', methods=['POST'])
+@jwt_required()
+def pause(campaign_id):
+    campaign = _get_owned_campaign(campaign_id, current_user)
+    if not campaign:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if campaign.status not in (CampaignStatus.QUEUED, CampaignStatus.SENDING):
+        return jsonify({'error': f'Campaign is {campaign.status}'}), 400
+
+    pause_campaign(campaign)
+    db.session.commit()
+    return jsonify({'message': 'Campaign paused', 'campaign': campaign.to_dict(progress=campaign_progress(campaign))})
+
+@bp.route('/<int:campaign_id>/resume', methods=['POST'])
+@jwt_required()
+def resume(campaign_id):
+    campaign = _get_owned_campaign(campaign_id, current_user)
+    if not campaign:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if campaign.status != CampaignStatus.PAUSED:
+        return jsonify({'error': f'Campaign is {campaign.status}'}), 400
+
+    resume_campaign(campaign)
+    db.session.commit()
+    return jsonify({'message': 'Campaign resumed', 'campaign': campaign.to_dict(progress=campaign_progress(campaign))})
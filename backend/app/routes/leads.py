@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime
-from sqlalchemy import or_, and_
-from ..models.lead import Lead, Note, Activity, EmailLog, LeadStatus, ResponseType
+from ..models.lead import Lead, Note, Activity, EmailLog, LeadStatus, ResponseType, ResponseTypeSource
 from ..models.user import User
 from .. import db
-from ..utils.gmail_service import create_gmail_service, send_email
-from ..utils.error_handlers import APIError
+from ..utils.email_outbox import enqueue_email
+from ..utils.search import ranked_search
+from ..utils.lead_import import iter_csv, iter_ndjson, import_leads
+from ..utils.csv_export import csv_response, stream_query
+from ..utils.lead_bulk import parse_bulk_changes, select_target_ids, count_targets, bulk_update_leads
+from ..utils.pubsub import publish_notification
+from ..utils.reply_classifier import classify_replies
+from ..utils.delta_sync import fetch_changes, SyncTokenExpired, DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT
+from ..models.sync import SyncEntity
+from ..utils.lead_dedup import find_matches, find_duplicate_clusters, merge_clusters
+from ..utils.suppression import suppression_reasons
+from ..utils.lead_timeline import get_timeline_version, load_lead_with_history, build_timeline, paginate_timeline
+from ..utils.lead_query import (
+    apply_lead_filters, parse_limit, parse_fields, count_leads, fetch_page, InvalidQueryParam, LEAD_FIELDS
+)
 from ..models.notification import Notification, NotificationType
 
 bp = Blueprint('leads', __name__, url_prefix='/api/leads')
@@ -14,13 +26,28 @@ bp = Blueprint('leads', __name__, url_prefix='/api/leads')
 @bp.route('', methods=['POST'])
 @jwt_required()
 def create_lead():
-    current_user = User.query.get(get_jwt_identity())
     data = request.get_json()
 
     required_fields = ['name', 'email', 'company_name']
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
 
+    if not data.get('allow_duplicate'):
+        [matches] = find_matches([(data['name'], data['email'], data['company_name'])])
+        if matches:
+            duplicates = Lead.query.filter(Lead.id.in_(matches)).order_by(Lead.id).all()
+            # Members only see their own leads; others' matches are just counted
+            visible = [lead for lead in duplicates
+                       if current_user.role == 'admin' or lead.assigned_to == current_user.id]
+            return jsonify({
+                'error': 'A lead with the same email, or the same name at this company, already exists',
+                'duplicates': [
+                    {'id': lead.id, 'name': lead.name, 'company_name': lead.company_name, 'assigned_to': lead.assigned_to}
+                    for lead in visible
+                ],
+                'other_duplicates': len(duplicates) - len(visible)
+            }), 409
+
     lead = Lead(
         name=data['name'],
         email=data['email'],
@@ -35,47 +62,149 @@ def create_lead():
 
     return jsonify({'message': 'Lead created successfully', 'lead': lead.to_dict()}), 201
 
+@bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_leads_file():
+    """Bulk import leads from a CSV or NDJSON upload (multipart 'file' or raw body)"""
+
+    assigned_to = current_user.id
+    if request.args.get('assigned_to'):
+        if not current_user.role == 'admin':
+            return jsonify({'error': 'Only admins can import leads for other users'}), 403
+        assignee = User.query.get(request.args.get('assigned_to'))
+        if not assignee:
+            return jsonify({'error': 'Assigned user not found'}), 400
+        assigned_to = assignee.id
+
+    if request.files.get('file'):
+        upload = request.files['file']
+        stream = upload.stream
+        default_format = 'ndjson' if upload.filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+    else:
+        stream = request.stream
+        default_format = 'ndjson' if 'ndjson' in (request.content_type or '') else 'csv'
+
+    file_format = request.args.get('format', default_format).lower()
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+
+    rows = iter_csv(stream) if file_format == 'csv' else iter_ndjson(stream)
+    try:
+        report = import_leads(rows, assigned_to)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'error': 'File must be UTF-8 encoded'}), 400
+
+    return jsonify({'message': f'Imported {report["imported"]} lead(s)', **report}), 201
+
 @bp.route('', methods=['GET'])
 @jwt_required()
 def get_leads():
-    current_user = User.query.get(get_jwt_identity())
     query = Lead.query
 
-    # Search and filter parameters
-    search = request.args.get('search', '')
-    status = request.args.get('status', '')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    assigned_to = request.args.get('assigned_to')
-
-    if search:
-        query = query.filter(or_(
-            Lead.name.ilike(f'%{search}%'),
-            Lead.email.ilike(f'%{search}%'),
-            Lead.company_name.ilike(f'%{search}%')
-        ))
-
-    if status:
-        query = query.filter(Lead.status == status)
-
-    if start_date and end_date:
-        query = query.filter(and_(
-            Lead.created_at >= datetime.fromisoformat(start_date),
-            Lead.created_at <= datetime.fromisoformat(end_date)
-        ))
-
-    if assigned_to:
-        query = query.filter(Lead.assigned_to == assigned_to)
-    elif not current_user.role == 'admin':
+    try:
+        query = apply_lead_filters(query, request.args, current_user)
+        limit = parse_limit(request.args.get('limit'))
+        fields = parse_fields(request.args.get('fields'))
+        total = None
+        if request.args.get('include_total', '').lower() == 'true':
+            total = count_leads(query)
+        leads, next_cursor = fetch_page(query, limit, request.args.get('cursor'), fields)
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = {'leads': leads, 'next_cursor': next_cursor, 'limit': limit}
+    if total is not None:
+        response['total'] = total
+    return jsonify(response)
+
+SYNC_INCLUDES = {'notes': SyncEntity.NOTE, 'emails': SyncEntity.EMAIL}
+
+@bp.route('/changes', methods=['GET'])
+@jwt_required()
+def get_lead_changes():
+    """Leads changed or deleted since the `since` token from a previous response"""
+    try:
+        limit = parse_limit(request.args.get('limit'), DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT)
+        include = []
+        for name in filter(None, request.args.get('include', '').split(',')):
+            if name not in SYNC_INCLUDES:
+                raise InvalidQueryParam(f'Unknown include: {name}')
+            include.append(SYNC_INCLUDES[name])
+        changes = fetch_changes(request.args.get('since'), current_user, limit, include)
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+    except SyncTokenExpired:
+        return jsonify({'error': 'Sync token expired, fetch all leads again'}), 410
+    return jsonify(changes)
+
+EXPORT_LEAD_FIELDS = [
+    'id', 'name', 'email', 'company_name', 'industry', 'status', 'assigned_to',
+    'created_at', 'updated_at', 'last_contact_date', 'next_follow_up', 'calendly_link'
+]
+EXPORT_EMAIL_FIELDS = [
+    'id', 'lead_id', 'user_id', 'direction', 'subject', 'response_type', 'sent_at', 'scheduled_follow_up'
+]
+
+def _wants_gzip():
+    if request.args.get('compress', '').lower() == 'false':
+        return False
+    return 'gzip' in request.accept_encodings
+
+@bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_leads():
+    """Stream leads matching the get_leads filters as CSV"""
+    try:
+        query = apply_lead_filters(Lead.query, request.args, current_user)
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = query.with_entities(*[LEAD_FIELDS[field] for field in EXPORT_LEAD_FIELDS])
+    query = query.order_by(Lead.created_at.desc(), Lead.id.desc())
+    filename = f'leads-{datetime.utcnow():%Y%m%d-%H%M%S}.csv'
+    return csv_response(filename, EXPORT_LEAD_FIELDS, stream_query(query), compress=_wants_gzip())
+
+@bp.route('/export/emails', methods=['GET'])
+@jwt_required()
+def export_email_report():
+    """Stream the email log of leads matching the get_leads filters as CSV"""
+    query = db.session.query(
+        *[getattr(EmailLog, field) for field in EXPORT_EMAIL_FIELDS], Lead.email, Lead.company_name
+    ).join(Lead, EmailLog.lead_id == Lead.id)
+    try:
+        query = apply_lead_filters(query, request.args, current_user)
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = query.order_by(EmailLog.sent_at.desc())
+    header = EXPORT_EMAIL_FIELDS + ['lead_email', 'lead_company_name']
+    filename = f'email-report-{datetime.utcnow():%Y%m%d-%H%M%S}.csv'
+    return csv_response(filename, header, stream_query(query), compress=_wants_gzip())
+
+@bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_leads():
+    """Relevance-ranked prefix search over name, email and company"""
+    term = request.args.get('q', '').strip()
+    if not term:
+        return jsonify({'leads': []})
+
+    try:
+        limit = parse_limit(request.args.get('limit') or 20)
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = Lead.query
+    if not current_user.role == 'admin':
         query = query.filter(Lead.assigned_to == current_user.id)
 
-    leads = query.order_by(Lead.created_at.desc()).all()
+    leads = ranked_search(query, term).limit(limit).all()
     return jsonify({'leads': [lead.to_dict() for lead in leads]})
 
 @bp.route('/<int:lead_id>', methods=['GET'])
 @jwt_required()
 def get_lead(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -86,7 +215,6 @@ def get_lead(lead_id):
 @bp.route('/<int:lead_id>', methods=['PUT'])
 @jwt_required()
 def update_lead(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -119,10 +247,122 @@ def update_lead(lead_id):
     db.session.commit()
     return jsonify({'message': 'Lead updated successfully', 'lead': lead.to_dict()})
 
+@bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_update():
+    """Change status, owner and/or follow-up of many leads (by lead_ids or filters) at once"""
+    data = request.get_json() or {}
+
+    try:
+        values = parse_bulk_changes(data.get('changes'))
+        if 'assigned_to' in values and not current_user.role == 'admin':
+            return jsonify({'error': 'Only admins can reassign leads'}), 403
+
+        target_ids, requested = select_target_ids(data, current_user)
+        # Same rule as update_lead, applied to the whole set: all or nothing
+        if requested is not None and count_targets(target_ids) != len(requested):
+            return jsonify({'error': 'Unauthorized or missing leads in lead_ids'}), 403
+
+        updated, notifications = bulk_update_leads(target_ids, values)
+    except InvalidQueryParam as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    db.session.commit()
+    for notification_id, user_id in notifications:
+        publish_notification(user_id, notification_id)
+
+    return jsonify({
+        'message': f'Updated {updated} lead(s)',
+        'updated': updated,
+        'notifications_created': len(notifications)
+    })
+
+@bp.route('/duplicates', methods=['GET'])
+@jwt_required()
+def get_duplicates():
+    """Clusters of leads that look like the same person"""
+    if not current_user.role == 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+    clusters = find_duplicate_clusters()
+    shown = clusters[:limit]
+    leads = {lead.id: lead for lead in Lead.query.filter(
+        Lead.id.in_([lead_id for cluster in shown for lead_id in cluster])
+    )}
+    return jsonify({
+        'total': len(clusters),
+        'clusters': [[leads[lead_id].to_dict() for lead_id in cluster if lead_id in leads] for cluster in shown]
+    })
+
+@bp.route('/merge', methods=['POST'])
+@jwt_required()
+def merge_leads():
+    """Merge the given leads into the oldest of them"""
+    if not current_user.role == 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    lead_ids = (request.get_json() or {}).get('lead_ids')
+    if not isinstance(lead_ids, list) or len(set(lead_ids)) < 2 or not all(isinstance(i, int) for i in lead_ids):
+        return jsonify({'error': 'lead_ids must list at least two lead ids'}), 400
+    if Lead.query.filter(Lead.id.in_(lead_ids)).count() != len(set(lead_ids)):
+        return jsonify({'error': 'Lead not found'}), 404
+
+    merged = merge_clusters([sorted(set(lead_ids))], acting_user_id=current_user.id)
+    db.session.commit()
+    [(survivor_id, merged_ids)] = merged.items()
+    return jsonify({
+        'message': f'Merged {len(merged_ids)} lead(s)',
+        'lead': db.session.get(Lead, survivor_id).to_dict(),
+        'merged_ids': merged_ids
+    })
+
+@bp.route('/<int:lead_id>/timeline', methods=['GET'])
+@jwt_required()
+def get_lead_timeline(lead_id):
+    """The lead plus its notes, emails and activities merged newest first, with ETag support"""
+    version = get_timeline_version(lead_id)
+    if version is None:
+        return jsonify({'error': 'Lead not found'}), 404
+
+    assigned_to, etag = version
+    if not current_user.role == 'admin' and assigned_to != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            lead = load_lead_with_history(lead_id)
+            timeline = build_timeline(lead)
+            items, next_cursor = paginate_timeline(timeline, limit, request.args.get('cursor'))
+        except InvalidQueryParam as e:
+            return jsonify({'error': str(e)}), 400
+
+        response = jsonify({
+            'lead': lead.to_dict(),
+            'items': items,
+            'next_cursor': next_cursor,
+            'limit': limit,
+            'counts': {
+                'notes': len(lead.notes),
+                'emails': len(lead.emails),
+                'activities': len(lead.activities)
+            }
+        })
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @bp.route('/<int:lead_id>/notes', methods=['POST'])
 @jwt_required()
 def add_note(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -146,7 +386,6 @@ def add_note(lead_id):
 @bp.route('/<int:lead_id>/notes', methods=['GET'])
 @jwt_required()
 def get_notes(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -158,7 +397,6 @@ def get_notes(lead_id):
 @bp.route('/<int:lead_id>/emails', methods=['POST'])
 @jwt_required()
 def log_email(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -176,13 +414,21 @@ def log_email(lead_id):
         subject=data['subject'],
         content=data['content'],
         response_type=data.get('response_type'),
+        response_type_source=ResponseTypeSource.MANUAL if data.get('response_type') else None,
         scheduled_follow_up=datetime.fromisoformat(data['scheduled_follow_up']) if data.get('scheduled_follow_up') else None
     )
 
+    # Replies logged without a response type are classified like synced ones
+    if email_log.direction == 'received' and not email_log.response_type:
+        [(email_log.response_type, email_log.response_type_source, follow_up)] = classify_replies(
+            [email_log.content], [datetime.utcnow()]
+        )
+        email_log.scheduled_follow_up = email_log.scheduled_follow_up or follow_up
+
     # Update lead's last contact date and next follow-up
     lead.last_contact_date = datetime.utcnow()
-    if data.get('scheduled_follow_up'):
-        lead.next_follow_up = datetime.fromisoformat(data['scheduled_follow_up'])
+    if email_log.scheduled_follow_up:
+        lead.next_follow_up = email_log.scheduled_follow_up
 
     db.session.add(email_log)
     db.session.commit()
@@ -192,7 +438,6 @@ def log_email(lead_id):
 @bp.route('/<int:lead_id>/emails', methods=['GET'])
 @jwt_required()
 def get_emails(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -201,10 +446,30 @@ def get_emails(lead_id):
     emails = EmailLog.query.filter_by(lead_id=lead_id).order_by(EmailLog.sent_at.desc()).all()
     return jsonify({'emails': [email.to_dict() for email in emails]})
 
+@bp.route('/<int:lead_id>/emails/<int:email_id>', methods=['PUT'])
+@jwt_required()
+def label_email(lead_id, email_id):
+    """Set a received email's response_type by hand; these labels train the reply classifier"""
+    lead = Lead.query.get_or_404(lead_id)
+
+    if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    email_log = EmailLog.query.filter_by(id=email_id, lead_id=lead_id).first_or_404()
+    response_type = (request.get_json() or {}).get('response_type')
+    if email_log.direction != 'received':
+        return jsonify({'error': 'Only received emails have a response type'}), 400
+    if response_type not in {kind.value for kind in ResponseType}:
+        return jsonify({'error': 'Invalid response_type'}), 400
+
+    email_log.response_type = response_type
+    email_log.response_type_source = ResponseTypeSource.MANUAL
+    db.session.commit()
+    return jsonify({'message': 'Email labelled', 'email': email_log.to_dict()})
+
 @bp.route('/<int:lead_id>/send-email', methods=['POST'])
 @jwt_required()
 def send_lead_email(lead_id):
-    current_user = User.query.get(get_jwt_identity())
     lead = Lead.query.get_or_404(lead_id)
 
     if not current_user.role == 'admin' and lead.assigned_to != current_user.id:
@@ -215,56 +480,23 @@ def send_lead_email(lead_id):
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    try:
-        # Create Gmail service using global email
-        service = create_gmail_service()
-        
-        # Send email
-        sent_message = send_email(
-            service=service,
-            to=lead.email,
-            subject=data['subject'],
-            body=data['content']
-        )
+    [reason] = suppression_reasons([(lead.email, lead.status)])
+    if reason:
+        return jsonify({'error': f'{lead.email} does not receive email ({reason})', 'suppression_reason': reason}), 409
 
-        # Log the email
-        email_log = EmailLog(
-            lead_id=lead_id,
-            user_id=current_user.id,
-            direction='sent',
-            subject=data['subject'],
-            content=data['content'],
-            response_type=data.get('response_type'),
-            scheduled_follow_up=datetime.fromisoformat(data['scheduled_follow_up']) if data.get('scheduled_follow_up') else None
-        )
-
-        # Update lead's last contact date
-        lead.last_contact_date = datetime.utcnow()
-        
-        # Handle follow-up scheduling
-        if data.get('scheduled_follow_up'):
-            follow_up_date = datetime.fromisoformat(data['scheduled_follow_up'])
-            lead.next_follow_up = follow_up_date
-            
-            # Create notification for the follow-up
-            notification = Notification(
-                user_id=current_user.id,
-                lead_id=lead.id,
-                type=NotificationType.FOLLOW_UP,
-                title=f'Follow-up scheduled with {lead.name}',
-                message=f'You have scheduled a follow-up after sending an email to {lead.name} from {lead.company_name}.',
-                scheduled_for=follow_up_date
-            )
-            db.session.add(notification)
-
-        db.session.add(email_log)
-        db.session.commit()
-
-        return jsonify({
-            'message': 'Email sent successfully',
-            'email': email_log.to_dict(),
-            'gmail_message_id': sent_message['id']
-        }), 201
+    message = enqueue_email(
+        to=lead.email,
+        subject=data['subject'],
+        body=data['content'],
+        lead_id=lead.id,
+        user_id=current_user.id,
+        response_type=data.get('response_type'),
+        scheduled_follow_up=datetime.fromisoformat(data['scheduled_follow_up']) if data.get('scheduled_follow_up') else None
+    )
+    db.session.commit()
 
-    except Exception as e:
-        raise APIError(f"Failed to send email: {str(e)}") 
\ No newline at end of file
+    return jsonify({
+        'message': 'Email queued for sending',
+        'outbox_id': message.id,
+        'status': message.status
+    }), 202
@@ -1,32 +1,211 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
-from sqlalchemy import and_
-from ..models.notification import Notification, NotificationStatus, NotificationType
-from ..models.user import User
+import json
+import threading
+import time
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, current_user, create_access_token, get_jwt, get_jwt_request_location
+from sqlalchemy import func, update, or_, and_
+from sqlalchemy.orm import joinedload
 from ..models.lead import Lead
+from ..models.notification import Notification, NotificationStatus
 from .. import db
-from ..utils.gmail_service import create_gmail_service, send_email
+from ..utils.pubsub import get_broker, user_channel
+from ..utils.user_cache import token_claims, STREAM_TOKEN_SCOPE
+from ..utils.lead_query import parse_limit, encode_cursor, decode_cursor, InvalidQueryParam
 
 bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
+BULK_ACTIONS = {
+    'read': NotificationStatus.READ,
+    'dismiss': NotificationStatus.DISMISSED
+}
+
+def _with_lead_name(query):
+    # to_dict() reads lead.name; load it in the same query
+    return query.options(joinedload(Notification.lead).load_only(Lead.name))
+
+def _unread_count(user_id):
+    """Served by the (user_id, status, created_at) index"""
+    return db.session.query(func.count(Notification.id)).filter(
+        Notification.user_id == user_id,
+        Notification.status == NotificationStatus.UNREAD
+    ).scalar()
+
 @bp.route('', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    current_user = User.query.get(get_jwt_identity())
     status = request.args.get('status', 'unread')
-    
-    query = Notification.query.filter_by(user_id=current_user.id)
+
+    query = _with_lead_name(Notification.query.filter_by(user_id=current_user.id))
     if status != 'all':
         query = query.filter_by(status=status)
-    
-    notifications = query.order_by(Notification.created_at.desc()).all()
-    return jsonify({'notifications': [notif.to_dict() for notif in notifications]})
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        if cursor:
+            created_at, notification_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                Notification.created_at < created_at,
+                and_(Notification.created_at == created_at, Notification.id < notification_id)
+            ))
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    notifications = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        next_cursor = encode_cursor(notifications[-1].created_at, notifications[-1].id)
+
+    return jsonify({
+        'notifications': [notif.to_dict() for notif in notifications],
+        'next_cursor': next_cursor,
+        'limit': limit,
+        'unread_count': _unread_count(current_user.id)
+    })
+
+@bp.route('/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    return jsonify({'unread_count': _unread_count(current_user.id)})
+
+@bp.route('/bulk', methods=['PUT'])
+@jwt_required()
+def bulk_update_notifications():
+    """Mark many notifications read or dismissed: {"action": "read"|"dismiss", "ids": [...] | "all": true}"""
+    data = request.get_json() or {}
+    new_status = BULK_ACTIONS.get(data.get('action'))
+    if not new_status:
+        return jsonify({'error': 'action must be read or dismiss'}), 400
+
+    conditions = [Notification.user_id == current_user.id, Notification.status != new_status]
+    if new_status == NotificationStatus.READ:
+        # Reading a dismissed notification would bring it back
+        conditions.append(Notification.status == NotificationStatus.UNREAD)
+
+    if data.get('all') is not True:
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(notification_id, int) for notification_id in ids):
+            return jsonify({'error': 'Provide ids or all'}), 400
+        conditions.append(Notification.id.in_(ids))
+
+    updated = db.session.execute(
+        update(Notification).where(*conditions).values(status=new_status)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+
+    return jsonify({
+        'message': f'Updated {updated} notification(s)',
+        'updated': updated,
+        'unread_count': _unread_count(current_user.id)
+    })
+
+def _stream_slots(app):
+    """Per-process semaphore capping open streams at NOTIFICATION_STREAM_MAX_PER_WORKER"""
+    if 'notification_stream_slots' not in app.extensions:
+        app.extensions['notification_stream_slots'] = threading.BoundedSemaphore(
+            app.config['NOTIFICATION_STREAM_MAX_PER_WORKER']
+        )
+    return app.extensions['notification_stream_slots']
+
+def _format_event(notification):
+    return f'id: {notification.id}\nevent: notification\ndata: {json.dumps(notification.to_dict())}\n\n'
+
+@bp.route('/stream-token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    """Short-lived token for ?jwt= on /stream, so session tokens stay out of URLs and logs"""
+    expires = current_app.config['NOTIFICATION_STREAM_TOKEN_EXPIRES']
+    token = create_access_token(identity=current_user.id, expires_delta=expires,
+                                additional_claims=token_claims(current_user, STREAM_TOKEN_SCOPE))
+    return jsonify({'token': token, 'expires_in': int(expires.total_seconds())})
+
+@bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_notifications():
+    """Server-Sent Events stream of the current user's new notifications"""
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != STREAM_TOKEN_SCOPE:
+        return jsonify({'error': 'Use a token from POST /api/notifications/stream-token in the query string'}), 401
+    user_id = current_user.id
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+    if last_id is None:
+        # Fresh connection: only stream what is created from now on
+        last_id = db.session.query(func.max(Notification.id)).filter(Notification.user_id == user_id).scalar() or 0
+    db.session.close()
+
+    heartbeat = current_app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    max_age = current_app.config['NOTIFICATION_STREAM_MAX_AGE']
+    broker = get_broker()
+    # A process-local broker misses notifications created by other processes;
+    # poll for them by id instead of waiting for the next reconnect
+    poll_interval = None if broker.shared else current_app.config['NOTIFICATION_STREAM_POLL_INTERVAL']
+
+    # Each stream holds a worker thread until it closes; leave the rest for API requests
+    slots = _stream_slots(current_app._get_current_object())
+    if not slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open notification streams, try again later'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    try:
+        subscription = broker.subscribe(user_channel(user_id))
+    except Exception:
+        slots.release()
+        raise
+
+    def fetch_since(since_id):
+        notifications = _with_lead_name(Notification.query).filter(
+            Notification.user_id == user_id,
+            Notification.id > since_id
+        ).order_by(Notification.id).all()
+        events = [_format_event(notification) for notification in notifications]
+        # Release the connection (and any SQLite read snapshot) while idle
+        db.session.close()
+        return events, (notifications[-1].id if notifications else since_id)
+
+    def generate():
+        nonlocal last_id
+        deadline = time.monotonic() + max_age
+        try:
+            yield 'retry: 3000\n\n'
+            # Catch up on anything missed while disconnected
+            events, last_id = fetch_since(last_id)
+            yield from events
+            last_sent = time.monotonic()
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=poll_interval or heartbeat)
+                if message is None and poll_interval:
+                    events, last_id = fetch_since(last_id)
+                elif message is not None and message['id'] > last_id:
+                    events, last_id = fetch_since(last_id)
+                else:
+                    events = []
+                if events:
+                    yield from events
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= heartbeat:
+                    yield ': heartbeat\n\n'
+                    last_sent = time.monotonic()
+        finally:
+            subscription.close()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs even if the client goes away before the stream starts
+    response.call_on_close(slots.release)
+    return response
 
 @bp.route('/<int:notification_id>/mark-as-read', methods=['PUT'])
 @jwt_required()
 def mark_as_read(notification_id):
-    current_user = User.query.get(get_jwt_identity())
     notification = Notification.query.get_or_404(notification_id)
     
     if notification.user_id != current_user.id:
@@ -40,7 +219,6 @@ def mark_as_read(notification_id):
 @bp.route('/<int:notification_id>/dismiss', methods=['PUT'])
 @jwt_required()
 def dismiss_notification(notification_id):
-    current_user = User.query.get(get_jwt_identity())
     notification = Notification.query.get_or_404(notification_id)
     
     if notification.user_id != current_user.id:
@@ -54,64 +232,8 @@ def dismiss_notification(notification_id):
 @bp.route('/check-follow-ups', methods=['GET'])
 @jwt_required()
 def check_follow_ups():
-    """Check for upcoming follow-ups and create notifications"""
-    current_user = User.query.get(get_jwt_identity())
-    
-    # Find leads with follow-ups in the next 24 hours
-    tomorrow = datetime.utcnow() + timedelta(days=1)
-    leads = Lead.query.filter(
-        and_(
-            Lead.assigned_to == current_user.id,
-            Lead.next_follow_up <= tomorrow,
-            Lead.next_follow_up > datetime.utcnow()
-        )
-    ).all()
-    
-    notifications_created = 0
-    for lead in leads:
-        # Check if notification already exists
-        existing_notification = Notification.query.filter(
-            and_(
-                Notification.lead_id == lead.id,
-                Notification.type == NotificationType.FOLLOW_UP,
-                Notification.scheduled_for == lead.next_follow_up,
-                Notification.status != NotificationStatus.DISMISSED
-            )
-        ).first()
-        
-        if not existing_notification:
-            notification = Notification(
-                user_id=current_user.id,
-                lead_id=lead.id,
-                type=NotificationType.FOLLOW_UP,
-                title=f'Follow-up with {lead.name}',
-                message=f'You have a scheduled follow-up with {lead.name} from {lead.company_name}.',
-                scheduled_for=lead.next_follow_up
-            )
-            db.session.add(notification)
-            notifications_created += 1
-            
-            # Send email reminder if follow-up is within next hour
-            if lead.next_follow_up - datetime.utcnow() <= timedelta(hours=1):
-                try:
-                    service = create_gmail_service(current_user.email)
-                    send_email(
-                        service=service,
-                        sender=current_user.email,
-                        to=current_user.email,
-                        subject=f'Reminder: Follow-up with {lead.name}',
-                        body=f'''You have a scheduled follow-up with {lead.name} from {lead.company_name}.
-                        
-Time: {lead.next_follow_up.strftime('%I:%M %p')}
-Date: {lead.next_follow_up.strftime('%B %d, %Y')}
-
-View lead details: http://localhost:3000/leads/{lead.id}'''
-                    )
-                except Exception as e:
-                    print(f"Failed to send email reminder: {str(e)}")
-    
-    db.session.commit()
+    """Deprecated: follow-up notifications are created by `flask follow-ups run`"""
     return jsonify({
-        'message': f'Created {notifications_created} new notification(s)',
-        'count': notifications_created
-    }) 
\ No newline at end of file
+        'message': 'Follow-up notifications are generated by the scheduler',
+        'count': 0
+    })
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from ..models.outbox import OutboundEmail
+
+bp = Blueprint('outbox', __name__, url_prefix='/api/outbox')
+
+@bp.route('/<int:outbox_id>', methods=['GET'])
+@jwt_required()
+def get_outbox_message(outbox_id):
+    """Delivery status of a queued email"""
+    message = OutboundEmail.query.get_or_404(outbox_id)
+
+    if not current_user.role == 'admin' and message.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(message.to_dict())
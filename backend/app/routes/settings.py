@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from ..models.settings import Settings, SettingsKeys
-from ..models.user import User
 from .. import db
+from ..utils.gmail_service import invalidate_gmail_cache
+from ..utils.settings_cache import get_settings_cache, upsert_settings, bump_settings_version
 
 bp = Blueprint('settings', __name__, url_prefix='/api/settings')
 
@@ -10,27 +11,24 @@ bp = Blueprint('settings', __name__, url_prefix='/api/settings')
 @jwt_required()
 def get_settings():
     """Get all settings"""
-    current_user = User.query.get(get_jwt_identity())
     if not current_user.role == 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
-    settings = Settings.query.all()
-    return jsonify({'settings': [setting.to_dict() for setting in settings]})
+    return jsonify({'settings': get_settings_cache().all()})
 
 @bp.route('/<string:key>', methods=['GET'])
 @jwt_required()
 def get_setting(key):
     """Get a specific setting by key"""
-    setting = Settings.query.filter_by(key=key).first()
+    setting = get_settings_cache().get_row(key)
     if not setting:
         return jsonify({'error': 'Setting not found'}), 404
-    return jsonify(setting.to_dict())
+    return jsonify(setting)
 
 @bp.route('', methods=['POST'])
 @jwt_required()
 def update_settings():
     """Update multiple settings at once"""
-    current_user = User.query.get(get_jwt_identity())
     if not current_user.role == 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
@@ -38,21 +36,11 @@ def update_settings():
     if not isinstance(data, dict):
         return jsonify({'error': 'Invalid data format'}), 400
 
-    updated_settings = []
-    for key, value in data.items():
-        setting = Settings.query.filter_by(key=key).first()
-        if setting:
-            setting.value = value
-        else:
-            setting = Settings(
-                key=key,
-                value=value,
-                description=f'Setting for {key}'
-            )
-            db.session.add(setting)
-        updated_settings.append(setting)
-
+    updated_settings = upsert_settings(data)
     db.session.commit()
+    get_settings_cache().invalidate()
+    if {SettingsKeys.GLOBAL_EMAIL, SettingsKeys.GLOBAL_EMAIL_NAME} & set(data):
+        invalidate_gmail_cache()
     return jsonify({
         'message': 'Settings updated successfully',
         'settings': [setting.to_dict() for setting in updated_settings]
@@ -62,7 +50,6 @@ def update_settings():
 @jwt_required()
 def initialize_settings():
     """Initialize default settings if they don't exist"""
-    current_user = User.query.get(get_jwt_identity())
     if not current_user.role == 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
 
@@ -77,9 +64,12 @@ def initialize_settings():
         }
     }
 
+    existing = set(db.session.scalars(
+        db.select(Settings.key).where(Settings.key.in_(default_settings))
+    ))
     created_settings = []
     for key, data in default_settings.items():
-        if not Settings.query.filter_by(key=key).first():
+        if key not in existing:
             setting = Settings(
                 key=key,
                 value=data['value'],
@@ -88,7 +78,10 @@ def initialize_settings():
             db.session.add(setting)
             created_settings.append(setting)
 
+    if created_settings:
+        bump_settings_version()
     db.session.commit()
+    get_settings_cache().invalidate()
     return jsonify({
         'message': 'Default settings initialized',
         'settings': [setting.to_dict() for setting in created_settings]
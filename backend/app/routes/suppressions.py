@@ -0,0 +1,154 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, current_user
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from ..models.campaign import Campaign
+from ..models.outbox import OutboundEmail, OutboxStatus
+from ..models.suppression import Suppression, SuppressionReason, SuppressionKind
+from .. import db
+from ..utils.lead_query import InvalidQueryParam, parse_limit
+from ..utils.suppression import (
+    add_suppressions, remove_suppressions, get_suppression_list, normalize_suppression, MAX_ENTRIES_PER_REQUEST
+)
+
+bp = Blueprint('suppressions', __name__, url_prefix='/api/suppressions')
+
+DEFAULT_REPORT_DAYS = 30
+
+def _entries(data, field):
+    entries = (data or {}).get(field)
+    if not isinstance(entries, list) or not entries:
+        raise InvalidQueryParam(f'{field} must be a non-empty list')
+    if len(entries) > MAX_ENTRIES_PER_REQUEST:
+        raise InvalidQueryParam(f'At most {MAX_ENTRIES_PER_REQUEST} {field} per request')
+    return entries
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def get_suppressions():
+    """Suppressed addresses and domains, newest first; ?q= matches a prefix"""
+    if not current_user.role == 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        before_id = int(request.args['before_id']) if request.args.get('before_id') else None
+    except (ValueError, InvalidQueryParam):
+        return jsonify({'error': 'Invalid limit or before_id'}), 400
+
+    query = select(Suppression).order_by(Suppression.id.desc()).limit(limit)
+    if before_id:
+        query = query.where(Suppression.id < before_id)
+    if request.args.get('q'):
+        query = query.where(Suppression.value.startswith(request.args['q'].strip().lower(), autoescape=True))
+    entries = db.session.scalars(query).all()
+    return jsonify({
+        'suppressions': [entry.to_dict() for entry in entries],
+        'total': db.session.scalar(select(func.count(Suppression.id))),
+        'next_before_id': entries[-1].id if len(entries) == limit else None
+    })
+
+@bp.route('', methods=['POST'])
+@jwt_required()
+def create_suppressions():
+    """Add addresses and domains in bulk, e.g. {"entries": [...], "reason": "unsubscribed"}
+
+    Only admins can add domains or other reasons; members record addresses
+    that unsubscribed, which an admin would otherwise have to undo.
+    """
+    data = request.get_json()
+    try:
+        entries = _entries(data, 'entries')
+        if not current_user.role == 'admin':
+            if data.get('reason') != SuppressionReason.UNSUBSCRIBED or any(
+                (normalize_suppression(entry) or (None, None))[1] == SuppressionKind.DOMAIN for entry in entries
+            ):
+                return jsonify({'error': 'Only admins can suppress domains or add entries other than unsubscribed addresses'}), 403
+        added, existing, invalid = add_suppressions(entries, data.get('reason') or SuppressionReason.MANUAL, current_user.id)
+    except (ValueError, InvalidQueryParam) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+    db.session.commit()
+    get_suppression_list().expire()
+    return jsonify({
+        'message': f'Suppressed {added} new entr{"y" if added == 1 else "ies"}',
+        'added': added,
+        'existing': existing,
+        'invalid': invalid
+    }), 201
+
+@bp.route('/remove', methods=['POST'])
+@jwt_required()
+def delete_suppressions():
+    """Remove addresses and domains in bulk"""
+    if not current_user.role == 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        entries = _entries(request.get_json(), 'entries')
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+
+    removed = remove_suppressions(entries)
+    db.session.commit()
+    get_suppression_list().expire()
+    return jsonify({'message': f'Removed {removed} entr{"y" if removed == 1 else "ies"}', 'removed': removed})
+
+@bp.route('/check', methods=['POST'])
+@jwt_required()
+def check_suppressions():
+    """Which of the given addresses would not be mailed, and why"""
+    try:
+        addresses = _entries(request.get_json(), 'addresses')
+    except InvalidQueryParam as e:
+        return jsonify({'error': str(e)}), 400
+    if not all(isinstance(address, str) for address in addresses):
+        return jsonify({'error': 'addresses must be strings'}), 400
+    return jsonify({'suppressed': get_suppression_list().check(addresses)})
+
+@bp.route('/report', methods=['GET'])
+@jwt_required()
+def get_report():
+    """Suppressed sends per campaign and reason since ?since= (default: the last 30 days)"""
+    try:
+        since = datetime.fromisoformat(request.args['since']) if request.args.get('since') \
+            else datetime.utcnow() - timedelta(days=DEFAULT_REPORT_DAYS)
+        campaign_id = int(request.args['campaign_id']) if request.args.get('campaign_id') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid since or campaign_id'}), 400
+
+    query = (
+        select(OutboundEmail.campaign_id, OutboundEmail.suppression_reason, func.count(OutboundEmail.id))
+        .where(OutboundEmail.status == OutboxStatus.SUPPRESSED, OutboundEmail.created_at >= since)
+        .group_by(OutboundEmail.campaign_id, OutboundEmail.suppression_reason)
+    )
+    if campaign_id:
+        query = query.where(OutboundEmail.campaign_id == campaign_id)
+    if not current_user.role == 'admin':
+        query = query.where(OutboundEmail.user_id == current_user.id)
+
+    batches = {}
+    by_reason = {}
+    for batch_id, reason, count in db.session.execute(query):
+        batch = batches.setdefault(batch_id, {'campaign_id': batch_id, 'suppressed': 0, 'by_reason': {}})
+        batch['suppressed'] += count
+        batch['by_reason'][reason] = count
+        by_reason[reason] = by_reason.get(reason, 0) + count
+
+    campaigns = {campaign.id: campaign for campaign in Campaign.query.filter(Campaign.id.in_([i for i in batches if i]))}
+    for batch_id, batch in batches.items():
+        if batch_id in campaigns:
+            batch['name'] = campaigns[batch_id].name
+            batch['total_recipients'] = campaigns[batch_id].total_recipients
+
+    report = {
+        'since': since.isoformat(),
+        'suppressed': sum(by_reason.values()),
+        'by_reason': by_reason,
+        # campaign_id None collects individually sent lead emails
+        'batches': sorted(batches.values(), key=lambda batch: batch['suppressed'], reverse=True)
+    }
+    if current_user.role == 'admin':
+        report['filter'] = get_suppression_list().get_stats()
+    return jsonify(report)
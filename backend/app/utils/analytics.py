@@ -0,0 +1,220 @@
+from collections import Counter
+from datetime import datetime, date, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from ..models.analytics import DailyStat, Metric
+from ..models.lead import Lead, EmailLog, LeadStatus, ResponseType
+from .. import db
+
+# Metrics rebuilt from email_logs by `flask analytics rebuild`; status_* metrics
+# only exist as recorded events and are left alone.
+EMAIL_METRICS = [Metric.EMAIL_SENT, Metric.REPLY_RECEIVED, Metric.LEAD_CONTACTED] + \
+    [Metric.reply(response_type.value) for response_type in ResponseType]
+
+def _upsert_statement(dialect_name):
+    table = DailyStat.__table__
+    insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=['day', 'user_id', 'metric'],
+        set_={'value': table.c.value + stmt.excluded.value}
+    )
+
+def apply_deltas(connection, deltas):
+    """Add a Counter of (day, user_id, metric) -> delta to the rollup in one statement"""
+    rows = [
+        {'day': day, 'user_id': user_id, 'metric': metric, 'value': value}
+        for (day, user_id, metric), value in deltas.items()
+        if user_id is not None and value
+    ]
+    if rows:
+        connection.execute(_upsert_statement(connection.dialect.name), rows)
+
+def record_metrics(deltas):
+    """Record deltas on the current session's transaction (for bulk Core writers)"""
+    apply_deltas(db.session.connection(), deltas)
+
+def email_deltas(direction, user_id, day, response_type=None, sign=1):
+    deltas = Counter()
+    if direction == 'sent':
+        deltas[(day, user_id, Metric.EMAIL_SENT)] += sign
+    elif direction == 'received':
+        deltas[(day, user_id, Metric.REPLY_RECEIVED)] += sign
+        if response_type:
+            deltas[(day, user_id, Metric.reply(response_type))] += sign
+    return deltas
+
+# ORM writes are tracked automatically: deltas are gathered before the flush
+# and written on the same connection after it, inside the same transaction.
+
+@event.listens_for(Session, 'before_flush')
+def _collect_metric_deltas(session, flush_context, instances):
+    today = datetime.utcnow().date()
+    deltas = Counter()
+
+    for instance in session.new:
+        if isinstance(instance, EmailLog):
+            day = instance.sent_at.date() if instance.sent_at else today
+            deltas.update(email_deltas(instance.direction, instance.user_id, day, instance.response_type))
+
+    for instance in session.dirty:
+        if isinstance(instance, EmailLog):
+            history = get_history(instance, 'response_type')
+            if history.has_changes() and instance.direction == 'received':
+                day = instance.sent_at.date() if instance.sent_at else today
+                for old in history.deleted:
+                    if old:
+                        deltas[(day, instance.user_id, Metric.reply(old))] -= 1
+                if instance.response_type:
+                    deltas[(day, instance.user_id, Metric.reply(instance.response_type))] += 1
+        elif isinstance(instance, Lead):
+            status = get_history(instance, 'status')
+            if status.has_changes() and instance.status:
+                deltas[(today, instance.assigned_to, Metric.status(instance.status))] += 1
+            contact = get_history(instance, 'last_contact_date')
+            if contact.has_changes() and instance.last_contact_date and not any(contact.deleted):
+                deltas[(today, instance.assigned_to, Metric.LEAD_CONTACTED)] += 1
+
+    for instance in session.deleted:
+        if isinstance(instance, EmailLog) and instance.sent_at:
+            deltas.update(email_deltas(instance.direction, instance.user_id, instance.sent_at.date(), instance.response_type, sign=-1))
+
+    if deltas:
+        session.info.setdefault('metric_deltas', Counter()).update(deltas)
+
+@event.listens_for(Session, 'after_flush')
+def _write_metric_deltas(session, flush_context):
+    deltas = session.info.pop('metric_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_metric_deltas(session):
+    session.info.pop('metric_deltas', None)
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def rebuild_email_metrics():
+    """Recompute email-derived rollups from email_logs with set-based GROUP BYs"""
+    day = func.date(EmailLog.sent_at)
+    deltas = Counter()
+
+    by_type = db.session.execute(
+        select(day, EmailLog.user_id, EmailLog.direction, EmailLog.response_type, func.count())
+        .group_by(day, EmailLog.user_id, EmailLog.direction, EmailLog.response_type)
+    )
+    for bucket, user_id, direction, response_type, count in by_type:
+        deltas.update(email_deltas(direction, user_id, _as_date(bucket), response_type, sign=count))
+
+    # A lead counts as contacted on its first logged email, mirroring last_contact_date
+    first_contact = (
+        select(EmailLog.lead_id, func.min(EmailLog.sent_at).label('first_sent'))
+        .group_by(EmailLog.lead_id)
+        .subquery()
+    )
+    first_day = func.date(first_contact.c.first_sent)
+    contacted = db.session.execute(
+        select(first_day, Lead.assigned_to, func.count())
+        .join(Lead, Lead.id == first_contact.c.lead_id)
+        .group_by(first_day, Lead.assigned_to)
+    )
+    for bucket, user_id, count in contacted:
+        deltas[(_as_date(bucket), user_id, Metric.LEAD_CONTACTED)] += count
+
+    db.session.execute(delete(DailyStat).where(DailyStat.metric.in_(EMAIL_METRICS)))
+    record_metrics(deltas)
+    db.session.commit()
+    return len(deltas)
+
+def _scope(query, column, user_id):
+    return query.where(column == user_id) if user_id is not None else query
+
+def metric_totals(start, end, user_id=None, group_by_user=False):
+    """Sum rollup metrics over [start, end]; keyed by metric (or user_id then metric)"""
+    columns = [DailyStat.user_id] if group_by_user else []
+    query = select(*columns, DailyStat.metric, func.sum(DailyStat.value)).where(
+        DailyStat.day >= start, DailyStat.day <= end
+    ).group_by(*columns, DailyStat.metric)
+    query = _scope(query, DailyStat.user_id, user_id)
+
+    if not group_by_user:
+        return {metric: int(total) for metric, total in db.session.execute(query)}
+    result = {}
+    for row_user_id, metric, total in db.session.execute(query):
+        result.setdefault(row_user_id, {})[metric] = int(total)
+    return result
+
+def pipeline_counts(user_id=None, group_by_user=False):
+    """Current lead counts by status (served by the (assigned_to, status) index)"""
+    columns = [Lead.assigned_to] if group_by_user else []
+    query = select(*columns, Lead.status, func.count()).group_by(*columns, Lead.status)
+    query = _scope(query, Lead.assigned_to, user_id)
+
+    if not group_by_user:
+        return {status: count for status, count in db.session.execute(query)}
+    result = {}
+    for assigned_to, status, count in db.session.execute(query):
+        result.setdefault(assigned_to, {})[status] = count
+    return result
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else None
+
+def summarize(totals, pipeline):
+    """Derive the dashboard metrics from rollup totals and pipeline counts"""
+    contacted = totals.get(Metric.LEAD_CONTACTED, 0)
+    replies = totals.get(Metric.REPLY_RECEIVED, 0)
+    positive = totals.get(Metric.reply(ResponseType.POSITIVE.value), 0)
+    follow_ups = totals.get(Metric.reply(ResponseType.FOLLOW_UP_REQUESTED.value), 0)
+    meetings = totals.get(Metric.status(LeadStatus.SCHEDULED.value), 0)
+    converted = totals.get(Metric.status(LeadStatus.CONVERTED.value), 0)
+    return {
+        'leads_total': sum(pipeline.values()),
+        'pipeline': pipeline,
+        'emails_sent': totals.get(Metric.EMAIL_SENT, 0),
+        'leads_contacted': contacted,
+        'replies_received': replies,
+        'positive_replies': positive,
+        'negative_replies': totals.get(Metric.reply(ResponseType.NEGATIVE.value), 0),
+        'follow_ups_requested': follow_ups,
+        'meetings_scheduled': meetings,
+        'converted': converted,
+        'reply_rate': _rate(replies, contacted),
+        # Share of positive replies that turned into a booked meeting
+        'conversion_rate': _rate(meetings, positive),
+        # Meetings booked per reply asking to be followed up later
+        'follow_up_success_rate': _rate(meetings, follow_ups)
+    }
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def timeseries(metrics, start, end, bucket='day', user_id=None):
+    """Rollup values per time bucket for the given metrics"""
+    query = select(DailyStat.day, DailyStat.metric, func.sum(DailyStat.value)).where(
+        DailyStat.day >= start, DailyStat.day <= end, DailyStat.metric.in_(metrics)
+    ).group_by(DailyStat.day, DailyStat.metric)
+    query = _scope(query, DailyStat.user_id, user_id)
+
+    series = {}
+    for day, metric, total in db.session.execute(query):
+        key = bucket_start(_as_date(day), bucket).isoformat()
+        series.setdefault(key, Counter())[metric] += int(total)
+    return [{'bucket': key, **series[key]} for key in sorted(series)]
+
+analytics_cli = AppGroup('analytics', help='Maintain analytics rollups.')
+
+@analytics_cli.command('rebuild')
+def rebuild_command():
+    """Recompute email metrics from the email log"""
+    rows = rebuild_email_metrics()
+    click.echo(f'Rebuilt {rows} email metric row(s)')
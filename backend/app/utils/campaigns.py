@@ -0,0 +1,220 @@
+import json
+import re
+from datetime import datetime
+from sqlalchemy import select, insert, update, func
+from ..models.campaign import Campaign, CampaignStatus
+from ..models.lead import Lead
+from ..models.user import User
+from ..models.outbox import OutboundEmail, OutboxStatus, OutboxKind
+from .. import db
+from .lead_query import apply_lead_filters
+from .suppression import suppression_reasons
+
+BATCH_SIZE = 1000
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+PLACEHOLDERS = {'name', 'email', 'company_name', 'industry', 'calendly_link'}
+
+RECIPIENT_COLUMNS = (Lead.id, Lead.name, Lead.email, Lead.company_name, Lead.industry, Lead.calendly_link, Lead.status)
+
+def validate_template(template):
+    """Raise ValueError if the template uses placeholders we cannot fill"""
+    unknown = set(PLACEHOLDER_RE.findall(template)) - PLACEHOLDERS
+    if unknown:
+        raise ValueError(f'Unknown placeholders: {", ".join(sorted(unknown))}')
+
+def render_template(template, values):
+    """Replace {{placeholder}} markers; missing values render as empty strings"""
+    return PLACEHOLDER_RE.sub(lambda match: values.get(match.group(1)) or '', template)
+
+def recipients_query(filters, current_user):
+    """Leads targeted by a campaign: explicit lead_ids or the get_leads filters"""
+    query = Lead.query
+    if filters.get('lead_ids'):
+        query = query.filter(Lead.id.in_([int(lead_id) for lead_id in filters['lead_ids']]))
+    else:
+        query = apply_lead_filters(query, filters, current_user)
+    # filters may name another owner in assigned_to
+    if not current_user.role == 'admin':
+        query = query.filter(Lead.assigned_to == current_user.id)
+    return query.with_entities(*RECIPIENT_COLUMNS)
+
+def enqueue_campaign_batch(campaign, batch_size=None):
+    """Render and queue the campaign's next batch_size recipient leads; the caller commits
+
+    Leads are paged by id from enqueued_through, so a campaign is queued in
+    many short transactions, and each batch is one multi-row INSERT into the
+    outbox. Addresses already queued for the campaign are skipped, so
+    repeated addresses are only mailed once. Suppressed recipients are
+    recorded with status suppressed instead of being queued. Returns
+    (last lead id, queued, skipped, suppressed); the last lead id is None
+    once every recipient has been queued.
+    """
+    sender = db.session.get(User, campaign.created_by)
+    query = recipients_query(json.loads(campaign.filters) if campaign.filters else {}, sender)
+    leads = query.filter(Lead.id > campaign.enqueued_through).order_by(Lead.id).limit(batch_size or BATCH_SIZE).all()
+    if not leads:
+        return None, 0, 0, 0
+
+    queued_address = func.lower(func.trim(OutboundEmail.to_address))
+    seen = set(db.session.scalars(
+        select(queued_address).where(
+            OutboundEmail.campaign_id == campaign.id,
+            queued_address.in_({lead.email.strip().lower() for lead in leads})
+        )
+    ))
+    recipients = []
+    for lead in leads:
+        address = lead.email.strip().lower()
+        if address in seen:
+            continue
+        seen.add(address)
+        recipients.append(lead)
+
+    rows = []
+    now = datetime.utcnow()
+    reasons = suppression_reasons((lead.email, lead.status) for lead in recipients)
+    for lead, reason in zip(recipients, reasons):
+        values = {
+            'name': lead.name,
+            'email': lead.email,
+            'company_name': lead.company_name,
+            'industry': lead.industry,
+            'calendly_link': lead.calendly_link or sender.calendly_link
+        }
+        rows.append({
+            'kind': OutboxKind.CAMPAIGN,
+            'campaign_id': campaign.id,
+            'lead_id': lead.id,
+            'user_id': sender.id,
+            'to_address': lead.email,
+            'subject': render_template(campaign.subject_template, values)[:200],
+            'body': render_template(campaign.body_template, values),
+            'scheduled_follow_up': campaign.scheduled_follow_up,
+            'status': OutboxStatus.SUPPRESSED if reason else OutboxStatus.QUEUED,
+            'suppression_reason': reason,
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        })
+    if rows:
+        db.session.execute(insert(OutboundEmail), rows)
+    suppressed = sum(1 for reason in reasons if reason)
+    return leads[-1].id, len(rows) - suppressed, len(leads) - len(recipients), suppressed
+
+def enqueue_queued_campaigns(batch_size=None):
+    """Queue the next batch of the oldest queued campaign and commit; returns the number queued
+
+    Outbox workers call this between sends. A batch is only kept if the
+    campaign's enqueued_through is still where it started and the campaign
+    is still queued, so concurrent workers and pausing roll it back.
+    """
+    campaign = Campaign.query.filter_by(status=CampaignStatus.QUEUED).order_by(Campaign.id).first()
+    if not campaign:
+        return 0
+    started_after = campaign.enqueued_through
+    last_id, queued, skipped, _ = enqueue_campaign_batch(campaign, batch_size)
+
+    values = {
+        'total_recipients': Campaign.total_recipients + queued,
+        'skipped_recipients': Campaign.skipped_recipients + skipped
+    }
+    if last_id is None:
+        values.update(status=CampaignStatus.SENDING, enqueued_at=datetime.utcnow())
+    else:
+        values['enqueued_through'] = last_id
+    result = db.session.execute(
+        update(Campaign)
+        .where(
+            Campaign.id == campaign.id,
+            Campaign.status == CampaignStatus.QUEUED,
+            Campaign.enqueued_through == started_after
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.session.rollback()
+        return 0
+    if last_id is None:
+        complete_campaigns([campaign.id])
+    db.session.commit()
+    return queued
+
+def complete_campaigns(campaign_ids=None):
+    """Mark sending campaigns with no queued, sending or held messages left completed; the caller commits
+
+    campaign_ids limits the check to those campaigns; None checks every
+    sending campaign.
+    """
+    pending = select(OutboundEmail.id).where(
+        OutboundEmail.campaign_id == Campaign.id,
+        OutboundEmail.status.in_((OutboxStatus.QUEUED, OutboxStatus.SENDING, OutboxStatus.HELD))
+    )
+    query = update(Campaign).where(Campaign.status == CampaignStatus.SENDING, ~pending.exists())
+    if campaign_ids is not None:
+        query = query.where(Campaign.id.in_(campaign_ids))
+    return db.session.execute(
+        query.values(status=CampaignStatus.COMPLETED).execution_options(synchronize_session=False)
+    ).rowcount
+
+def create_campaign(name, subject_template, body_template, filters, current_user, scheduled_follow_up=None):
+    """Create a queued campaign; the outbox workers queue its messages. The caller commits"""
+    validate_template(subject_template)
+    validate_template(body_template)
+    # Raises for filters the workers could not apply later
+    recipients_query(filters, current_user)
+
+    campaign = Campaign(
+        name=name,
+        created_by=current_user.id,
+        subject_template=subject_template,
+        body_template=body_template,
+        filters=json.dumps(filters),
+        scheduled_follow_up=scheduled_follow_up,
+        status=CampaignStatus.QUEUED
+    )
+    db.session.add(campaign)
+    return campaign
+
+def campaign_progress(campaign):
+    """Outbox message counts by status and the share of queued recipients done"""
+    counts = dict(
+        db.session.query(OutboundEmail.status, func.count(OutboundEmail.id))
+        .filter(OutboundEmail.campaign_id == campaign.id)
+        .group_by(OutboundEmail.status)
+        .all()
+    )
+    progress = {status: counts.get(status, 0) for status in (
+        OutboxStatus.QUEUED, OutboxStatus.SENDING, OutboxStatus.HELD, OutboxStatus.SENT, OutboxStatus.FAILED,
+        OutboxStatus.SUPPRESSED
+    )}
+    pending = progress[OutboxStatus.QUEUED] + progress[OutboxStatus.SENDING] + progress[OutboxStatus.HELD]
+    progress['percent_complete'] = round(100.0 * (campaign.total_recipients - pending) / campaign.total_recipients, 1) \
+        if campaign.total_recipients else (100.0 if campaign.enqueued_at else 0.0)
+    return progress
+
+def pause_campaign(campaign):
+    """Hold every message that has not been picked up by a worker yet"""
+    # Updating the campaign first waits out a worker committing a batch for it
+    campaign.status = CampaignStatus.PAUSED
+    db.session.flush()
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.campaign_id == campaign.id, OutboundEmail.status == OutboxStatus.QUEUED)
+        .values(status=OutboxStatus.HELD)
+        .execution_options(synchronize_session=False)
+    )
+
+def resume_campaign(campaign):
+    """Release held messages back to the queue, and the campaign to the workers if not fully queued yet"""
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.campaign_id == campaign.id, OutboundEmail.status == OutboxStatus.HELD)
+        .values(status=OutboxStatus.QUEUED, next_attempt_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    campaign.status = CampaignStatus.SENDING if campaign.enqueued_at else CampaignStatus.QUEUED
+    db.session.flush()
+    # Nothing may have been held, e.g. when every message was sent before the pause
+    complete_campaigns([campaign.id])
@@ -0,0 +1,53 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from flask import Response, stream_with_context
+
+YIELD_PER = 1000
+FLUSH_SIZE = 64 * 1024
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+def iter_csv_chunks(header, rows):
+    """Encode rows as CSV, yielding ~FLUSH_SIZE byte chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_format_value(value) for value in row])
+        if buffer.tell() >= FLUSH_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Compress a chunk stream into a single gzip member on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_query(query):
+    """Iterate a column query through a server-side cursor in YIELD_PER batches"""
+    result = query.execution_options(yield_per=YIELD_PER, stream_results=True)
+    for row in result:
+        yield tuple(row)
+
+def csv_response(filename, header, rows, compress=False):
+    """Build a streaming CSV download response, optionally gzip-encoded"""
+    chunks = iter_csv_chunks(header, rows)
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Vary': 'Accept-Encoding'
+    }
+    if compress:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype='text/csv', headers=headers)
@@ -0,0 +1,23 @@
+from sqlalchemy import event
+from .. import db
+
+def _apply_pragmas(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+def configure_database(app):
+    """Apply SQLITE_PRAGMAS to every new connection of a file-backed SQLite database
+
+    WAL lets readers run alongside the single writer and busy_timeout makes a
+    writer wait for the lock instead of failing with 'database is locked'.
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    with app.app_context():
+        engine = db.engine
+    if not pragmas or engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+    event.listen(engine, 'connect', _apply_pragmas(pragmas))
@@ -0,0 +1,178 @@
+import base64
+import json
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, select, insert, delete, update, and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from ..models.lead import Lead, Note, EmailLog
+from ..models.sync import SyncVersion, SyncTombstone, SyncEntity, settled_change_version
+from .. import db
+from .lead_query import InvalidQueryParam
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+# Changes are returned in (version, rank, id) order so a page can end in the
+# middle of a version (a bulk update stamps thousands of rows with one).
+# Tombstones come first: a lead moved away and back in one transaction must
+# end up present.
+TOMBSTONE_RANK = 0
+KINDS = [
+    (1, SyncEntity.LEAD, Lead),
+    (2, SyncEntity.NOTE, Note),
+    (3, SyncEntity.EMAIL, EmailLog),
+]
+END_RANK = 4  # past every kind: the whole version has been delivered
+
+class SyncTokenExpired(Exception):
+    """The token predates tombstones that have been pruned; the client must resync"""
+
+def encode_sync_token(version, rank=END_RANK, row_id=0):
+    raw = json.dumps([version, rank, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_sync_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        version, rank, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(version), int(rank), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidQueryParam('Invalid sync token')
+
+def _after(version_column, id_column, rank, position):
+    """Rows of one kind that sort after position = (version, rank, id)"""
+    version, after_rank, row_id = position
+    if rank > after_rank:
+        return version_column >= version
+    if rank == after_rank:
+        return or_(version_column > version, and_(version_column == version, id_column > row_id))
+    return version_column > version
+
+def _scoped(query, model, current_user):
+    if current_user.role == 'admin':
+        return query
+    if model is Lead:
+        return query.where(Lead.assigned_to == current_user.id)
+    return query.join(Lead, Lead.id == model.lead_id).where(Lead.assigned_to == current_user.id)
+
+def fetch_changes(token, current_user, limit=DEFAULT_SYNC_LIMIT, include=()):
+    """Leads (and optionally notes/emails) changed or deleted after token
+
+    Without a token every visible lead is returned, page by page. Only
+    versions up to the settled one are returned, read before the rows:
+    rows of transactions still running, or committed while they are read,
+    are sent next time rather than skipped. Notes and
+    emails of a lead reassigned to the user keep their old versions; clients
+    load those with the lead's timeline.
+    """
+    current = settled_change_version(db.session.connection())
+    state = db.session.get(SyncVersion, 1)
+    if token:
+        position = decode_sync_token(token)
+        if state and position < (state.pruned_through, END_RANK, 0):
+            raise SyncTokenExpired()
+    else:
+        position = (0, END_RANK, 0)
+
+    items = []
+    for rank, entity, model in KINDS:
+        if entity != SyncEntity.LEAD and entity not in include:
+            continue
+        query = _scoped(select(model), model, current_user).where(
+            _after(model.change_version, model.id, rank, position),
+            model.change_version <= current
+        ).order_by(model.change_version, model.id).limit(limit + 1)
+        items += [((row.change_version, rank, row.id), entity, row) for row in db.session.scalars(query)]
+
+    if token:
+        query = select(SyncTombstone).where(
+            _after(SyncTombstone.version, SyncTombstone.id, TOMBSTONE_RANK, position),
+            SyncTombstone.version <= current,
+            SyncTombstone.entity.in_([SyncEntity.LEAD, *include])
+        )
+        if current_user.role == 'admin':
+            query = query.where(SyncTombstone.moved.is_(False))
+        else:
+            query = query.where(SyncTombstone.user_id == current_user.id)
+        query = query.order_by(SyncTombstone.version, SyncTombstone.id).limit(limit + 1)
+        items += [((row.version, TOMBSTONE_RANK, row.id), 'deleted', row) for row in db.session.scalars(query)]
+
+    items.sort(key=lambda item: item[0])
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    response = {'leads': [], 'deleted': {SyncEntity.LEAD: []}}
+    for entity in include:
+        response[f'{entity}s'] = []
+        response['deleted'][entity] = []
+    for key, kind, row in items:
+        if kind == 'deleted':
+            response['deleted'][row.entity].append(row.entity_id)
+        else:
+            response[f'{kind}s'].append(row.to_dict())
+
+    if has_more:
+        response['version'] = encode_sync_token(*items[-1][0])
+    else:
+        response['version'] = encode_sync_token(max(current, position[0]))
+    response['has_more'] = has_more
+    return response
+
+def record_tombstones(rows):
+    """Bulk insert tombstones from dicts with entity, entity_id, lead_id, user_id and moved"""
+    if rows:
+        now = datetime.utcnow()
+        db.session.execute(insert(SyncTombstone), [{'moved': False, **row, 'created_at': now} for row in rows])
+
+# ORM deletes and reassignments leave tombstones automatically; Core writers
+# call record_tombstones() themselves.
+
+@event.listens_for(Session, 'before_flush')
+def _collect_tombstones(session, flush_context, instances):
+    with session.no_autoflush:
+        _add_tombstones(session)
+
+def _add_tombstones(session):
+    for instance in session.deleted:
+        if isinstance(instance, Lead):
+            session.add(SyncTombstone(entity=SyncEntity.LEAD, entity_id=instance.id, lead_id=instance.id,
+                                      user_id=instance.assigned_to))
+        elif isinstance(instance, (Note, EmailLog)):
+            entity = SyncEntity.NOTE if isinstance(instance, Note) else SyncEntity.EMAIL
+            owner = session.get(Lead, instance.lead_id)
+            session.add(SyncTombstone(entity=entity, entity_id=instance.id, lead_id=instance.lead_id,
+                                      user_id=owner.assigned_to if owner else None))
+
+    for instance in session.dirty:
+        if isinstance(instance, Lead):
+            history = get_history(instance, 'assigned_to')
+            for previous in history.deleted:
+                if previous is not None and previous != instance.assigned_to:
+                    session.add(SyncTombstone(entity=SyncEntity.LEAD, entity_id=instance.id, lead_id=instance.id,
+                                              user_id=previous, moved=True))
+
+def prune_tombstones(older_than):
+    """Delete tombstones created before older_than; tokens older than them expire"""
+    horizon = db.session.scalar(
+        select(SyncTombstone.version).where(SyncTombstone.created_at < older_than)
+        .order_by(SyncTombstone.version.desc()).limit(1)
+    )
+    if horizon is None:
+        return 0
+    deleted = db.session.execute(delete(SyncTombstone).where(SyncTombstone.version <= horizon)).rowcount
+    db.session.execute(update(SyncVersion).where(SyncVersion.id == 1).values(pruned_through=horizon))
+    db.session.commit()
+    return deleted
+
+sync_cli = AppGroup('sync', help='Maintain delta sync state.')
+
+@sync_cli.command('prune')
+@click.option('--days', type=int, default=None, help='Keep tombstones this many days (default SYNC_TOMBSTONE_RETENTION_DAYS).')
+def prune_command(days):
+    """Delete old tombstones"""
+    days = days if days is not None else current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS']
+    deleted = prune_tombstones(datetime.utcnow() - timedelta(days=days))
+    click.echo(f'Deleted {deleted} tombstone(s)')
@@ -0,0 +1,386 @@
+import random
+import socket
+import threading
+import time
+import uuid
+import click
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, and_
+from ..models.lead import Lead, EmailLog, Activity
+from ..models.notification import Notification, NotificationStatus, NotificationType
+from ..models.outbox import OutboundEmail, OutboxStatus, OutboxKind
+from ..models.analytics import Metric
+from .. import db
+from .analytics import record_metrics
+from .campaigns import enqueue_queued_campaigns, complete_campaigns
+from .gmail_service import create_gmail_service, build_raw_message, get_sender
+from .pubsub import publish_notification
+from .suppression import suppression_reasons
+
+class TransientSendError(Exception):
+    """A send failure worth retrying (rate limit, 5xx, network)"""
+
+class PermanentSendError(Exception):
+    """A send failure that will not succeed on retry"""
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class GmailTransport:
+    """Sends through the Gmail API using the cached per-thread service"""
+
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+    RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+
+    def __init__(self, app):
+        self.app = app
+
+    def _service(self):
+        try:
+            with self.app.app_context():
+                return create_gmail_service()
+        except Exception as e:
+            # Usually configuration (credentials, global email); keep retrying
+            raise TransientSendError(str(e))
+
+    def send(self, sender, to, subject, body):
+        from googleapiclient.errors import HttpError
+        raw_message = build_raw_message(sender, to, subject, body)
+        try:
+            sent = self._service().users().messages().send(userId='me', body={'raw': raw_message}).execute()
+        except HttpError as e:
+            reason = e.error_details[0].get('reason') if isinstance(e.error_details, list) and e.error_details else None
+            if e.resp.status in self.RETRYABLE_STATUSES or reason in self.RETRYABLE_REASONS:
+                raise TransientSendError(str(e))
+            raise PermanentSendError(str(e))
+        except (socket.timeout, ConnectionError, OSError) as e:
+            raise TransientSendError(str(e))
+        return sent['id']
+
+class FakeTransport:
+    """In-memory transport for tests and local development"""
+
+    def __init__(self, app=None):
+        self.sent = []
+        self.failures = []
+        self.lock = threading.Lock()
+
+    def fail_next(self, count=1, transient=True):
+        """Make the next `count` sends raise"""
+        with self.lock:
+            self.failures.extend([transient] * count)
+
+    def send(self, sender, to, subject, body):
+        with self.lock:
+            if self.failures:
+                transient = self.failures.pop(0)
+                raise (TransientSendError if transient else PermanentSendError)('Simulated failure')
+            message_id = f'fake-{len(self.sent) + 1}'
+            self.sent.append({'id': message_id, 'from': sender, 'to': to, 'subject': subject, 'body': body})
+        return message_id
+
+TRANSPORTS = {
+    'gmail': GmailTransport,
+    'fake': FakeTransport
+}
+
+def get_transport(app=None):
+    """Return the app's configured transport (EMAIL_TRANSPORT), creating it once"""
+    app = app or current_app._get_current_object()
+    if 'email_transport' not in app.extensions:
+        app.extensions['email_transport'] = TRANSPORTS[app.config['EMAIL_TRANSPORT']](app)
+    return app.extensions['email_transport']
+
+def enqueue_email(to, subject, body, kind=OutboxKind.LEAD_EMAIL, lead_id=None, user_id=None,
+                  response_type=None, scheduled_follow_up=None):
+    """Add a message to the outbox; the caller commits"""
+    message = OutboundEmail(
+        kind=kind,
+        lead_id=lead_id,
+        user_id=user_id,
+        to_address=to,
+        subject=subject,
+        body=body,
+        response_type=response_type,
+        scheduled_follow_up=scheduled_follow_up,
+        status=OutboxStatus.QUEUED,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(message)
+    return message
+
+def claim_batch(batch_size, sending_timeout):
+    """Atomically mark up to batch_size due messages as ours and return them"""
+    now = datetime.utcnow()
+    token = str(uuid.uuid4())
+
+    # Messages left in 'sending' by a crashed worker go back to the queue
+    db.session.execute(
+        update(OutboundEmail)
+        .where(and_(OutboundEmail.status == OutboxStatus.SENDING, OutboundEmail.next_attempt_at < now - sending_timeout))
+        .values(status=OutboxStatus.QUEUED, claimed_by=None)
+    )
+
+    due = (
+        select(OutboundEmail.id)
+        .where(OutboundEmail.status == OutboxStatus.QUEUED, OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.next_attempt_at)
+        .limit(batch_size)
+    )
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(due), OutboundEmail.status == OutboxStatus.QUEUED)
+        # next_attempt_at doubles as the claim time for the reclaim check above
+        .values(status=OutboxStatus.SENDING, claimed_by=token, next_attempt_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return OutboundEmail.query.filter_by(claimed_by=token, status=OutboxStatus.SENDING).all()
+
+def record_sent_emails(messages, now):
+    """Write the EmailLog, Activity, Lead and follow-up rows for delivered lead emails
+
+    Everything is written with a handful of bulk statements regardless of
+    batch size. Returns ({outbox id: email log id}, [(notification id, user id)]).
+    """
+    messages = [message for message in messages if message.lead_id and message.user_id]
+    if not messages:
+        return {}, []
+
+    log_ids = db.session.execute(
+        insert(EmailLog).returning(EmailLog.id, sort_by_parameter_order=True),
+        [{
+            'lead_id': message.lead_id,
+            'user_id': message.user_id,
+            'direction': 'sent',
+            'subject': message.subject,
+            'content': message.body,
+            'response_type': message.response_type,
+            'sent_at': now,
+            'scheduled_follow_up': message.scheduled_follow_up
+        } for message in messages]
+    ).scalars().all()
+
+    db.session.execute(insert(Activity), [{
+        'lead_id': message.lead_id,
+        'user_id': message.user_id,
+        'activity_type': 'email_sent',
+        'description': f'Email sent: {message.subject}',
+        'created_at': now
+    } for message in messages])
+
+    lead_ids = {message.lead_id for message in messages}
+    first_contacts = db.session.execute(
+        select(Lead.assigned_to)
+        .where(Lead.id.in_(lead_ids), Lead.last_contact_date.is_(None))
+    ).scalars().all()
+
+    # Core writes bypass the ORM hooks, so the rollups are updated here
+    metrics = Counter((now.date(), message.user_id, Metric.EMAIL_SENT) for message in messages)
+    metrics.update((now.date(), user_id, Metric.LEAD_CONTACTED) for user_id in first_contacts)
+    record_metrics(metrics)
+
+    db.session.execute(
+        update(Lead)
+        .where(Lead.id.in_(lead_ids))
+        .values(last_contact_date=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    follow_ups = {message.lead_id: message for message in messages if message.scheduled_follow_up}
+    created = []
+    if follow_ups:
+        db.session.execute(update(Lead), [
+            {'id': lead_id, 'next_follow_up': message.scheduled_follow_up}
+            for lead_id, message in follow_ups.items()
+        ])
+        leads = {lead.id: lead for lead in db.session.execute(
+            select(Lead.id, Lead.name, Lead.company_name).where(Lead.id.in_(follow_ups))
+        )}
+        created = db.session.execute(
+            insert(Notification).returning(Notification.id, Notification.user_id),
+            [{
+                'user_id': message.user_id,
+                'lead_id': lead_id,
+                'type': NotificationType.FOLLOW_UP,
+                'title': f'Follow-up scheduled with {leads[lead_id].name}',
+                'message': f'You have scheduled a follow-up after sending an email to {leads[lead_id].name} from {leads[lead_id].company_name}.',
+                'status': NotificationStatus.UNREAD,
+                'created_at': now,
+                'scheduled_for': message.scheduled_follow_up
+            } for lead_id, message in follow_ups.items()]
+        ).all()
+
+    return {message.id: log_id for message, log_id in zip(messages, log_ids)}, created
+
+class OutboxWorker:
+    """Drains the outbox with bounded concurrency, retries and rate limiting
+
+    Sends run on a thread pool; all database writes happen on the calling
+    thread once a batch has finished.
+    """
+
+    def __init__(self, app, transport=None):
+        config = app.config
+        self.app = app
+        self.transport = transport or get_transport(app)
+        self.concurrency = config['EMAIL_WORKER_CONCURRENCY']
+        self.batch_size = config['EMAIL_WORKER_BATCH_SIZE']
+        self.max_attempts = config['EMAIL_MAX_ATTEMPTS']
+        self.retry_base = config['EMAIL_RETRY_BASE_SECONDS']
+        self.sending_timeout = timedelta(seconds=config['EMAIL_SENDING_TIMEOUT'])
+        self.bucket = TokenBucket(config['EMAIL_RATE_PER_SECOND'], config['EMAIL_RATE_BURST'])
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+
+    def _send(self, sender, message):
+        self.bucket.acquire()
+        try:
+            return message.id, self.transport.send(sender, message.to_address, message.subject, message.body), None
+        except (TransientSendError, PermanentSendError) as e:
+            return message.id, None, e
+        except Exception as e:
+            return message.id, None, PermanentSendError(str(e))
+
+    def _backoff(self, attempts):
+        delay = self.retry_base * (2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def _suppress(self, messages):
+        """Mark lead emails to suppressed recipients as such; returns (to send, suppressed count)
+
+        Recipients were checked when queued, but may have unsubscribed,
+        bounced or been marked lost since.
+        """
+        outbound = [message for message in messages if message.kind in (OutboxKind.LEAD_EMAIL, OutboxKind.CAMPAIGN)]
+        if not outbound:
+            return messages, 0
+        lead_ids = {message.lead_id for message in outbound if message.lead_id}
+        statuses = dict(db.session.execute(
+            select(Lead.id, Lead.status).where(Lead.id.in_(lead_ids))
+        ).all()) if lead_ids else {}
+
+        suppressed = set()
+        reasons = suppression_reasons([(message.to_address, statuses.get(message.lead_id)) for message in outbound])
+        for message, reason in zip(outbound, reasons):
+            if reason:
+                message.status = OutboxStatus.SUPPRESSED
+                message.suppression_reason = reason
+                message.claimed_by = None
+                suppressed.add(message.id)
+        return [message for message in messages if message.id not in suppressed], len(suppressed)
+
+    def run_once(self):
+        """Process one batch and queue one batch of campaign recipients
+
+        Returns counts of sent, retried, failed, suppressed and newly queued
+        campaign messages.
+        """
+        summary = {'sent': 0, 'retried': 0, 'failed': 0, 'suppressed': 0, 'enqueued': 0}
+        try:
+            summary['enqueued'] = enqueue_queued_campaigns()
+        except Exception as e:
+            # A campaign that cannot be queued must not stop delivery
+            db.session.rollback()
+            self.app.logger.error(f'Campaign enqueue failed: {str(e)}')
+        messages = claim_batch(self.batch_size, self.sending_timeout)
+        if not messages:
+            # Catches campaigns whose last messages two workers finished at once
+            complete_campaigns()
+            db.session.commit()
+            return summary
+
+        campaign_ids = {message.campaign_id for message in messages if message.campaign_id}
+        messages, summary['suppressed'] = self._suppress(messages)
+
+        try:
+            sender = get_sender()
+            results = list(self.executor.map(lambda message: self._send(sender, message), messages))
+        except Exception as e:
+            # Nothing can be sent without a configured sender; retry later
+            results = [(message.id, None, TransientSendError(str(e))) for message in messages]
+
+        by_id = {message.id: message for message in messages}
+        delivered = []
+        now = datetime.utcnow()
+        for message_id, gmail_message_id, error in results:
+            message = by_id[message_id]
+            message.attempts += 1
+            message.claimed_by = None
+            if error is None:
+                message.status = OutboxStatus.SENT
+                message.gmail_message_id = gmail_message_id
+                message.sent_at = now
+                message.last_error = None
+                if message.kind in (OutboxKind.LEAD_EMAIL, OutboxKind.CAMPAIGN):
+                    delivered.append(message)
+                summary['sent'] += 1
+            elif isinstance(error, TransientSendError) and message.attempts < self.max_attempts:
+                message.status = OutboxStatus.QUEUED
+                message.next_attempt_at = now + self._backoff(message.attempts)
+                message.last_error = str(error)
+                summary['retried'] += 1
+            else:
+                message.status = OutboxStatus.FAILED
+                message.last_error = str(error)
+                summary['failed'] += 1
+
+        email_log_ids, notifications = record_sent_emails(delivered, now)
+        for message_id, email_log_id in email_log_ids.items():
+            by_id[message_id].email_log_id = email_log_id
+        if campaign_ids:
+            complete_campaigns(campaign_ids)
+        db.session.commit()
+
+        for notification_id, user_id in notifications:
+            publish_notification(user_id, notification_id)
+        return summary
+
+    def run_forever(self, idle_interval):
+        while True:
+            try:
+                summary = self.run_once()
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f'Outbox batch failed: {str(e)}')
+                summary = None
+            finally:
+                db.session.remove()
+            if not summary or not any(summary.values()):
+                time.sleep(idle_interval)
+
+outbox_cli = AppGroup('outbox', help='Process the outbound email queue.')
+
+@outbox_cli.command('work')
+@click.option('--once', is_flag=True, help='Process a single batch and exit.')
+@click.option('--interval', type=float, default=None, help='Seconds to sleep when the queue is empty.')
+def work_command(once, interval):
+    """Run an outbox worker"""
+    app = current_app._get_current_object()
+    worker = OutboxWorker(app)
+    if once:
+        click.echo(worker.run_once())
+        return
+    worker.run_forever(interval or app.config['EMAIL_WORKER_IDLE_INTERVAL'])
@@ -0,0 +1,153 @@
+import time
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, exists, and_
+from ..models.lead import Lead
+from ..models.notification import Notification, NotificationStatus, NotificationType
+from ..models.outbox import OutboundEmail, OutboxStatus, OutboxKind
+from ..models.user import User
+from .. import db
+from .pubsub import publish_notification
+
+def find_due_follow_ups(now, lookahead):
+    """Leads with a follow-up in (now, now + lookahead] that have no live notification"""
+    already_notified = exists().where(and_(
+        Notification.lead_id == Lead.id,
+        Notification.type == NotificationType.FOLLOW_UP,
+        Notification.scheduled_for == Lead.next_follow_up,
+        Notification.status != NotificationStatus.DISMISSED
+    ))
+    return db.session.execute(
+        select(Lead.id, Lead.name, Lead.company_name, Lead.assigned_to, Lead.next_follow_up)
+        .where(
+            Lead.next_follow_up > now,
+            Lead.next_follow_up <= now + lookahead,
+            Lead.assigned_to.isnot(None),
+            ~already_notified
+        )
+    ).all()
+
+def create_follow_up_notifications(leads, now):
+    """Bulk insert one follow-up notification per lead; returns (id, user_id) pairs"""
+    if not leads:
+        return []
+    rows = [{
+        'user_id': lead.assigned_to,
+        'lead_id': lead.id,
+        'type': NotificationType.FOLLOW_UP,
+        'title': f'Follow-up with {lead.name}',
+        'message': f'You have a scheduled follow-up with {lead.name} from {lead.company_name}.',
+        'status': NotificationStatus.UNREAD,
+        'created_at': now,
+        'scheduled_for': lead.next_follow_up
+    } for lead in leads]
+    return db.session.execute(
+        insert(Notification).returning(Notification.id, Notification.user_id), rows
+    ).all()
+
+def find_due_reminders(now, window):
+    """Live follow-up notifications in (now, now + window] whose owner has not been emailed yet
+
+    Any notification for the lead's current follow-up counts, whichever path
+    created it (this scheduler, update_lead, bulk updates or the outbox).
+    """
+    return db.session.execute(
+        select(
+            Notification.id.label('notification_id'), Lead.id, Lead.name, Lead.company_name,
+            Lead.assigned_to, Lead.next_follow_up
+        )
+        .join(Lead, Lead.id == Notification.lead_id)
+        .where(
+            Notification.type == NotificationType.FOLLOW_UP,
+            Notification.scheduled_for > now,
+            Notification.scheduled_for <= now + window,
+            Notification.status != NotificationStatus.DISMISSED,
+            Notification.reminder_queued_at.is_(None),
+            Notification.scheduled_for == Lead.next_follow_up,
+            Lead.assigned_to.isnot(None)
+        )
+    ).all()
+
+def enqueue_reminder_emails(leads):
+    """Queue reminder emails to the owners of follow-ups that are about to happen"""
+    if not leads:
+        return 0
+    owners = dict(db.session.execute(
+        select(User.id, User.email).where(User.id.in_({lead.assigned_to for lead in leads}))
+    ).all())
+    base_url = current_app.config['BASE_URL']
+    now = datetime.utcnow()
+
+    rows = [{
+        'kind': OutboxKind.REMINDER,
+        'lead_id': lead.id,
+        'user_id': lead.assigned_to,
+        'to_address': owners[lead.assigned_to],
+        'subject': f'Reminder: Follow-up with {lead.name}',
+        'body': f'''You have a scheduled follow-up with {lead.name} from {lead.company_name}.
+
+Time: {lead.next_follow_up.strftime('%I:%M %p')}
+Date: {lead.next_follow_up.strftime('%B %d, %Y')}
+
+View lead details: {base_url}/leads/{lead.id}''',
+        'status': OutboxStatus.QUEUED,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for lead in leads]
+    db.session.execute(insert(OutboundEmail), rows)
+    return len(rows)
+
+def run_follow_up_pass(now=None):
+    """Create due follow-up notifications for every user; returns a summary dict"""
+    now = now or datetime.utcnow()
+    lookahead = timedelta(hours=current_app.config['FOLLOW_UP_LOOKAHEAD_HOURS'])
+    reminder_window = timedelta(minutes=current_app.config['FOLLOW_UP_REMINDER_MINUTES'])
+
+    leads = find_due_follow_ups(now, lookahead)
+    created = create_follow_up_notifications(leads, now)
+
+    # Reminders are tracked on the notifications, so a follow-up first seen a
+    # day ahead still gets its reminder on the pass that enters the window
+    due = find_due_reminders(now, reminder_window)
+    reminders = list({row.id: row for row in due}.values())
+    reminders_queued = enqueue_reminder_emails(reminders)
+    if due:
+        db.session.execute(
+            update(Notification)
+            .where(Notification.id.in_([row.notification_id for row in due]))
+            .values(reminder_queued_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    for notification_id, user_id in created:
+        publish_notification(user_id, notification_id)
+
+    return {'notifications_created': len(created), 'reminders_queued': reminders_queued}
+
+follow_ups_cli = AppGroup('follow-ups', help='Generate follow-up notifications.')
+
+@follow_ups_cli.command('run')
+@click.option('--once', is_flag=True, help='Run a single pass and exit.')
+@click.option('--interval', type=int, default=None, help='Seconds between passes.')
+def run_command(once, interval):
+    """Run the follow-up scheduler"""
+    interval = interval or current_app.config['FOLLOW_UP_SCHEDULER_INTERVAL']
+    while True:
+        try:
+            summary = run_follow_up_pass()
+            click.echo(
+                f'{datetime.utcnow().isoformat()} created {summary["notifications_created"]} '
+                f'notification(s), queued {summary["reminders_queued"]} reminder(s)'
+            )
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Follow-up pass failed: {str(e)}')
+        finally:
+            db.session.remove()
+        if once:
+            break
+        time.sleep(interval)
@@ -1,55 +1,157 @@
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from email.mime.text import MIMEText
 import base64
-import os
-from ..models.settings import Settings, SettingsKeys
+import httplib2
+import json
+import logging
+import threading
+import time
+from ..models.settings import SettingsKeys
+from .settings_cache import get_settings_cache
 
 SCOPES = ['https://mail.google.com/']
 SERVICE_ACCOUNT_FILE = 'credentials.json'
 
-def create_gmail_service():
-    """Create Gmail service using the global email account"""
+logger = logging.getLogger(__name__)
+
+# Process-wide client cache. The service account key and the Gmail discovery
+# document are loaded once; delegated credentials are shared per subject and
+# refreshed under a per-subject lock. googleapiclient services are not
+# thread-safe (they wrap an httplib2.Http), so each thread builds its own
+# service per subject from the shared pieces. Bumping _generation invalidates
+# every thread's copy.
+_lock = threading.Lock()
+_local = threading.local()
+_base_credentials = None
+_discovery_doc = None
+_delegated_credentials = {}
+_generation = 0
+
+_stats = {
+    'services_built': 0,
+    'service_cache_hits': 0,
+    'credential_refreshes': 0,
+    'build_seconds': 0.0,
+    'refresh_seconds': 0.0
+}
+
+def get_gmail_stats():
+    """Counters and cumulative timings for Gmail client creation"""
+    with _lock:
+        return dict(_stats)
+
+def invalidate_gmail_cache():
+    """Drop cached credentials and services (e.g. after the global email changes)"""
+    global _generation
+    with _lock:
+        _delegated_credentials.clear()
+        _generation += 1
+
+def _load_sender_settings():
+    """Return (global_email, global_email_name) from the settings cache"""
+    settings = get_settings_cache()
+    return settings.get(SettingsKeys.GLOBAL_EMAIL), settings.get(SettingsKeys.GLOBAL_EMAIL_NAME)
+
+def _get_delegated_credentials(subject):
+    global _base_credentials
+    with _lock:
+        if _base_credentials is None:
+            _base_credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE,
+                scopes=SCOPES
+            )
+        entry = _delegated_credentials.get(subject)
+        if entry is None:
+            entry = (_base_credentials.with_subject(subject), threading.Lock())
+            _delegated_credentials[subject] = entry
+    credentials, refresh_lock = entry
+
+    # Refresh once here rather than letting every thread's first request race
+    # to do it; the token request only blocks threads sending as this subject
+    if not credentials.valid:
+        with refresh_lock:
+            if not credentials.valid:
+                start = time.perf_counter()
+                credentials.refresh(Request())
+                elapsed = time.perf_counter() - start
+                with _lock:
+                    _stats['credential_refreshes'] += 1
+                    _stats['refresh_seconds'] += elapsed
+    return credentials
+
+def _get_discovery_doc():
+    global _discovery_doc
+    if _discovery_doc is None:
+        doc = get_static_doc('gmail', 'v1')
+        _discovery_doc = json.loads(doc) if doc else None
+    return _discovery_doc
+
+def _build_service(credentials):
+    http = AuthorizedHttp(credentials, http=httplib2.Http())
+    doc = _get_discovery_doc()
+    if doc is None:
+        return build('gmail', 'v1', http=http, cache_discovery=False)
+    return build_from_document(doc, http=http)
+
+def create_gmail_service(subject=None):
+    """Return a Gmail service for this thread, delegated to subject (default: the global email)"""
     try:
-        # Get global email from settings
-        global_email = Settings.query.filter_by(key=SettingsKeys.GLOBAL_EMAIL).first()
-        if not global_email or not global_email.value:
-            raise Exception("Global email not configured")
-
-        credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE,
-            scopes=SCOPES
-        )
-        
-        # Create delegated credentials for the global email
-        delegated_credentials = credentials.with_subject(global_email.value)
-        
-        # Build the Gmail service
-        service = build('gmail', 'v1', credentials=delegated_credentials)
+        if subject is None:
+            subject, _ = _load_sender_settings()
+            if not subject:
+                raise Exception("Global email not configured")
+
+        credentials = _get_delegated_credentials(subject)
+
+        cache = getattr(_local, 'services', None)
+        if cache is None or cache[0] != _generation:
+            cache = (_generation, {})
+            _local.services = cache
+
+        service = cache[1].get(subject)
+        if service is not None:
+            with _lock:
+                _stats['service_cache_hits'] += 1
+            return service
+
+        start = time.perf_counter()
+        service = _build_service(credentials)
+        elapsed = time.perf_counter() - start
+        cache[1][subject] = service
+        with _lock:
+            _stats['services_built'] += 1
+            _stats['build_seconds'] += elapsed
+        logger.debug('Built Gmail service for %s in %.1f ms', subject, elapsed * 1000)
         return service
     except Exception as e:
         raise Exception(f"Failed to create Gmail service: {str(e)}")
 
-def send_email(service, to, subject, body):
-    """Send an email using the Gmail API with global email settings"""
-    try:
-        # Get global email settings
-        global_email = Settings.query.filter_by(key=SettingsKeys.GLOBAL_EMAIL).first()
-        global_email_name = Settings.query.filter_by(key=SettingsKeys.GLOBAL_EMAIL_NAME).first()
+def get_sender():
+    """Return the From header for outgoing mail based on the global email settings"""
+    global_email, global_email_name = _load_sender_settings()
 
-        if not global_email or not global_email.value:
-            raise Exception("Global email not configured")
+    if not global_email:
+        raise Exception("Global email not configured")
 
-        sender = f"{global_email_name.value} <{global_email.value}>" if global_email_name and global_email_name.value else global_email.value
+    return f"{global_email_name} <{global_email}>" if global_email_name else global_email
 
-        message = MIMEText(body)
-        message['to'] = to
-        message['from'] = sender
-        message['subject'] = subject
+def build_raw_message(sender, to, subject, body):
+    """Build a base64url encoded MIME message as expected by the Gmail API"""
+    message = MIMEText(body)
+    message['to'] = to
+    message['from'] = sender
+    message['subject'] = subject
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+
+def send_email(service, to, subject, body):
+    """Send an email using the Gmail API with global email settings"""
+    try:
+        raw_message = build_raw_message(get_sender(), to, subject, body)
 
-        # Encode the message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
-        
         # Send the email
         sent_message = service.users().messages().send(
             userId='me',
@@ -63,22 +165,7 @@ def send_email(service, to, subject, body):
 def create_draft(service, to, subject, body):
     """Create an email draft using the Gmail API with global email settings"""
     try:
-        # Get global email settings
-        global_email = Settings.query.filter_by(key=SettingsKeys.GLOBAL_EMAIL).first()
-        global_email_name = Settings.query.filter_by(key=SettingsKeys.GLOBAL_EMAIL_NAME).first()
-
-        if not global_email or not global_email.value:
-            raise Exception("Global email not configured")
-
-        sender = f"{global_email_name.value} <{global_email.value}>" if global_email_name and global_email_name.value else global_email.value
-
-        message = MIMEText(body)
-        message['to'] = to
-        message['from'] = sender
-        message['subject'] = subject
-
-        # Encode the message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        raw_message = build_raw_message(get_sender(), to, subject, body)
         
         # Create the draft
         draft = service.users().drafts().create(
@@ -92,4 +179,4 @@ def create_draft(service, to, subject, body):
         
         return draft
     except Exception as e:
-        raise Exception(f"Failed to create draft: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Failed to create draft: {str(e)}")
\ No newline at end of file
@@ -1,11 +1,14 @@
 from .. import create_app, db
 from ..models.user import User
+from .search import create_search_index
 
 def init_db():
     app = create_app()
     with app.app_context():
         # Create tables
         db.create_all()
+        with db.engine.begin() as conn:
+            create_search_index(conn)
         
         # Check if admin user exists
         admin = User.query.filter_by(email='satya@pixeljab.com').first()
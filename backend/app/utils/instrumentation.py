@@ -0,0 +1,242 @@
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MAX_STATEMENT_LENGTH = 300
+
+# Expanded IN lists and multi-row VALUES differ only in the number of
+# placeholders; collapse them so they count as the same statement shape.
+_PLACEHOLDER_LIST = re.compile(r'(\?|%\([^)]+\)s|%s|:\w+)(\s*,\s*(\?|%\([^)]+\)s|%s|:\w+))+')
+_WHITESPACE = re.compile(r'\s+')
+
+# cProfile allows one active profiler per process (Python 3.12 raises for a
+# second), so concurrent requests are only profiled while no other one is
+_profiler_lock = threading.Lock()
+
+def statement_shape(statement):
+    return _PLACEHOLDER_LIST.sub('?...', _WHITESPACE.sub(' ', statement)).strip()
+
+class MetricsRegistry:
+    """Minimal thread-safe counters and histograms in the Prometheus text format
+
+    Values are per process; with several gunicorn workers each one reports
+    its own numbers, so scrape every worker or aggregate with labels.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ''
+        escaped = (
+            f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for key, value in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in sorted(self._meta.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{self._labels(labels)} {value}')
+            else:
+                for (metric, labels), values in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self.buckets, values):
+                        lines.append(f'{name}_bucket{self._labels(labels + (("le", bound),))} {count}')
+                    lines.append(f'{name}_bucket{self._labels(labels + (("le", "+Inf"),))} {values[-2]}')
+                    lines.append(f'{name}_count{self._labels(labels)} {values[-2]}')
+                    lines.append(f'{name}_sum{self._labels(labels)} {values[-1]}')
+        return '\n'.join(lines) + '\n'
+
+class RequestStats:
+    """SQL activity of one request, filled in by the cursor events"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+        self.shapes = Counter()
+        self.profiler = None
+        self._profiler_stopped = False
+
+    def start_profiler(self):
+        """Profile this request unless another request in the process already is"""
+        if not _profiler_lock.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool, e.g. a debugger, is active
+            _profiler_lock.release()
+            return
+        self.profiler = profiler
+
+    def stop_profiler(self):
+        """Stop profiling and let another request profile; the profile stays readable"""
+        if self.profiler and not self._profiler_stopped:
+            self._profiler_stopped = True
+            self.profiler.disable()
+            _profiler_lock.release()
+
+    def record(self, statement, seconds):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        self.statements.append((seconds, statement))
+        self.shapes[statement_shape(statement)] += 1
+
+    def slowest(self, count):
+        return [
+            {'ms': round(seconds * 1000, 2), 'statement': statement[:MAX_STATEMENT_LENGTH]}
+            for seconds, statement in sorted(self.statements, key=lambda item: item[0], reverse=True)[:count]
+        ]
+
+    def repeated(self, threshold):
+        """Statement shapes executed more than threshold times (likely N+1)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+def _current_stats():
+    return g.get('_instrumentation') if has_request_context() else None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get('_query_started')
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def init_instrumentation(app):
+    """Opt-in request timing, SQL statistics, N+1 detection, /metrics and slow-request profiles"""
+    if not app.config.get('INSTRUMENTATION_ENABLED'):
+        return
+
+    slow_statements = app.config['INSTRUMENTATION_SLOW_STATEMENTS']
+    n_plus_one_threshold = app.config['INSTRUMENTATION_N_PLUS_ONE_THRESHOLD']
+    slow_request_seconds = app.config['INSTRUMENTATION_SLOW_REQUEST_MS'] / 1000
+    profile_seconds = (app.config.get('INSTRUMENTATION_PROFILE_THRESHOLD_MS') or 0) / 1000
+    profile_dir = app.config['INSTRUMENTATION_PROFILE_DIR']
+    metrics_token = app.config.get('INSTRUMENTATION_METRICS_TOKEN')
+
+    registry = MetricsRegistry()
+    registry.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status.')
+    registry.describe('http_request_duration_seconds', 'histogram', 'Request wall time (until the response is returned).')
+    registry.describe('db_statements_total', 'counter', 'SQL statements executed while handling requests.')
+    registry.describe('db_statement_seconds_total', 'counter', 'Time spent in SQL statements while handling requests.')
+    registry.describe('db_n_plus_one_total', 'counter', 'Requests that repeated one statement shape more than the threshold.')
+    app.extensions['metrics'] = registry
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request():
+        stats = g._instrumentation = RequestStats()
+        if profile_seconds:
+            stats.start_profiler()
+
+    @app.after_request
+    def finish_request(response):
+        stats = g.pop('_instrumentation', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        stats.stop_profiler()
+
+        endpoint = _endpoint_label()
+        labels = {'endpoint': endpoint, 'method': request.method}
+        registry.inc('http_requests_total', {**labels, 'status': response.status_code})
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        registry.inc('db_statements_total', labels, stats.sql_count)
+        registry.inc('db_statement_seconds_total', labels, stats.sql_seconds)
+
+        response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}, db;dur={stats.sql_seconds * 1000:.1f}'
+        response.headers['X-SQL-Count'] = str(stats.sql_count)
+
+        repeated = stats.repeated(n_plus_one_threshold)
+        if repeated:
+            registry.inc('db_n_plus_one_total', labels)
+            shape, count = repeated[0]
+            logger.warning('Possible N+1 in %s %s: %d x %s', request.method, endpoint, count, shape[:MAX_STATEMENT_LENGTH])
+
+        if elapsed >= slow_request_seconds:
+            logger.warning(
+                'Slow request %s %s: %.1f ms, %d statements in %.1f ms, slowest: %s',
+                request.method, request.path, elapsed * 1000, stats.sql_count,
+                stats.sql_seconds * 1000, stats.slowest(slow_statements)
+            )
+
+        if stats.profiler and elapsed >= profile_seconds:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_') or 'root'
+            path = os.path.join(profile_dir, f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.method}-{name}-{elapsed * 1000:.0f}ms.prof')
+            stats.profiler.dump_stats(path)
+            logger.warning('Profile of %s %s written to %s', request.method, request.path, path)
+        return response
+
+    @app.teardown_request
+    def discard_request(exc):
+        # after_request does not run for unhandled exceptions
+        stats = g.pop('_instrumentation', None)
+        if stats is not None:
+            stats.stop_profiler()
+
+    @app.route('/metrics')
+    def metrics():
+        if metrics_token and request.headers.get('Authorization') != f'Bearer {metrics_token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,149 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, insert, update, func, or_
+from ..models.analytics import Metric
+from ..models.lead import Lead, LeadStatus
+from ..models.notification import Notification, NotificationStatus, NotificationType
+from ..models.user import User
+from ..models.sync import SyncEntity
+from .. import db
+from .analytics import record_metrics
+from .delta_sync import record_tombstones
+from .lead_query import apply_lead_filters, InvalidQueryParam
+
+MAX_BULK_IDS = 10000
+STATUSES = {status.value for status in LeadStatus}
+
+def parse_bulk_changes(changes):
+    """Validate the 'changes' object of a bulk update; returns column -> value"""
+    if not isinstance(changes, dict) or not changes:
+        raise InvalidQueryParam('changes must be a non-empty object')
+
+    unknown = set(changes) - {'status', 'assigned_to', 'next_follow_up'}
+    if unknown:
+        raise InvalidQueryParam(f'Unsupported fields: {", ".join(sorted(unknown))}')
+
+    values = {}
+    if 'status' in changes:
+        if changes['status'] not in STATUSES:
+            raise InvalidQueryParam('Invalid status')
+        values['status'] = changes['status']
+
+    if 'assigned_to' in changes:
+        assignee = db.session.get(User, changes['assigned_to']) if isinstance(changes['assigned_to'], int) else None
+        if not assignee or not assignee.is_active:
+            raise InvalidQueryParam('Assigned user not found')
+        values['assigned_to'] = assignee.id
+
+    if 'next_follow_up' in changes:
+        try:
+            values['next_follow_up'] = datetime.fromisoformat(changes['next_follow_up']) if changes['next_follow_up'] else None
+        except (TypeError, ValueError):
+            raise InvalidQueryParam('Invalid next_follow_up')
+
+    return values
+
+def select_target_ids(data, current_user):
+    """Build the SELECT of lead ids a bulk request targets ('lead_ids' or 'filters')
+
+    Returns (statement, requested_ids). Non-admins are always limited to their
+    own leads; with an explicit id list the caller compares how many ids
+    survived that restriction against how many were asked for.
+    """
+    statement = select(Lead.id)
+    requested = None
+
+    if data.get('lead_ids') is not None:
+        lead_ids = data['lead_ids']
+        if not isinstance(lead_ids, list) or not all(isinstance(lead_id, int) for lead_id in lead_ids):
+            raise InvalidQueryParam('lead_ids must be a list of integers')
+        if len(lead_ids) > MAX_BULK_IDS:
+            raise InvalidQueryParam(f'At most {MAX_BULK_IDS} lead_ids per request')
+        requested = set(lead_ids)
+        statement = statement.where(Lead.id.in_(requested))
+    elif isinstance(data.get('filters'), dict):
+        statement = apply_lead_filters(statement, data['filters'], current_user)
+    else:
+        raise InvalidQueryParam('Provide lead_ids or filters')
+
+    if not current_user.role == 'admin':
+        statement = statement.where(Lead.assigned_to == current_user.id)
+    return statement, requested
+
+def count_targets(statement):
+    return db.session.scalar(select(func.count()).select_from(statement.subquery()))
+
+def bulk_update_leads(target_ids, values, now=None):
+    """Apply values to every targeted lead with one UPDATE; the caller commits
+
+    Mirrors update_lead: a lead whose follow-up moves gets a follow-up
+    notification for its (possibly new) owner. Returns (updated count,
+    [(notification id, user id)]).
+    """
+    now = now or datetime.utcnow()
+    targeted = Lead.id.in_(target_ids.scalar_subquery())
+    new_owner = values.get('assigned_to')
+
+    # Read what the UPDATE is about to change before it runs
+    if values.get('status'):
+        moved = db.session.execute(
+            select(Lead.assigned_to, func.count())
+            .where(targeted, or_(Lead.status.is_(None), Lead.status != values['status']))
+            .group_by(Lead.assigned_to)
+        ).all()
+        metrics = Counter()
+        for assigned_to, count in moved:
+            metrics[(now.date(), new_owner or assigned_to, Metric.status(values['status']))] += count
+        record_metrics(metrics)
+
+    follow_up = values.get('next_follow_up')
+    rescheduled = []
+    if follow_up:
+        rescheduled = db.session.execute(
+            select(Lead.id, Lead.name, Lead.company_name, Lead.assigned_to)
+            .where(targeted, or_(Lead.next_follow_up.is_(None), Lead.next_follow_up != follow_up))
+        ).all()
+
+    if new_owner:
+        # Previous owners' synced lists drop the leads that move away from them
+        record_tombstones([
+            {'entity': SyncEntity.LEAD, 'entity_id': lead_id, 'lead_id': lead_id, 'user_id': owner, 'moved': True}
+            for lead_id, owner in db.session.execute(
+                select(Lead.id, Lead.assigned_to).where(targeted, Lead.assigned_to != new_owner)
+            )
+        ])
+
+        # Pending follow-up reminders move with the lead to its new owner
+        db.session.execute(
+            update(Notification)
+            .where(
+                Notification.lead_id.in_(target_ids.scalar_subquery()),
+                Notification.type == NotificationType.FOLLOW_UP,
+                Notification.status == NotificationStatus.UNREAD,
+                Notification.user_id != new_owner
+            )
+            .values(user_id=new_owner)
+            .execution_options(synchronize_session=False)
+        )
+
+    updated = db.session.execute(
+        update(Lead).where(targeted).values(**values).execution_options(synchronize_session=False)
+    ).rowcount
+
+    rows = [{
+        'user_id': new_owner or lead.assigned_to,
+        'lead_id': lead.id,
+        'type': NotificationType.FOLLOW_UP,
+        'title': f'Follow-up scheduled with {lead.name}',
+        'message': f'You have scheduled a follow-up with {lead.name} from {lead.company_name}.',
+        'status': NotificationStatus.UNREAD,
+        'created_at': now,
+        'scheduled_for': follow_up
+    } for lead in rescheduled if new_owner or lead.assigned_to]
+    created = []
+    if rows:
+        created = db.session.execute(
+            insert(Notification).returning(Notification.id, Notification.user_id), rows
+        ).all()
+
+    return updated, created
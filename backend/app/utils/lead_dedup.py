@@ -0,0 +1,302 @@
+import re
+import unicodedata
+import click
+from collections import defaultdict
+from datetime import datetime
+from flask.cli import AppGroup
+from sqlalchemy import event, select, insert, update, delete, func, bindparam
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from ..models.lead import Lead, Note, Activity, EmailLog, LeadMatchKey, LeadStatus
+from ..models.notification import Notification, NotificationStatus, NotificationType
+from ..models.outbox import OutboundEmail
+from ..models.sync import SyncEntity
+from .. import db
+from .delta_sync import record_tombstones
+
+# Name keys on these domains would join unrelated people who share a name
+FREE_MAIL_DOMAINS = {
+    'gmail.com', 'googlemail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'live.com',
+    'aol.com', 'icloud.com', 'me.com', 'protonmail.com', 'gmx.com', 'mail.com'
+}
+LEGAL_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company',
+    'gmbh', 'ag', 'sa', 'sarl', 'bv', 'nv', 'plc', 'pty', 'srl', 'the'
+}
+# Merged leads keep the most advanced status in the cluster
+STATUS_ORDER = [
+    LeadStatus.NEW, LeadStatus.NO_RESPONSE, LeadStatus.LOST, LeadStatus.NOT_INTERESTED,
+    LeadStatus.INTERESTED, LeadStatus.SCHEDULED, LeadStatus.CONVERTED
+]
+STATUS_RANK = {status.value: rank for rank, status in enumerate(STATUS_ORDER)}
+REPOINTED = [Note, Activity, EmailLog, OutboundEmail]
+MERGE_BATCH_SIZE = 500
+
+def _tokens(value):
+    value = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode('ascii')
+    return re.findall(r'[a-z0-9]+', value.lower())
+
+def normalize_email(email):
+    """Lower-case, drop +tags, and dots for Gmail, which ignores them"""
+    local, _, domain = (email or '').strip().lower().partition('@')
+    local = local.split('+', 1)[0]
+    if domain in ('gmail.com', 'googlemail.com'):
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f'{local}@{domain}'
+
+def normalize_name(name):
+    """Order-insensitive name key, so 'Smith, John' matches 'John Smith'"""
+    return ' '.join(sorted(_tokens(name)))
+
+def company_key(company_name):
+    return ' '.join(token for token in _tokens(company_name) if token not in LEGAL_SUFFIXES)
+
+def match_keys(name, email, company_name):
+    """Blocking keys for a lead; two leads sharing any key are duplicates"""
+    email = normalize_email(email)
+    keys = [f'e:{email}']
+    name_key = normalize_name(name)
+    # A single word ("John", "Sales") says too little about who it is
+    if ' ' in name_key:
+        domain = email.rpartition('@')[2]
+        if domain and domain not in FREE_MAIL_DOMAINS:
+            keys.append(f'd:{domain}|{name_key}')
+        company = company_key(company_name)
+        if company:
+            keys.append(f'c:{company}|{name_key}')
+    return [key[:255] for key in keys]
+
+def index_leads(leads):
+    """Insert the match keys of (id, name, email, company_name) rows in one statement"""
+    rows = [
+        {'lead_id': lead.id, 'key': key}
+        for lead in leads
+        for key in match_keys(lead.name, lead.email, lead.company_name)
+    ]
+    if rows:
+        db.session.execute(insert(LeadMatchKey), rows)
+    return len(rows)
+
+def rebuild_match_keys(batch_size=5000):
+    """Recompute lead_match_keys for the whole leads table"""
+    db.session.execute(delete(LeadMatchKey))
+    last_id = 0
+    indexed = 0
+    while True:
+        leads = db.session.execute(
+            select(Lead.id, Lead.name, Lead.email, Lead.company_name)
+            .where(Lead.id > last_id).order_by(Lead.id).limit(batch_size)
+        ).all()
+        if not leads:
+            break
+        index_leads(leads)
+        indexed += len(leads)
+        last_id = leads[-1].id
+    db.session.commit()
+    return indexed
+
+def find_matches(candidates):
+    """For each (name, email, company_name), the ids of existing leads it duplicates
+
+    One indexed IN query on lead_match_keys for the whole list.
+    """
+    keys = [match_keys(*candidate) for candidate in candidates]
+    all_keys = {key for candidate_keys in keys for key in candidate_keys}
+    if not all_keys:
+        return [set() for _ in candidates]
+    by_key = defaultdict(set)
+    for key, lead_id in db.session.execute(
+        select(LeadMatchKey.key, LeadMatchKey.lead_id).where(LeadMatchKey.key.in_(all_keys))
+    ):
+        by_key[key].add(lead_id)
+    return [set().union(*(by_key.get(key, ()) for key in candidate_keys)) for candidate_keys in keys]
+
+def find_duplicate_clusters():
+    """Groups of lead ids (sorted, two or more) connected through shared match keys
+
+    Only keys held by more than one lead are read, grouped by the index on
+    key; clusters are the connected components, found with union-find, so
+    the whole pass is close to linear in the number of leads.
+    """
+    shared = select(LeadMatchKey.key).group_by(LeadMatchKey.key).having(func.count() > 1)
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    first_by_key = {}
+    for key, lead_id in db.session.execute(
+        select(LeadMatchKey.key, LeadMatchKey.lead_id).where(LeadMatchKey.key.in_(shared))
+    ):
+        first = first_by_key.setdefault(key, lead_id)
+        a, b = find(first), find(lead_id)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    clusters = defaultdict(list)
+    for lead_id in parent:
+        clusters[find(lead_id)].append(lead_id)
+    return sorted(sorted(members) for members in clusters.values() if len(members) > 1)
+
+def _merged_values(survivor, others):
+    leads = [survivor] + others
+    values = {'survivor_id': survivor.id}
+    for field in ('industry', 'calendly_link'):
+        values[field] = getattr(survivor, field) or next((getattr(lead, field) for lead in others if getattr(lead, field)), None)
+    contacts = [lead.last_contact_date for lead in leads if lead.last_contact_date]
+    values['last_contact_date'] = max(contacts) if contacts else None
+    follow_ups = [lead.next_follow_up for lead in leads if lead.next_follow_up]
+    values['next_follow_up'] = min(follow_ups) if follow_ups else None
+    values['status'] = max((lead.status for lead in leads), key=lambda status: STATUS_RANK.get(status, -1))
+    values['assigned_to'] = survivor.assigned_to or next((lead.assigned_to for lead in others if lead.assigned_to), None)
+    return values
+
+def merge_clusters(clusters, acting_user_id=None, now=None):
+    """Merge each cluster into its oldest lead with a fixed number of bulk statements
+
+    Notes, activities, emails, outbox messages and notifications are moved
+    to the surviving lead (unread follow-up reminders also to its owner),
+    the other leads are deleted with tombstones for delta sync, and a
+    lead_merged activity is added. The caller commits. Returns the merged
+    leads as {survivor id: [merged ids]}.
+    """
+    now = now or datetime.utcnow()
+    ids = {lead_id for cluster in clusters for lead_id in cluster}
+    leads = {lead.id: lead for lead in db.session.execute(select(Lead).where(Lead.id.in_(ids))).scalars()}
+
+    survivors = []
+    moves = []
+    merged = {}
+    for cluster in clusters:
+        members = sorted((leads[lead_id] for lead_id in cluster if lead_id in leads), key=lambda lead: (lead.created_at, lead.id))
+        if len(members) < 2:
+            continue
+        survivor, others = members[0], members[1:]
+        values = _merged_values(survivor, others)
+        survivors.append(values)
+        moves += [{'old': lead.id, 'new': survivor.id, 'owner': values['assigned_to']} for lead in others]
+        merged[survivor.id] = (values, others)
+    if not merged:
+        return {}
+
+    # SET columns come from the keys of each parameter dict
+    leads_table = Lead.__table__
+    connection = db.session.connection()
+    connection.execute(
+        update(leads_table).where(leads_table.c.id == bindparam('survivor_id')),
+        [{**values, 'updated_at': now} for values in survivors]
+    )
+
+    notifications = Notification.__table__
+    owned_moves = [move for move in moves if move['owner']]
+    if owned_moves:
+        connection.execute(
+            update(notifications)
+            .where(
+                notifications.c.lead_id == bindparam('old'),
+                notifications.c.type == NotificationType.FOLLOW_UP,
+                notifications.c.status == NotificationStatus.UNREAD
+            )
+            .values(lead_id=bindparam('new'), user_id=bindparam('owner')),
+            owned_moves
+        )
+    for table in [notifications] + [model.__table__ for model in REPOINTED]:
+        connection.execute(
+            update(table).where(table.c.lead_id == bindparam('old')).values(lead_id=bindparam('new')),
+            moves
+        )
+
+    merged_ids = [move['old'] for move in moves]
+    record_tombstones([
+        {'entity': SyncEntity.LEAD, 'entity_id': lead.id, 'lead_id': lead.id, 'user_id': lead.assigned_to}
+        for values, others in merged.values() for lead in others
+    ])
+    db.session.execute(delete(LeadMatchKey).where(LeadMatchKey.lead_id.in_(merged_ids)))
+    db.session.execute(delete(Lead).where(Lead.id.in_(merged_ids)).execution_options(synchronize_session=False))
+
+    activities = [{
+        'lead_id': survivor_id,
+        'user_id': acting_user_id or values['assigned_to'],
+        'activity_type': 'lead_merged',
+        'description': 'Merged duplicate lead(s): ' + ', '.join(f'{lead.name} <{lead.email}>' for lead in others),
+        'created_at': now
+    } for survivor_id, (values, others) in merged.items() if acting_user_id or values['assigned_to']]
+    if activities:
+        db.session.execute(insert(Activity), activities)
+
+    # The Core statements bypassed the identity map
+    deleted = set(merged_ids)
+    result = {survivor_id: [lead.id for lead in others] for survivor_id, (values, others) in merged.items()}
+    for lead in leads.values():
+        if lead.id in result:
+            db.session.expire(lead)
+        elif lead.id in deleted:
+            db.session.expunge(lead)
+    return result
+
+def merge_all_duplicates(acting_user_id=None, batch_size=MERGE_BATCH_SIZE):
+    """Find every duplicate cluster and merge it, committing per batch of clusters"""
+    clusters = find_duplicate_clusters()
+    merged = 0
+    for start in range(0, len(clusters), batch_size):
+        result = merge_clusters(clusters[start:start + batch_size], acting_user_id)
+        merged += sum(len(ids) for ids in result.values())
+        db.session.commit()
+    return len(clusters), merged
+
+# ORM writes keep lead_match_keys current; Core inserts call index_leads()
+
+@event.listens_for(Session, 'before_flush')
+def _unindex_changed_leads(session, flush_context, instances):
+    stale = [lead.id for lead in session.deleted if isinstance(lead, Lead)]
+    for lead in session.dirty:
+        if isinstance(lead, Lead) and any(
+            get_history(lead, field).has_changes() for field in ('name', 'email', 'company_name')
+        ):
+            stale.append(lead.id)
+            session.info.setdefault('reindex_leads', set()).add(lead)
+    if stale:
+        session.execute(delete(LeadMatchKey).where(LeadMatchKey.lead_id.in_(stale)))
+
+@event.listens_for(Session, 'after_flush')
+def _index_new_leads(session, flush_context):
+    leads = [lead for lead in session.new if isinstance(lead, Lead)]
+    leads += session.info.pop('reindex_leads', ())
+    rows = [
+        {'lead_id': lead.id, 'key': key}
+        for lead in leads
+        for key in match_keys(lead.name, lead.email, lead.company_name)
+    ]
+    if rows:
+        session.connection().execute(insert(LeadMatchKey), rows)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_reindex(session):
+    session.info.pop('reindex_leads', None)
+
+dedup_cli = AppGroup('dedup', help='Find and merge duplicate leads.')
+
+@dedup_cli.command('index')
+def index_command():
+    """Rebuild the match keys of every lead"""
+    click.echo(f'Indexed {rebuild_match_keys()} lead(s)')
+
+@dedup_cli.command('find')
+@click.option('--show', type=int, default=20, help='Clusters to print.')
+def find_command(show):
+    """Report duplicate clusters without changing anything"""
+    clusters = find_duplicate_clusters()
+    click.echo(f'{len(clusters)} cluster(s), {sum(len(cluster) - 1 for cluster in clusters)} duplicate lead(s)')
+    for cluster in clusters[:show]:
+        click.echo(' '.join(str(lead_id) for lead_id in cluster))
+
+@dedup_cli.command('merge')
+def merge_command():
+    """Merge every duplicate cluster into its oldest lead"""
+    clusters, merged = merge_all_duplicates()
+    click.echo(f'Merged {merged} lead(s) in {clusters} cluster(s)')
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from itertools import islice
+from collections import namedtuple
+from sqlalchemy import insert
+from ..models.lead import Lead, LeadStatus
+from .. import db
+from .lead_dedup import match_keys, find_matches, index_leads
+
+BATCH_SIZE = 1000
+BATCHES_PER_TRANSACTION = 20
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_FIELDS = ('name', 'email', 'company_name')
+OPTIONAL_FIELDS = ('industry', 'calendly_link')
+FIELD_LIMITS = {'name': 100, 'email': 120, 'company_name': 100, 'industry': 50, 'calendly_link': 255}
+
+# Deliberately simple: full RFC/IDNA validation costs more than the insert itself
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s.]+$')
+
+def iter_csv(stream):
+    """Yield dict rows from a binary CSV stream without reading it all at once"""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text_stream):
+        yield {(key or '').strip().lower(): value for key, value in row.items()}
+
+def iter_ndjson(stream):
+    """Yield dict rows from a binary newline-delimited JSON stream"""
+    for line in io.TextIOWrapper(stream, encoding='utf-8'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {'__invalid__': line[:100]}
+
+def clean_row(row):
+    """Validate and normalize one input row; returns (values, error)"""
+    if '__invalid__' in row:
+        return None, 'Invalid JSON object'
+
+    values = {}
+    for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        value = row.get(field)
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            if field in REQUIRED_FIELDS:
+                return None, f'Missing {field}'
+            continue
+        if len(value) > FIELD_LIMITS[field]:
+            return None, f'{field} is longer than {FIELD_LIMITS[field]} characters'
+        values[field] = value
+
+    if not EMAIL_RE.match(values['email']):
+        return None, 'Invalid email'
+    values['email'] = values['email'].lower()
+    return values, None
+
+IndexedLead = namedtuple('IndexedLead', 'id name email company_name')
+
+def import_leads(rows, assigned_to):
+    """Validate, de-duplicate and bulk insert lead rows; returns a report dict
+
+    Rows are processed in batches of BATCH_SIZE: each batch costs one
+    duplicate lookup against lead_match_keys, one multi-row INSERT and one
+    insert of the new leads' match keys, and the transaction is committed
+    every BATCHES_PER_TRANSACTION batches. A row is a duplicate when it
+    shares a match key (see lead_dedup) with an existing or earlier row.
+    """
+    report = {'imported': 0, 'duplicates': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    seen = set()
+    numbered = enumerate(rows, start=1)
+    pending_batches = 0
+
+    def record_error(row_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': row_number, 'error': message})
+        else:
+            report['errors_truncated'] = True
+
+    while True:
+        chunk = list(islice(numbered, BATCH_SIZE))
+        if not chunk:
+            break
+
+        candidates = []
+        for row_number, row in chunk:
+            values, error = clean_row(row)
+            if error:
+                record_error(row_number, error)
+                continue
+            keys = match_keys(values['name'], values['email'], values['company_name'])
+            if seen.intersection(keys):
+                report['duplicates'] += 1
+            else:
+                seen.update(keys)
+                candidates.append(values)
+
+        matches = find_matches([(values['name'], values['email'], values['company_name']) for values in candidates])
+        now = datetime.utcnow()
+        batch = []
+        for values, existing in zip(candidates, matches):
+            if existing:
+                report['duplicates'] += 1
+                continue
+            values.setdefault('industry', None)
+            values.setdefault('calendly_link', None)
+            values.update(status=LeadStatus.NEW.value, assigned_to=assigned_to, created_at=now, updated_at=now)
+            batch.append(values)
+
+        if batch:
+            ids = db.session.execute(
+                insert(Lead).returning(Lead.id, sort_by_parameter_order=True), batch
+            ).scalars().all()
+            index_leads([
+                IndexedLead(lead_id, values['name'], values['email'], values['company_name'])
+                for lead_id, values in zip(ids, batch)
+            ])
+            report['imported'] += len(batch)
+            pending_batches += 1
+
+        if pending_batches >= BATCHES_PER_TRANSACTION:
+            db.session.commit()
+            pending_batches = 0
+
+    db.session.commit()
+    return report
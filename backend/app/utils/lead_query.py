@@ -0,0 +1,141 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import or_, and_, func
+from ..models.lead import Lead
+from .search import search_filter
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Columns a client may request through ?fields=; id and created_at are always
+# selected because the keyset cursor is built from them.
+LEAD_FIELDS = {
+    'id': Lead.id,
+    'name': Lead.name,
+    'email': Lead.email,
+    'company_name': Lead.company_name,
+    'industry': Lead.industry,
+    'status': Lead.status,
+    'assigned_to': Lead.assigned_to,
+    'created_at': Lead.created_at,
+    'updated_at': Lead.updated_at,
+    'last_contact_date': Lead.last_contact_date,
+    'next_follow_up': Lead.next_follow_up,
+    'calendly_link': Lead.calendly_link
+}
+
+class InvalidQueryParam(ValueError):
+    """Raised when a lead list query parameter cannot be parsed"""
+
+def apply_lead_filters(query, args, current_user):
+    """Apply the search/status/date/assigned_to filters used by the lead list"""
+    search = args.get('search', '')
+    status = args.get('status', '')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    assigned_to = args.get('assigned_to')
+
+    if search:
+        query = query.filter(search_filter(search))
+
+    if status:
+        query = query.filter(Lead.status == status)
+
+    if start_date and end_date:
+        try:
+            query = query.filter(and_(
+                Lead.created_at >= datetime.fromisoformat(start_date),
+                Lead.created_at <= datetime.fromisoformat(end_date)
+            ))
+        except ValueError:
+            raise InvalidQueryParam('Invalid start_date or end_date')
+
+    if assigned_to:
+        query = query.filter(Lead.assigned_to == assigned_to)
+    # Members only see their own leads, whatever assigned_to asks for
+    if not current_user.role == 'admin':
+        query = query.filter(Lead.assigned_to == current_user.id)
+
+    return query
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp the requested page size to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidQueryParam('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+def parse_fields(value):
+    """Turn ?fields=a,b into an ordered list of column names, or None for all"""
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in LEAD_FIELDS]
+    if unknown:
+        raise InvalidQueryParam(f'Unknown fields: {", ".join(unknown)}')
+    for required in ('id', 'created_at'):
+        if required not in fields:
+            fields.append(required)
+    return fields
+
+def encode_cursor(created_at, lead_id):
+    """Encode the (created_at, id) position of the last row on a page"""
+    raw = json.dumps([created_at.isoformat(), lead_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, lead_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(lead_id)
+    except (ValueError, TypeError):
+        raise InvalidQueryParam('Invalid cursor')
+
+def apply_keyset(query, cursor):
+    """Restrict a newest-first lead query to rows after the given cursor"""
+    query = query.order_by(Lead.created_at.desc(), Lead.id.desc())
+    if cursor:
+        created_at, lead_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Lead.created_at < created_at,
+            and_(Lead.created_at == created_at, Lead.id < lead_id)
+        ))
+    return query
+
+def count_leads(query):
+    """Count the rows matched by a filtered lead query without loading them"""
+    return query.order_by(None).with_entities(func.count(Lead.id)).scalar()
+
+def serialize_row(row, fields):
+    """Serialize a projected row the same way Lead.to_dict() would"""
+    result = {}
+    for field in fields:
+        value = getattr(row, field)
+        result[field] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+def fetch_page(query, limit, cursor=None, fields=None):
+    """Fetch one keyset page; returns (serialized rows, next cursor or None)"""
+    query = apply_keyset(query, cursor)
+    if fields:
+        query = query.with_entities(*[LEAD_FIELDS[field] for field in fields])
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if fields:
+        items = [serialize_row(row, fields) for row in rows]
+    else:
+        items = [row.to_dict() for row in rows]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
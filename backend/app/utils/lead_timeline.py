@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
+from ..models.lead import Lead, Note, Activity, EmailLog
+from .. import db
+from .lead_query import InvalidQueryParam
+
+def _child_version(model, changed_column):
+    """Row count and latest change of a lead's children, as two scalar subqueries"""
+    where = model.lead_id == Lead.id
+    return (
+        select(func.count(model.id)).where(where).scalar_subquery(),
+        select(func.max(changed_column)).where(where).scalar_subquery()
+    )
+
+def get_timeline_version(lead_id):
+    """Return (assigned_to, etag) for a lead in one query, or None if it does not exist
+
+    Covers the lead row and every note, email and activity attached to it, so
+    the timeline only has to be loaded when the ETag has changed.
+    """
+    row = db.session.execute(
+        select(
+            Lead.assigned_to,
+            Lead.updated_at,
+            *_child_version(Note, Note.updated_at),
+            # Relabelling changes an email without adding one; change_version covers it
+            *_child_version(EmailLog, EmailLog.change_version),
+            *_child_version(Activity, Activity.id)
+        ).where(Lead.id == lead_id)
+    ).first()
+    if row is None:
+        return None
+    digest = hashlib.sha1(json.dumps([lead_id, *row[1:]], default=str).encode('utf-8')).hexdigest()
+    return row.assigned_to, digest
+
+def load_lead_with_history(lead_id):
+    """Load a lead and its notes, emails and activities in four queries"""
+    return db.session.execute(
+        select(Lead)
+        .options(selectinload(Lead.notes), selectinload(Lead.emails), selectinload(Lead.activities))
+        .where(Lead.id == lead_id)
+    ).scalar_one()
+
+def build_timeline(lead):
+    """Merge a loaded lead's history into one list, newest first"""
+    items = [('note', note.created_at, note) for note in lead.notes]
+    items += [('email', email.sent_at, email) for email in lead.emails]
+    items += [('activity', activity.created_at, activity) for activity in lead.activities]
+    items.sort(key=lambda item: (item[1] or datetime.min, item[0], item[2].id), reverse=True)
+    return items
+
+def encode_timeline_cursor(item):
+    kind, timestamp, record = item
+    payload = json.dumps([(timestamp or datetime.min).isoformat(), kind, record.id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_timeline_cursor(cursor):
+    try:
+        timestamp, kind, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(timestamp), kind, int(record_id)
+    except (ValueError, TypeError):
+        raise InvalidQueryParam('Invalid cursor')
+
+def paginate_timeline(items, limit, cursor=None):
+    """Slice a timeline after the cursor position; returns (page, next_cursor)"""
+    if cursor:
+        position = decode_timeline_cursor(cursor)
+        items = [
+            item for item in items
+            if (item[1] or datetime.min, item[0], item[2].id) < position
+        ]
+    page = items[:limit]
+    next_cursor = encode_timeline_cursor(page[-1]) if len(items) > limit else None
+    return [{
+        'type': kind,
+        'timestamp': timestamp.isoformat() if timestamp else None,
+        'data': record.to_dict()
+    } for kind, timestamp, record in page], next_cursor
@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from flask import current_app, has_app_context
+
+DEFAULT_ROUNDS = 12
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes already waiting; the caller should answer 503"""
+
+# Module-level functions so they can run in the worker processes
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _verify(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+class PasswordHasher:
+    """Runs bcrypt in a small process pool so request threads only wait on it
+
+    At most max_pending hashes are queued or running; beyond that callers get
+    PasswordHasherBusy instead of piling up behind a saturated CPU. With
+    workers=0 hashing happens inline (tests, scripts).
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=2, max_pending=None, timeout=10):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, workers) * 4)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Pools do not survive a fork (gunicorn workers), so build one per process
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method)
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, hashed):
+        return self._run(_verify, password, hashed)
+
+    def needs_rehash(self, hashed):
+        """Whether a stored hash was made with a different cost than configured"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+_inline = PasswordHasher(workers=0)
+
+def get_password_hasher():
+    """The app's hasher, or an inline default-cost one outside an app context"""
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return current_app.extensions['password_hasher']
+    return _inline
+
+class LoginRateLimiter:
+    """Sliding-window attempt counter per key (email or client IP)
+
+    Per process, like the user cache; with several workers the effective
+    limit is up to workers × limit.
+    """
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, attempts, now):
+        while attempts and now - attempts[0] >= self.window:
+            attempts.popleft()
+
+    def retry_after(self, key):
+        """Seconds until key may try again, or 0 if it is under the limit"""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if not attempts:
+                return 0
+            self._prune(attempts, now)
+            if len(attempts) < self.limit:
+                return 0
+            return max(1, int(self.window - (now - attempts[0])) + 1)
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            self._attempts.move_to_end(key)
+            self._prune(attempts, now)
+            attempts.append(now)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+def init_passwords(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+    app.extensions['login_limiters'] = {
+        'email': LoginRateLimiter(app.config['LOGIN_RATE_LIMIT_PER_EMAIL'], app.config['LOGIN_RATE_LIMIT_WINDOW']),
+        'ip': LoginRateLimiter(app.config['LOGIN_RATE_LIMIT_PER_IP'], app.config['LOGIN_RATE_LIMIT_WINDOW'])
+    }
@@ -0,0 +1,140 @@
+import json
+import queue
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+class Subscription:
+    """A single subscriber's mailbox; iterate with get(timeout)"""
+
+    def __init__(self, broker, channel, maxsize=1000):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Subscribers re-read from the database on wake-up, so dropping a
+            # message from a slow consumer loses nothing.
+            pass
+
+    def get(self, timeout=None):
+        """Return the next message, or None if nothing arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class InMemoryBroker:
+    """Process-local fan-out
+
+    Publishes from other processes (other workers, flask follow-ups run,
+    flask outbox work) never arrive, so streams also poll the database.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, message):
+        self._fan_out(channel, message)
+
+    def _fan_out(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+class RedisBroker(InMemoryBroker):
+    """Fan-out shared by every worker through Redis pub/sub
+
+    Messages are published to Redis and a single listener thread per process
+    relays them to the local subscribers, so each worker holds one Redis
+    connection no matter how many streams it serves.
+    """
+
+    shared = True
+
+    def __init__(self, url, prefix='crm:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('The redis package is required for a redis:// NOTIFICATION_BROKER_URL')
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(f'{prefix}*')
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        for item in self._pubsub.listen():
+            channel = item['channel'].decode('utf-8')[len(self.prefix):]
+            self._fan_out(channel, json.loads(item['data']))
+
+    def publish(self, channel, message):
+        self._redis.publish(f'{self.prefix}{channel}', json.dumps(message))
+
+def create_broker(url):
+    """Create a broker from NOTIFICATION_BROKER_URL ('memory://' or 'redis://...')"""
+    if not url or url.startswith('memory://'):
+        return InMemoryBroker()
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBroker(url)
+    raise ValueError(f'Unsupported NOTIFICATION_BROKER_URL: {url}')
+
+def get_broker():
+    return current_app.extensions['notification_broker']
+
+def user_channel(user_id):
+    return f'notifications:{user_id}'
+
+def publish_notification(user_id, notification_id):
+    """Wake up the user's notification streams"""
+    if has_app_context() and 'notification_broker' in current_app.extensions:
+        get_broker().publish(user_channel(user_id), {'id': notification_id})
+
+def init_pubsub(app):
+    app.extensions['notification_broker'] = create_broker(app.config.get('NOTIFICATION_BROKER_URL'))
+
+# Notifications created through the ORM are published once their transaction
+# commits; bulk Core inserts must call publish_notification themselves.
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_notifications(session, flush_context):
+    from ..models.notification import Notification
+    for instance in session.new:
+        if isinstance(instance, Notification):
+            session.info.setdefault('new_notifications', []).append((instance.user_id, instance.id))
+
+@event.listens_for(Session, 'after_commit')
+def _publish_new_notifications(session):
+    for user_id, notification_id in session.info.pop('new_notifications', []):
+        publish_notification(user_id, notification_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_new_notifications(session):
+    session.info.pop('new_notifications', None)
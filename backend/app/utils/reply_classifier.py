@@ -0,0 +1,346 @@
+import os
+import re
+import zlib
+import calendar
+import numpy as np
+from collections import Counter
+from datetime import datetime, timedelta
+from dateutil import parser as date_parser
+from flask import current_app
+from sqlalchemy import select, update, bindparam, and_
+from ..models.lead import EmailLog, Lead, ResponseType, ResponseTypeSource
+from ..models.analytics import Metric
+from .. import db
+from .analytics import record_metrics
+
+# Rules win over the model; they cover phrasings that are unambiguous, the
+# model handles the rest. A reply matching rules for different types is left
+# to the model, except that auto-replies win: they quote what they answer.
+RULES = [
+    (ResponseType.NO_RESPONSE, re.compile(
+        r"\b(out of (the )?office|automatic reply|auto-?reply|on (annual |parental )?leave|"
+        r"away from (my|the) (desk|office)|limited access to (my )?email|delivery status notification|"
+        r"undeliverable|mail delivery (failed|subsystem))\b")),
+    (ResponseType.NEGATIVE, re.compile(
+        r"\b(not interested|no longer interested|unsubscribe|remove me|take me off|stop (emailing|contacting)|"
+        r"do not (contact|email)|don'?t (contact|email)|not a (good )?fit|no,? thanks?(?! (needed|necessary|required))|"
+        r"no,? thank you|we'?re all set|not at this time|not looking)\b")),
+    (ResponseType.FOLLOW_UP_REQUESTED, re.compile(
+        r"\b(follow[ -]?up (with me |again )?(in|on|after|next)|circle back|check back|touch base (in|on|after|next)|"
+        r"reach (back )?out (again )?(in|on|after|next)|get back to (me|us) (in|on|after|next)|"
+        r"(contact|ping|email) (me|us) (again )?(in|on|after|next)|try (me|us) again|revisit (this )?(in|on|after|next)|"
+        r"busy (right now|until|this)|not (right )?now,? but)\b")),
+    (ResponseType.POSITIVE, re.compile(
+        r"\b(let'?s (schedule|set up|book|talk|chat|meet)|happy to (chat|talk|meet|connect)|"
+        r"sounds (good|great|interesting)|(i'?m|we'?re|i am|we are) interested|would love to|"
+        r"book(ed)? a (time|call|slot|meeting)|calendly|send (me|over) (some )?(times|a calendar|an invite)|"
+        r"what times? works?|when are you (free|available)|i'?m (free|available))\b")),
+]
+
+# Seed examples mixed into every fitted model so each class has some support.
+# On their own they are too few to label replies with: until `flask replies
+# train` has fitted a model on hand-labelled replies, only the rules label.
+SEED_EXAMPLES = {
+    ResponseType.POSITIVE: [
+        'yes this looks useful, can we talk tomorrow',
+        'thanks for reaching out, i would like to learn more',
+        'great timing, we have been looking for something like this',
+        'please send over some times that work for a call',
+        'sure, i can do a quick call this week',
+        'this is interesting, who else on your team should join',
+        'we are evaluating options, happy to see a demo',
+        'ok lets do it, tuesday afternoon works',
+    ],
+    ResponseType.NEGATIVE: [
+        'we already use another vendor and are happy with it',
+        'no budget for this, please remove us from your list',
+        'this is not relevant to our business',
+        'we do not need this, thank you',
+        'please stop sending these emails',
+        'we decided to go in a different direction',
+        'not something we would consider',
+        'i am not the right person and we will pass',
+    ],
+    ResponseType.FOLLOW_UP_REQUESTED: [
+        'can you send me this again next quarter',
+        'we are in the middle of budgeting, ask me again in a few weeks',
+        'timing is bad, maybe after the holidays',
+        'please reach back in two months when the project starts',
+        'i am travelling, let us reconnect next month',
+        'interesting but not a priority yet, later this year could work',
+        'remind me after our board meeting on the 15th',
+        'can we pick this up again in january',
+    ],
+    ResponseType.NO_RESPONSE: [
+        'i am currently out with limited access and will reply when i return',
+        'thank you for your email, this mailbox is not monitored',
+        'this is an automated message, do not reply',
+        'i have left the company, please contact my colleague',
+        'your message could not be delivered',
+        'i will be away until monday and respond on my return',
+    ],
+}
+
+N_FEATURES = 2 ** 16
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+QUOTE_RE = re.compile(r"^(on .{0,200} wrote:|-+ ?original message ?-+|from: .+)$", re.IGNORECASE | re.MULTILINE)
+FOLLOW_UP_HOUR = 9  # extracted follow-up dates are scheduled for this time (UTC)
+
+def reply_text(content):
+    """Lower-cased reply without the quoted message it answers"""
+    if not content:
+        return ''
+    match = QUOTE_RE.search(content)
+    if match:
+        content = content[:match.start()]
+    return '\n'.join(line for line in content.splitlines() if not line.lstrip().startswith('>')).lower()
+
+def _features(text):
+    tokens = TOKEN_RE.findall(text)
+    grams = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+    # Bucket 0 is reserved as a bias so no document has an empty feature list
+    return [0] + [zlib.crc32(gram.encode('utf-8')) % (N_FEATURES - 1) + 1 for gram in grams]
+
+def _hashed(texts):
+    """Flat feature ids for a batch plus each document's offset into them"""
+    ids = []
+    offsets = []
+    for text in texts:
+        offsets.append(len(ids))
+        ids.extend(_features(text))
+    return np.asarray(ids, dtype=np.int64), np.asarray(offsets, dtype=np.int64)
+
+class ReplyClassifier:
+    """Multinomial naive Bayes over hashed word uni- and bigrams
+
+    Scoring a batch is one gather of the per-class log-likelihood matrix
+    and one segmented sum over it, so cost grows with total tokens and not
+    with the number of Python calls per message.
+    """
+
+    def __init__(self, classes, feature_log_prob, class_log_prior):
+        self.classes = list(classes)
+        self.feature_log_prob = feature_log_prob  # (N_FEATURES, classes)
+        self.class_log_prior = class_log_prior
+
+    @classmethod
+    def fit(cls, texts, labels, alpha=0.5):
+        classes = sorted(set(labels))
+        index = {label: i for i, label in enumerate(classes)}
+        ids, offsets = _hashed(texts)
+        rows = np.repeat(np.asarray([index[label] for label in labels]), np.diff(np.append(offsets, len(ids))))
+        counts = np.zeros((N_FEATURES, len(classes)))
+        np.add.at(counts, (ids, rows), 1)
+        counts += alpha
+        feature_log_prob = np.log(counts / counts.sum(axis=0))
+        priors = np.bincount([index[label] for label in labels], minlength=len(classes))
+        return cls(classes, feature_log_prob, np.log(priors / priors.sum()))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls([str(label) for label in data['classes']], data['feature_log_prob'], data['class_log_prior'])
+
+    def save(self, path):
+        np.savez_compressed(path, classes=np.asarray(self.classes), feature_log_prob=self.feature_log_prob,
+                            class_log_prior=self.class_log_prior)
+
+    def predict(self, texts):
+        """(label, probability) per text"""
+        if not texts:
+            return []
+        ids, offsets = _hashed(texts)
+        scores = np.add.reduceat(self.feature_log_prob[ids], offsets, axis=0) + self.class_log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+def get_reply_classifier(app=None):
+    """Return the app's classifier, loaded from REPLY_CLASSIFIER_MODEL once; None until one is trained"""
+    app = app or current_app._get_current_object()
+    if 'reply_classifier' not in app.extensions:
+        path = app.config['REPLY_CLASSIFIER_MODEL']
+        app.extensions['reply_classifier'] = ReplyClassifier.load(path) if path and os.path.exists(path) else None
+    return app.extensions['reply_classifier']
+
+def rule_label(text):
+    matched = {response_type for response_type, pattern in RULES if pattern.search(text)}
+    if ResponseType.NO_RESPONSE in matched:
+        return ResponseType.NO_RESPONSE.value
+    return matched.pop().value if len(matched) == 1 else None
+
+MONTHS = '|'.join(name.lower() for name in calendar.month_name[1:] + calendar.month_abbr[1:])
+WEEKDAYS = [name.lower() for name in calendar.day_name]
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30}
+NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'a couple of': 2, 'a few': 3}
+MONTH_RE = re.compile(r"\b(in|after|until|from|early|mid|late) (" + MONTHS + r")\b")
+RELATIVE_RE = re.compile(r"\bin (\d+|a couple of|a few|an?|one|two|three|four|five|six) (day|week|month)s?\b")
+NEXT_RE = re.compile(r"\b(tomorrow|next (week|month|quarter|year)|(next |on |this )?(" + '|'.join(WEEKDAYS) + r"))\b")
+EXPLICIT_RE = re.compile(
+    r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}(/\d{2,4})?|"
+    r"(" + MONTHS + r")\.? \d{1,2}(st|nd|rd|th)?(,? \d{4})?|"
+    r"\d{1,2}(st|nd|rd|th)? (of )?(" + MONTHS + r")\.?(,? \d{4})?)\b")
+
+def extract_follow_up_date(text, reference):
+    """First follow-up date mentioned in text, resolved against reference (the reply time)"""
+    text = text.lower()
+    base = reference.replace(hour=FOLLOW_UP_HOUR, minute=0, second=0, microsecond=0)
+
+    match = EXPLICIT_RE.search(text)
+    if match:
+        try:
+            value = date_parser.parse(match.group(0), default=base)
+        except (ValueError, OverflowError):
+            value = None
+        if value is not None:
+            # "March 3" written in December means next year
+            if value.date() < reference.date() and not re.search(r'\d{4}', match.group(0)):
+                value = value.replace(year=value.year + 1)
+            return value
+
+    match = MONTH_RE.search(text)
+    if match:
+        month = date_parser.parse(match.group(2), default=base.replace(day=1)).month
+        return base.replace(year=base.year + (month < base.month), month=month, day=1)
+
+    match = RELATIVE_RE.search(text)
+    if match:
+        count = NUMBERS.get(match.group(1)) or int(match.group(1))
+        return base + timedelta(days=count * UNIT_DAYS[match.group(2)])
+
+    match = NEXT_RE.search(text)
+    if match:
+        word = match.group(1)
+        if word == 'tomorrow':
+            return base + timedelta(days=1)
+        if match.group(2):
+            unit = match.group(2)
+            if unit == 'week':
+                return base + timedelta(days=7 - base.weekday())  # Monday
+            if unit == 'month':
+                return (base.replace(day=1) + timedelta(days=32)).replace(day=1)
+            if unit == 'quarter':
+                month = (base.month - 1) // 3 * 3 + 4
+                return base.replace(year=base.year + (month > 12), month=(month - 1) % 12 + 1, day=1)
+            return base.replace(year=base.year + 1, month=1, day=1)
+        weekday = WEEKDAYS.index(match.group(4))
+        days = (weekday - base.weekday()) % 7 or 7
+        if word.startswith('next ') and days < 7 - base.weekday():
+            days += 7  # "next friday" said on a monday is the one after this week's
+        return base + timedelta(days=days)
+    return None
+
+def classify_replies(contents, received_at, min_confidence=None):
+    """(response_type, response_type_source, scheduled_follow_up) per reply
+
+    response_type and its source are None when no rule matches and the
+    trained model is unsure, or when there is no trained model yet.
+    """
+    if min_confidence is None:
+        min_confidence = current_app.config['REPLY_CLASSIFIER_MIN_CONFIDENCE']
+    texts = [reply_text(content) for content in contents]
+    labels = [rule_label(text) for text in texts]
+    sources = [ResponseTypeSource.RULE if label else None for label in labels]
+    unlabelled = [i for i, label in enumerate(labels) if label is None]
+    classifier = get_reply_classifier()
+    if classifier and unlabelled:
+        for i, (label, probability) in zip(unlabelled, classifier.predict([texts[i] for i in unlabelled])):
+            if probability >= min_confidence:
+                labels[i], sources[i] = label, ResponseTypeSource.MODEL
+
+    results = []
+    for text, label, source, reference in zip(texts, labels, sources, received_at):
+        follow_up = extract_follow_up_date(text, reference) if label == ResponseType.FOLLOW_UP_REQUESTED else None
+        results.append((label, source, follow_up if follow_up and follow_up > reference else None))
+    return results
+
+def schedule_follow_ups(follow_ups, now):
+    """Move leads' next_follow_up to requested dates still ahead of now; the caller commits"""
+    rows = [{'lead_id': lead_id, 'follow_up': when} for lead_id, when in follow_ups.items() if when > now]
+    if rows:
+        leads = Lead.__table__
+        db.session.connection().execute(
+            update(leads).where(leads.c.id == bindparam('lead_id')).values(next_follow_up=bindparam('follow_up')),
+            rows
+        )
+    return len(rows)
+
+def backfill_response_types(batch_size=None, limit=None):
+    """Classify received emails that have no response_type, oldest first
+
+    Reads and updates batch_size rows per round trip and commits per batch,
+    so it can be stopped and rerun at any point.
+    """
+    batch_size = batch_size or current_app.config['REPLY_CLASSIFIER_BATCH_SIZE']
+    now = datetime.utcnow()
+    summary = Counter()
+    last_id = 0
+    logs = EmailLog.__table__
+    while limit is None or summary['scanned'] < limit:
+        rows = db.session.execute(
+            select(EmailLog.id, EmailLog.lead_id, EmailLog.user_id, EmailLog.content, EmailLog.sent_at)
+            .where(and_(EmailLog.id > last_id, EmailLog.direction == 'received', EmailLog.response_type.is_(None)))
+            .order_by(EmailLog.id)
+            .limit(batch_size if limit is None else min(batch_size, limit - summary['scanned']))
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        summary['scanned'] += len(rows)
+
+        results = classify_replies([row.content for row in rows], [row.sent_at or now for row in rows])
+        updates = []
+        metrics = Counter()
+        follow_ups = {}
+        for row, (label, source, follow_up) in zip(rows, results):
+            if label is None:
+                continue
+            updates.append({'log_id': row.id, 'label': label, 'source': source, 'follow_up': follow_up})
+            metrics[((row.sent_at or now).date(), row.user_id, Metric.reply(label))] += 1
+            summary[label] += 1
+            if follow_up:
+                follow_ups[row.lead_id] = max(follow_up, follow_ups.get(row.lead_id, follow_up))
+
+        if updates:
+            # Core executemany bypasses the ORM hooks, so the rollups are updated here
+            db.session.connection().execute(
+                update(logs)
+                .where(logs.c.id == bindparam('log_id'))
+                .values(response_type=bindparam('label'), response_type_source=bindparam('source'),
+                        scheduled_follow_up=bindparam('follow_up')),
+                updates
+            )
+            record_metrics(metrics)
+            summary['follow_ups_scheduled'] += schedule_follow_ups(follow_ups, now)
+        db.session.commit()
+    return dict(summary)
+
+def train_from_labelled(limit=None):
+    """Fit a classifier on hand-labelled received emails plus the seed examples
+
+    Labels set by the rules or a previous model are left out, so the model
+    is not trained on its own output.
+    """
+    query = (
+        select(EmailLog.content, EmailLog.response_type)
+        .where(
+            EmailLog.direction == 'received',
+            EmailLog.response_type.isnot(None),
+            EmailLog.response_type_source == ResponseTypeSource.MANUAL
+        )
+        .order_by(EmailLog.id.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    texts, labels = [], []
+    for response_type, examples in SEED_EXAMPLES.items():
+        texts.extend(examples)
+        labels.extend([response_type.value] * len(examples))
+    labelled = 0
+    for content, response_type in db.session.execute(query):
+        texts.append(reply_text(content))
+        labels.append(response_type)
+        labelled += 1
+    return ReplyClassifier.fit(texts, labels), labelled
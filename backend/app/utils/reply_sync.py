@@ -0,0 +1,373 @@
+import base64
+import json
+import logging
+import threading
+import time
+import click
+from collections import Counter
+from datetime import datetime
+from email.utils import parseaddr, parsedate_to_datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, bindparam, func, or_
+from ..models.lead import Lead, EmailLog, Activity
+from ..models.analytics import Metric
+from ..models.mailbox import MailboxSyncState
+from ..models.settings import SettingsKeys
+from .. import db
+from .analytics import record_metrics, email_deltas
+from .gmail_service import create_gmail_service
+from .reply_classifier import classify_replies, schedule_follow_ups, backfill_response_types, train_from_labelled
+from .settings_cache import get_settings_cache
+
+logger = logging.getLogger(__name__)
+
+class HistoryExpired(Exception):
+    """The stored historyId is older than the mailbox keeps history for"""
+
+class GmailMailbox:
+    """Reads inbound messages through the Gmail history API"""
+
+    # Gmail answers at most 100 calls per batch request but throttles well before that
+    FETCH_BATCH_SIZE = 50
+
+    def __init__(self, app):
+        self.app = app
+
+    def _service(self):
+        with self.app.app_context():
+            return create_gmail_service()
+
+    def current_history_id(self):
+        return str(self._service().users().getProfile(userId='me').execute()['historyId'])
+
+    def changes(self, start_history_id):
+        """Ids of messages added to the inbox after start_history_id, and the new historyId"""
+        from googleapiclient.errors import HttpError
+        service = self._service()
+        message_ids = []
+        history_id = start_history_id
+        page_token = None
+        while True:
+            try:
+                response = service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    labelId='INBOX',
+                    pageToken=page_token
+                ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpired(str(e))
+                raise
+            for record in response.get('history', []):
+                message_ids.extend(added['message']['id'] for added in record.get('messagesAdded', []))
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return list(dict.fromkeys(message_ids)), str(history_id)
+
+    def get_messages(self, message_ids):
+        """Fetch and parse messages, FETCH_BATCH_SIZE per HTTP batch request"""
+        service = self._service()
+        messages = []
+        for start in range(0, len(message_ids), self.FETCH_BATCH_SIZE):
+            errors = []
+
+            def collect(request_id, response, exception):
+                if exception is not None:
+                    errors.append(exception)
+                else:
+                    messages.append(_parse_gmail_message(response))
+
+            batch = service.new_batch_http_request(callback=collect)
+            for message_id in message_ids[start:start + self.FETCH_BATCH_SIZE]:
+                batch.add(service.users().messages().get(userId='me', id=message_id, format='full'))
+            batch.execute()
+            if errors:
+                # The checkpoint is not advanced, so the whole range is retried next pass
+                raise errors[0]
+        return messages
+
+def _decode_body(data):
+    return base64.urlsafe_b64decode(data.encode('ascii')).decode('utf-8', errors='replace')
+
+def _plain_text(payload):
+    if payload.get('mimeType') == 'text/plain' and payload.get('body', {}).get('data'):
+        return _decode_body(payload['body']['data'])
+    for part in payload.get('parts', []):
+        text = _plain_text(part)
+        if text:
+            return text
+    return None
+
+def _parse_gmail_message(message):
+    payload = message.get('payload', {})
+    headers = {header['name'].lower(): header['value'] for header in payload.get('headers', [])}
+    if message.get('internalDate'):
+        received_at = datetime.utcfromtimestamp(int(message['internalDate']) / 1000)
+    else:
+        received_at = parsedate_to_datetime(headers['date']).replace(tzinfo=None)
+    return {
+        'id': message['id'],
+        'from': parseaddr(headers.get('from', ''))[1].lower(),
+        'subject': headers.get('subject', ''),
+        'body': _plain_text(payload) or message.get('snippet', ''),
+        'received_at': received_at
+    }
+
+class FakeMailbox:
+    """In-memory mailbox with a replayable history, for tests and local development
+
+    Every delivered message gets the next historyId, like Gmail's
+    messageAdded records. expire_history() drops old records to simulate the
+    404 Gmail returns for a stale checkpoint.
+    """
+
+    def __init__(self, app=None):
+        self.messages = []
+        self.history_floor = 0
+        self.lock = threading.Lock()
+        path = app.config.get('REPLY_SYNC_FAKE_MAILBOX') if app else None
+        if path:
+            self.load(path)
+
+    def load(self, path):
+        """Deliver every message from a JSON list of {from, subject, body, received_at}"""
+        with open(path) as f:
+            for message in json.load(f):
+                self.deliver(
+                    message['from'],
+                    message.get('subject', ''),
+                    message.get('body', ''),
+                    datetime.fromisoformat(message['received_at']) if message.get('received_at') else None
+                )
+
+    def deliver(self, sender, subject, body, received_at=None):
+        with self.lock:
+            history_id = len(self.messages) + 1
+            self.messages.append({
+                'id': f'fake-in-{history_id}',
+                'history_id': history_id,
+                'from': parseaddr(sender)[1].lower(),
+                'subject': subject,
+                'body': body,
+                'received_at': received_at or datetime.utcnow()
+            })
+            return self.messages[-1]['id']
+
+    def expire_history(self):
+        with self.lock:
+            self.history_floor = len(self.messages)
+
+    def current_history_id(self):
+        with self.lock:
+            return str(len(self.messages))
+
+    def changes(self, start_history_id):
+        with self.lock:
+            start = int(start_history_id)
+            if start < self.history_floor:
+                raise HistoryExpired(f'historyId {start} is no longer available')
+            return [message['id'] for message in self.messages[start:]], str(len(self.messages))
+
+    def get_messages(self, message_ids):
+        with self.lock:
+            by_id = {message['id']: message for message in self.messages}
+            return [dict(by_id[message_id]) for message_id in message_ids if message_id in by_id]
+
+MAILBOXES = {
+    'gmail': GmailMailbox,
+    'fake': FakeMailbox
+}
+
+def get_mailbox(app=None):
+    """Return the app's configured mailbox (REPLY_SYNC_MAILBOX), creating it once"""
+    app = app or current_app._get_current_object()
+    if 'reply_mailbox' not in app.extensions:
+        app.extensions['reply_mailbox'] = MAILBOXES[app.config['REPLY_SYNC_MAILBOX']](app)
+    return app.extensions['reply_mailbox']
+
+def match_leads(addresses):
+    """Map sender address -> (lead id, owner id) with one query on lower(email)
+
+    When several leads share an address the most recently contacted one wins.
+    """
+    if not addresses:
+        return {}
+    rows = db.session.execute(
+        select(func.lower(Lead.email), Lead.id, Lead.assigned_to)
+        .where(func.lower(Lead.email).in_(addresses), Lead.assigned_to.isnot(None))
+        .order_by(Lead.last_contact_date.is_(None), Lead.last_contact_date.desc(), Lead.id.desc())
+    )
+    matches = {}
+    for address, lead_id, user_id in rows:
+        matches.setdefault(address, (lead_id, user_id))
+    return matches
+
+def record_replies(messages):
+    """Write EmailLog, Activity, Lead and rollup rows for a batch of inbound messages
+
+    Replies are classified on the way in (see reply_classifier). A fixed
+    number of statements per batch. Messages already ingested and senders
+    that match no assigned lead are skipped. Returns the number of
+    replies recorded; the caller commits.
+    """
+    if not messages:
+        return 0
+    seen = set(db.session.execute(
+        select(EmailLog.gmail_message_id)
+        .where(EmailLog.gmail_message_id.in_([message['id'] for message in messages]))
+    ).scalars())
+    leads = match_leads({message['from'] for message in messages})
+    replies = [
+        (message, *leads[message['from']]) for message in messages
+        if message['id'] not in seen and message['from'] in leads
+    ]
+    if not replies:
+        return 0
+    labels = classify_replies([message['body'] for message, _, _ in replies],
+                              [message['received_at'] for message, _, _ in replies])
+
+    db.session.execute(insert(EmailLog), [{
+        'lead_id': lead_id,
+        'user_id': user_id,
+        'direction': 'received',
+        'subject': message['subject'][:200],
+        'content': message['body'],
+        'response_type': response_type,
+        'response_type_source': source,
+        'scheduled_follow_up': follow_up,
+        'sent_at': message['received_at'],
+        'gmail_message_id': message['id']
+    } for (message, lead_id, user_id), (response_type, source, follow_up) in zip(replies, labels)])
+
+    db.session.execute(insert(Activity), [{
+        'lead_id': lead_id,
+        'user_id': user_id,
+        'activity_type': 'email_received',
+        'description': f"Email received: {message['subject']}",
+        'created_at': message['received_at']
+    } for message, lead_id, user_id in replies])
+
+    latest = {}
+    for message, lead_id, user_id in replies:
+        if lead_id not in latest or message['received_at'] > latest[lead_id][0]:
+            latest[lead_id] = (message['received_at'], user_id)
+    first_contacts = db.session.execute(
+        select(Lead.id).where(Lead.id.in_(latest), Lead.last_contact_date.is_(None))
+    ).scalars().all()
+
+    # Core writes bypass the ORM hooks, so the rollups are updated here
+    metrics = Counter()
+    follow_ups = {}
+    for (message, lead_id, user_id), (response_type, _, follow_up) in zip(replies, labels):
+        metrics.update(email_deltas('received', user_id, message['received_at'].date(), response_type))
+        if follow_up:
+            follow_ups[lead_id] = max(follow_up, follow_ups.get(lead_id, follow_up))
+    metrics.update((latest[lead_id][0].date(), latest[lead_id][1], Metric.LEAD_CONTACTED) for lead_id in first_contacts)
+    record_metrics(metrics)
+    schedule_follow_ups(follow_ups, datetime.utcnow())
+
+    db.session.connection().execute(
+        update(Lead.__table__)
+        .where(
+            Lead.__table__.c.id == bindparam('lead_id'),
+            or_(Lead.__table__.c.last_contact_date.is_(None), Lead.__table__.c.last_contact_date < bindparam('contacted_at'))
+        )
+        .values(last_contact_date=bindparam('contacted_at')),
+        [{'lead_id': lead_id, 'contacted_at': received_at} for lead_id, (received_at, _) in latest.items()]
+    )
+    return len(replies)
+
+def sync_replies(mailbox=None, address=None, batch_size=None):
+    """Pull messages added since the stored historyId and record replies from leads
+
+    The first run only stores the mailbox's current historyId. The checkpoint
+    moves after every batch has been committed; a crash in between re-reads
+    messages that are then skipped by gmail_message_id.
+    """
+    mailbox = mailbox or get_mailbox()
+    address = address or get_settings_cache().get(SettingsKeys.GLOBAL_EMAIL)
+    if not address:
+        raise Exception('Global email not configured')
+    batch_size = batch_size or current_app.config['REPLY_SYNC_BATCH_SIZE']
+    summary = {'messages': 0, 'replies': 0, 'reset': False}
+
+    state = db.session.execute(
+        select(MailboxSyncState).where(MailboxSyncState.address == address)
+    ).scalar_one_or_none()
+    if state is None:
+        db.session.add(MailboxSyncState(address=address, history_id=mailbox.current_history_id()))
+        db.session.commit()
+        return summary
+
+    try:
+        message_ids, history_id = mailbox.changes(state.history_id)
+    except HistoryExpired:
+        # Messages in the gap can only be recovered by logging them by hand
+        logger.warning('History for %s expired at %s; restarting from the current historyId', address, state.history_id)
+        state.history_id = mailbox.current_history_id()
+        state.last_synced_at = datetime.utcnow()
+        db.session.commit()
+        summary['reset'] = True
+        return summary
+
+    for start in range(0, len(message_ids), batch_size):
+        messages = mailbox.get_messages(message_ids[start:start + batch_size])
+        recorded = record_replies(messages)
+        state.messages_ingested += recorded
+        db.session.commit()
+        summary['messages'] += len(messages)
+        summary['replies'] += recorded
+
+    state.history_id = history_id
+    state.last_synced_at = datetime.utcnow()
+    db.session.commit()
+    return summary
+
+replies_cli = AppGroup('replies', help='Sync inbound replies from the mailbox.')
+
+@replies_cli.command('sync')
+@click.option('--once', is_flag=True, help='Sync once and exit.')
+@click.option('--interval', type=float, default=None, help='Seconds between syncs.')
+def sync_command(once, interval):
+    """Record new replies from leads as received emails"""
+    if once:
+        click.echo(sync_replies())
+        return
+    interval = interval or current_app.config['REPLY_SYNC_INTERVAL']
+    while True:
+        try:
+            summary = sync_replies()
+            if summary['replies']:
+                logger.info('Recorded %d replies from %d messages', summary['replies'], summary['messages'])
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Reply sync failed: {str(e)}')
+        finally:
+            db.session.remove()
+        time.sleep(interval)
+
+@replies_cli.command('classify')
+@click.option('--batch-size', type=int, default=None, help='Rows classified per batch.')
+@click.option('--limit', type=int, default=None, help='Stop after this many rows.')
+def classify_command(batch_size, limit):
+    """Set response_type on received emails that have none (backfill)"""
+    start = time.perf_counter()
+    summary = backfill_response_types(batch_size, limit)
+    elapsed = time.perf_counter() - start
+    click.echo(f"{summary} in {elapsed:.1f}s ({summary.get('scanned', 0) / max(elapsed, 1e-6):.0f} rows/s)")
+
+@replies_cli.command('train')
+@click.option('--limit', type=int, default=None, help='Use only the most recent labelled replies.')
+def train_command(limit):
+    """Fit the reply classifier on hand-labelled replies and save it to REPLY_CLASSIFIER_MODEL"""
+    classifier, labelled = train_from_labelled(limit)
+    if not labelled:
+        raise click.ClickException('No hand-labelled replies to train on; label some with PUT /api/leads/<id>/emails/<email_id>')
+    path = current_app.config['REPLY_CLASSIFIER_MODEL']
+    classifier.save(path)
+    current_app.extensions['reply_classifier'] = classifier
+    click.echo(f'Trained on {labelled} labelled replies; saved to {path}')
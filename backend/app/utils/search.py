@@ -0,0 +1,189 @@
+import re
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, text, select, table, column, literal_column, or_, and_
+from ..models.lead import Lead
+from .. import db
+
+# SQLite: an external-content FTS5 table over leads, kept in sync by triggers so
+# every insert path (ORM, bulk insert, raw SQL) is indexed without app code.
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        name, email, company_name,
+        content='leads', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts(rowid, name, email, company_name)
+        VALUES (new.id, new.name, new.email, new.company_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, name, email, company_name)
+        VALUES ('delete', old.id, old.name, old.email, old.company_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF name, email, company_name ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, name, email, company_name)
+        VALUES ('delete', old.id, old.name, old.email, old.company_name);
+        INSERT INTO leads_fts(rowid, name, email, company_name)
+        VALUES (new.id, new.name, new.email, new.company_name);
+    END"""
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS leads_fts_au',
+    'DROP TRIGGER IF EXISTS leads_fts_ad',
+    'DROP TRIGGER IF EXISTS leads_fts_ai',
+    'DROP TABLE IF EXISTS leads_fts'
+]
+
+# Postgres: an expression GIN index. The expression must stay identical to
+# _pg_vector() below or the planner will not use the index.
+PG_VECTOR_SQL = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '') "
+    "|| ' ' || coalesce(company_name, ''))"
+)
+
+PG_DDL = [
+    f'CREATE INDEX IF NOT EXISTS ix_leads_search_vector ON leads USING gin ({PG_VECTOR_SQL})',
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_leads_email_trgm ON leads USING gin (email gin_trgm_ops)'
+]
+
+PG_DROP = [
+    'DROP INDEX IF EXISTS ix_leads_email_trgm',
+    'DROP INDEX IF EXISTS ix_leads_search_vector'
+]
+
+fts_table = table('leads_fts', column('rowid'), column('rank'))
+
+_available = {}
+
+def _dialect(bind=None):
+    return (bind or db.engine).dialect.name
+
+def tokenize(term):
+    """Split a search term into index tokens (letters/digits only)"""
+    return re.findall(r'\w+', term.lower())
+
+def split_email_words(term):
+    """(address-like words, the rest of the term)
+
+    Postgres' 'simple' parser keeps an address, or a host like gmail.com, as
+    one lexeme that a per-token prefix query cannot match, so such words are
+    matched against email with ILIKE, served by ix_leads_email_trgm.
+    """
+    words = term.split()
+    emails = [word for word in words if '@' in word or '.' in word]
+    return emails, ' '.join(word for word in words if word not in emails)
+
+def build_match_query(term):
+    """Build a prefix-matching FTS query string, or None if term has no tokens"""
+    tokens = tokenize(term)
+    if not tokens:
+        return None
+    if _dialect() == 'postgresql':
+        return ' & '.join(f'{token}:*' for token in tokens)
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+def create_search_index(bind):
+    """Create the search index objects for the bound database (idempotent)"""
+    statements = PG_DDL if _dialect(bind) == 'postgresql' else SQLITE_DDL
+    for statement in statements:
+        bind.execute(text(statement))
+    _available.clear()
+
+def drop_search_index(bind):
+    """Drop the search index objects"""
+    statements = PG_DROP if _dialect(bind) == 'postgresql' else SQLITE_DROP
+    for statement in statements:
+        bind.execute(text(statement))
+    _available.clear()
+
+def rebuild_search_index():
+    """Create the index if missing and repopulate it from the leads table"""
+    with db.engine.begin() as conn:
+        create_search_index(conn)
+        if _dialect(conn) == 'postgresql':
+            conn.execute(text('REINDEX INDEX ix_leads_search_vector'))
+        else:
+            conn.execute(text("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')"))
+
+def search_index_available():
+    """Whether the full-text index exists; cached per engine for the process"""
+    url = str(db.engine.url)
+    if url not in _available:
+        if _dialect() == 'postgresql':
+            found = db.session.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_leads_search_vector'")
+            ).first()
+        else:
+            found = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_fts'")
+            ).first()
+        _available[url] = found is not None
+    return _available[url]
+
+def _pg_vector():
+    return func.to_tsvector(
+        'simple',
+        func.coalesce(Lead.name, '') + ' ' + func.coalesce(Lead.email, '') + ' ' + func.coalesce(Lead.company_name, '')
+    )
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _pg_search(term):
+    """(tsquery or None, email ILIKE clauses) for a term on Postgres"""
+    emails, rest = split_email_words(term)
+    match = build_match_query(rest)
+    clauses = [Lead.email.ilike(f'%{_escape_like(word)}%', escape='\\') for word in emails]
+    return (func.to_tsquery('simple', match) if match else None), clauses
+
+def _ilike_clause(term):
+    return or_(
+        Lead.name.ilike(f'%{term}%'),
+        Lead.email.ilike(f'%{term}%'),
+        Lead.company_name.ilike(f'%{term}%')
+    )
+
+def search_filter(term):
+    """Return a WHERE clause restricting leads to those matching the search term"""
+    match = build_match_query(term)
+    if match is None or not search_index_available():
+        return _ilike_clause(term)
+    if _dialect() == 'postgresql':
+        ts_query, clauses = _pg_search(term)
+        if ts_query is not None:
+            clauses.append(_pg_vector().op('@@')(ts_query))
+        return and_(*clauses)
+    matching_ids = (
+        select(literal_column('rowid'))
+        .select_from(fts_table)
+        .where(text('leads_fts MATCH :fts_query').bindparams(fts_query=match))
+    )
+    return Lead.id.in_(matching_ids)
+
+def ranked_search(query, term):
+    """Order a lead query by relevance to the search term, best match first"""
+    match = build_match_query(term)
+    if match is None or not search_index_available():
+        return query.filter(_ilike_clause(term)).order_by(Lead.created_at.desc())
+    if _dialect() == 'postgresql':
+        ts_query, clauses = _pg_search(term)
+        if ts_query is None:
+            return query.filter(*clauses).order_by(Lead.created_at.desc())
+        vector = _pg_vector()
+        return query.filter(*clauses, vector.op('@@')(ts_query)).order_by(func.ts_rank(vector, ts_query).desc())
+    return (
+        query.join(fts_table, fts_table.c.rowid == Lead.id)
+        .filter(text('leads_fts MATCH :fts_query').bindparams(fts_query=match))
+        .order_by(fts_table.c.rank)
+    )
+
+search_cli = AppGroup('search', help='Manage the lead full-text search index.')
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Create (if needed) and backfill the lead search index"""
+    rebuild_search_index()
+    click.echo('Lead search index rebuilt')
@@ -0,0 +1,108 @@
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models.settings import Settings, SettingsVersion
+from .. import db
+
+class SettingsCache:
+    """All settings rows held in memory, reloaded when the shared version changes
+
+    Every write bumps settings_version.version in the same transaction. Each
+    process checks that single row at most once per check_interval seconds
+    and reloads everything when it moved, so other workers see a change
+    within check_interval; the writing process reloads immediately.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._settings = None
+        self._version = None
+        self._checked = 0.0
+
+    def _current_version(self):
+        return db.session.scalar(select(SettingsVersion.version).where(SettingsVersion.id == 1)) or 0
+
+    def _load(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._settings is not None and now - self._checked < self.check_interval:
+                return self._settings
+
+        version = self._current_version()
+        with self._lock:
+            if self._settings is None or version != self._version:
+                rows = Settings.query.all()
+                self._settings = {row.key: row.to_dict() for row in rows}
+                self._version = version
+            self._checked = now
+            return self._settings
+
+    def invalidate(self):
+        with self._lock:
+            self._settings = None
+
+    def all(self):
+        return list(self._load().values())
+
+    def get_row(self, key):
+        return self._load().get(key)
+
+    def get(self, key, default=None, cast=None):
+        """Typed lookup: cast the stored string with cast (int, float, bool, ...)"""
+        row = self._load().get(key)
+        if row is None or row['value'] is None:
+            return default
+        if cast is bool:
+            return row['value'].strip().lower() in ('1', 'true', 'yes', 'on')
+        try:
+            return cast(row['value']) if cast else row['value']
+        except (TypeError, ValueError):
+            return default
+
+def get_settings_cache():
+    return current_app.extensions['settings_cache']
+
+def bump_settings_version():
+    """Record a settings change; call inside the writing transaction"""
+    bumped = db.session.execute(
+        update(SettingsVersion).where(SettingsVersion.id == 1).values(version=SettingsVersion.version + 1)
+    ).rowcount
+    if not bumped:
+        db.session.execute(insert(SettingsVersion).values(id=1, version=1))
+
+def upsert_settings(values, descriptions=None):
+    """Insert or update many settings with one statement; returns the rows, caller commits
+
+    descriptions only apply to keys that do not exist yet.
+    """
+    if not values:
+        return []
+    descriptions = descriptions or {}
+    now = datetime.utcnow()
+    insert_ = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    statement = insert_(Settings)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Settings.key],
+        set_={'value': statement.excluded.value, 'updated_at': now}
+    ).returning(Settings, sort_by_parameter_order=True)
+
+    rows = db.session.scalars(
+        statement,
+        [{
+            'key': key,
+            'value': value,
+            'description': descriptions.get(key, f'Setting for {key}'),
+            'created_at': now,
+            'updated_at': now
+        } for key, value in values.items()],
+        execution_options={'populate_existing': True}
+    ).all()
+    bump_settings_version()
+    return rows
+
+def init_settings_cache(app):
+    app.extensions['settings_cache'] = SettingsCache(check_interval=app.config['SETTINGS_CACHE_CHECK_INTERVAL'])
@@ -0,0 +1,335 @@
+import hashlib
+import math
+import re
+import struct
+import threading
+import time
+import zlib
+import click
+import numpy as np
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models.lead import LeadStatus
+from ..models.suppression import Suppression, SuppressionState, SuppressionKind, SuppressionReason, SUPPRESSION_REASONS
+from .. import db
+from .lead_dedup import normalize_email
+
+# Leads in these statuses are never mailed, whatever the suppression list says
+SUPPRESSED_LEAD_STATUSES = {LeadStatus.NOT_INTERESTED.value, LeadStatus.LOST.value}
+EMAIL_RE = re.compile(r'^[^@\s]+@[a-z0-9-]+(\.[a-z0-9-]+)+$')
+DOMAIN_RE = re.compile(r'^[a-z0-9-]+(\.[a-z0-9-]+)+$')
+WRITE_BATCH_SIZE = 1000
+MAX_ENTRIES_PER_REQUEST = 10000
+
+class BloomFilter:
+    """Set membership in a packed bit array: no false negatives, and false
+    positives at about error_rate while no more than capacity values are added
+
+    Each value sets n_hashes bits derived from one 128-bit BLAKE2b digest
+    (double hashing), so lookups cost a hash and a few array reads.
+    """
+
+    HEADER = struct.Struct('<4sQQQB')
+    MAGIC = b'BLM1'
+
+    def __init__(self, capacity, error_rate=0.001, n_bits=None, n_hashes=None, bits=None, count=0):
+        self.capacity = max(int(capacity), 1)
+        self.n_bits = n_bits or max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = n_hashes or max(1, round(self.n_bits / self.capacity * math.log(2)))
+        self.bits = bits if bits is not None else np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = count
+
+    def _positions(self, values):
+        digests = b''.join(hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest() for value in values)
+        hashes = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        steps = np.arange(self.n_hashes, dtype=np.uint64)
+        return (hashes[:, :1] + steps * (hashes[:, 1:] | np.uint64(1))) % np.uint64(self.n_bits)
+
+    def add_many(self, values):
+        values = list(values)
+        if values:
+            positions = self._positions(values).ravel()
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+            self.count += len(values)
+
+    def contains_many(self, values):
+        """Boolean array: False means certainly absent"""
+        values = list(values)
+        if not values:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(values)
+        return ((self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1).all(axis=1)
+
+    def to_bytes(self):
+        header = self.HEADER.pack(self.MAGIC, self.capacity, self.n_bits, self.count, self.n_hashes)
+        return header + zlib.compress(self.bits.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, capacity, n_bits, count, n_hashes = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a serialized Bloom filter')
+        bits = np.frombuffer(zlib.decompress(data[cls.HEADER.size:]), dtype=np.uint8).copy()
+        return cls(capacity, n_bits=n_bits, n_hashes=n_hashes, bits=bits, count=count)
+
+def normalize_suppression(value):
+    """(value, kind) for an address or domain ('example.com' or '@example.com'), None if invalid"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    if value.startswith('@'):
+        value = value[1:]
+    if '@' in value:
+        return (normalize_email(value), SuppressionKind.ADDRESS) if EMAIL_RE.match(value) else None
+    return (value, SuppressionKind.DOMAIN) if DOMAIN_RE.match(value) else None
+
+def _lookup_keys(address):
+    """The suppression values that would block address: itself and each parent domain"""
+    email = normalize_email(address)
+    labels = email.rpartition('@')[2].split('.')
+    return [email] + ['.'.join(labels[i:]) for i in range(len(labels) - 1)]
+
+def _current_state():
+    return db.session.execute(
+        select(SuppressionState.version, SuppressionState.generation).where(SuppressionState.id == 1)
+    ).first()
+
+def build_filter(capacity, error_rate):
+    """A filter of every current entry; returns (filter, version it is complete up to)"""
+    state = _current_state()
+    version = state.version if state else 0
+    count = db.session.scalar(select(func.count(Suppression.id)).where(Suppression.version <= version))
+    bloom = BloomFilter(max(capacity, 2 * count), error_rate)
+    values = db.session.scalars(
+        select(Suppression.value).where(Suppression.version <= version).execution_options(yield_per=10000)
+    )
+    for chunk in values.partitions():
+        bloom.add_many(chunk)
+    return bloom, version
+
+class SuppressionList:
+    """Per-process Bloom filter over the suppressions table
+
+    check() answers "not suppressed" for almost every address without
+    touching the database; only filter hits are confirmed with one query per
+    call. The filter follows suppression_state like the settings cache: at
+    most once per check_interval it reads that row, adds entries written
+    since (version), and after removals (generation) loads the filter that
+    the removing transaction persisted.
+    """
+
+    def __init__(self, check_interval=5, capacity=100000, error_rate=0.001):
+        self.check_interval = check_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._filter = None
+        self._version = None
+        self._generation = None
+        self._checked = 0.0
+        self.stats = {'checked': 0, 'filter_hits': 0, 'suppressed': 0, 'reloads': 0, 'rebuilds': 0}
+
+    def _load(self, generation):
+        row = db.session.execute(
+            select(SuppressionState.filter, SuppressionState.filter_version)
+            .where(SuppressionState.id == 1, SuppressionState.filter_generation == generation)
+        ).first()
+        if row and row.filter:
+            self.stats['reloads'] += 1
+            return BloomFilter.from_bytes(row.filter), row.filter_version
+        # Nothing persisted for this generation yet (e.g. before the first flask suppressions rebuild)
+        self.stats['rebuilds'] += 1
+        return build_filter(self.capacity, self.error_rate)
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._filter is not None and now - self._checked < self.check_interval:
+                return self._filter
+
+            state = _current_state()
+            version, generation = (state.version, state.generation) if state else (0, 0)
+            if self._filter is None or generation != self._generation:
+                self._filter, self._version = self._load(generation)
+                self._generation = generation
+            if version > self._version:
+                self._filter.add_many(db.session.scalars(
+                    select(Suppression.value).where(Suppression.version > self._version, Suppression.version <= version)
+                ))
+                self._version = version
+            if self._filter.count > self._filter.capacity:
+                self.stats['rebuilds'] += 1
+                self._filter, self._version = build_filter(self.capacity, self.error_rate)
+            self._checked = now
+            return self._filter
+
+    def expire(self):
+        """Re-read suppression_state on the next check (after this process wrote to it)"""
+        with self._lock:
+            self._checked = 0.0
+
+    def check(self, addresses):
+        """Map each suppressed address in addresses to its reason"""
+        addresses = list(dict.fromkeys(addresses))
+        if not addresses:
+            return {}
+        keys = [_lookup_keys(address) for address in addresses]
+        flat = [key for address_keys in keys for key in address_keys]
+        hits = self._refresh().contains_many(flat)
+
+        candidates = {}
+        position = 0
+        for address, address_keys in zip(addresses, keys):
+            matched = [key for key, hit in zip(address_keys, hits[position:position + len(address_keys)]) if hit]
+            position += len(address_keys)
+            if matched:
+                candidates[address] = matched
+
+        reasons = {}
+        if candidates:
+            found = dict(db.session.execute(
+                select(Suppression.value, Suppression.reason)
+                .where(Suppression.value.in_({key for matched in candidates.values() for key in matched}))
+            ).all())
+            for address, matched in candidates.items():
+                reason = next((found[key] for key in matched if key in found), None)
+                if reason:
+                    reasons[address] = reason
+
+        with self._lock:
+            self.stats['checked'] += len(addresses)
+            self.stats['filter_hits'] += len(candidates)
+            self.stats['suppressed'] += len(reasons)
+        return reasons
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            if self._filter is not None:
+                stats.update(version=self._version, generation=self._generation, entries=self._filter.count,
+                             capacity=self._filter.capacity, filter_bytes=len(self._filter.bits))
+            return stats
+
+def get_suppression_list():
+    return current_app.extensions['suppression_list']
+
+def suppression_reasons(recipients):
+    """Reason (or None) for each (address, lead status) pair; one query at most"""
+    recipients = list(recipients)
+    suppressed = get_suppression_list().check(address for address, status in recipients)
+    return [
+        status if status in SUPPRESSED_LEAD_STATUSES else suppressed.get(address)
+        for address, status in recipients
+    ]
+
+def _bump_state(removed=False):
+    """Bump the version (and generation after removals); call inside the writing transaction"""
+    values = {'version': SuppressionState.version + 1}
+    if removed:
+        values['generation'] = SuppressionState.generation + 1
+    version = db.session.scalar(
+        update(SuppressionState).where(SuppressionState.id == 1).values(**values).returning(SuppressionState.version)
+    )
+    if version is None:
+        version = 1
+        db.session.execute(insert(SuppressionState).values(id=1, version=version, generation=int(removed)))
+    return version
+
+def save_filter():
+    """Build the filter for the current generation and store it in suppression_state; the caller commits"""
+    suppressions = get_suppression_list()
+    bloom, version = build_filter(suppressions.capacity, suppressions.error_rate)
+    db.session.execute(
+        update(SuppressionState).where(SuppressionState.id == 1).values(
+            filter=bloom.to_bytes(),
+            filter_generation=SuppressionState.generation,
+            filter_version=version,
+            filter_built_at=datetime.utcnow()
+        )
+    )
+    return bloom
+
+def add_suppressions(values, reason=SuppressionReason.MANUAL, created_by=None):
+    """Insert addresses/domains, ignoring ones already listed; the caller commits
+
+    Returns (added, already listed, invalid values).
+    """
+    if reason not in SUPPRESSION_REASONS:
+        raise ValueError(f'reason must be one of {", ".join(sorted(SUPPRESSION_REASONS))}')
+    entries = {}
+    invalid = []
+    for value in values:
+        normalized = normalize_suppression(value)
+        if normalized:
+            entries.setdefault(normalized[0], normalized[1])
+        else:
+            invalid.append(value)
+    if not entries:
+        return 0, 0, invalid
+
+    version = _bump_state()
+    now = datetime.utcnow()
+    insert_ = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    statement = insert_(Suppression).on_conflict_do_nothing(index_elements=[Suppression.value]).returning(Suppression.id)
+    rows = [{
+        'value': value,
+        'kind': kind,
+        'reason': reason,
+        'version': version,
+        'created_by': created_by,
+        'created_at': now
+    } for value, kind in entries.items()]
+    added = 0
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        added += len(db.session.execute(statement, rows[start:start + WRITE_BATCH_SIZE]).all())
+    return added, len(rows) - added, invalid
+
+def remove_suppressions(values):
+    """Delete entries and persist a rebuilt filter; returns the number removed, the caller commits"""
+    normalized = list({entry[0] for entry in map(normalize_suppression, values) if entry})
+    removed = 0
+    for start in range(0, len(normalized), WRITE_BATCH_SIZE):
+        removed += db.session.execute(
+            delete(Suppression).where(Suppression.value.in_(normalized[start:start + WRITE_BATCH_SIZE]))
+        ).rowcount
+    if removed:
+        _bump_state(removed=True)
+        save_filter()
+    return removed
+
+def init_suppressions(app):
+    app.extensions['suppression_list'] = SuppressionList(
+        check_interval=app.config['SUPPRESSION_CHECK_INTERVAL'],
+        capacity=app.config['SUPPRESSION_FILTER_CAPACITY'],
+        error_rate=app.config['SUPPRESSION_FILTER_ERROR_RATE']
+    )
+
+suppressions_cli = AppGroup('suppressions', help='Manage the outbound email suppression list.')
+
+@suppressions_cli.command('import')
+@click.argument('path', type=click.File('r'))
+@click.option('--reason', type=click.Choice(sorted(SUPPRESSION_REASONS)), default=SuppressionReason.MANUAL)
+def import_command(path, reason):
+    """Add one address or domain per line of PATH"""
+    added = invalid = 0
+    while True:
+        lines = [line.strip() for line in path.readlines(1 << 20) if line.strip()]
+        if not lines:
+            break
+        batch_added, _, batch_invalid = add_suppressions(lines, reason)
+        db.session.commit()
+        added += batch_added
+        invalid += len(batch_invalid)
+    click.echo(f'Added {added} entr{"y" if added == 1 else "ies"}, skipped {invalid} invalid line(s)')
+
+@suppressions_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild and store the Bloom filter, so processes load it instead of scanning the table"""
+    if _current_state() is None:
+        _bump_state()
+    bloom = save_filter()
+    db.session.commit()
+    click.echo(f'Stored a filter of {bloom.count} entries ({len(bloom.bits)} bytes before compression)')
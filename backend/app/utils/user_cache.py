@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from ..models.user import User
+
+class CachedUser:
+    """Read-only snapshot of the fields request handlers need from a User"""
+
+    FIELDS = ('id', 'email', 'first_name', 'last_name', 'role', 'calendly_link', 'is_active', 'auth_version')
+
+    def __init__(self, user):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(user, field))
+
+class UserCache:
+    """Thread-safe TTL + LRU cache of CachedUser snapshots keyed by user id
+
+    Entries are dropped explicitly when a user's role or active flag changes;
+    the TTL bounds how long other worker processes can serve a stale entry.
+    """
+
+    def __init__(self, ttl=30, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        user = User.query.get(user_id)
+        snapshot = CachedUser(user) if user else None
+        with self._lock:
+            self._entries[user_id] = (now, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
+
+# Scoped tokens are only accepted by their endpoint, e.g. the stream token that
+# travels in the query string
+STREAM_TOKEN_SCOPE = 'notification_stream'
+SCOPED_ENDPOINTS = {STREAM_TOKEN_SCOPE: 'notifications.stream_notifications'}
+
+def token_claims(user, scope=None):
+    """Extra JWT claims issued at login, or for a scoped token"""
+    claims = {'role': user.role, 'ver': user.auth_version}
+    if scope:
+        claims['scope'] = scope
+    return claims
+
+def init_user_cache(app, jwt):
+    app.extensions['user_cache'] = UserCache(
+        ttl=app.config['USER_CACHE_TTL'],
+        max_size=app.config['USER_CACHE_SIZE']
+    )
+
+    @jwt.user_lookup_loader
+    def load_current_user(jwt_header, jwt_data):
+        """Resolve flask_jwt_extended.current_user from the cache
+
+        Returning None rejects the token: unknown or deactivated users, and
+        tokens issued before the user's role or active flag last changed.
+        """
+        user = get_user_cache().get(int(jwt_data['sub']))
+        if user is None or not user.is_active:
+            return None
+        if jwt_data.get('ver', 0) != user.auth_version:
+            return None
+        return user
+
+    @jwt.user_lookup_error_loader
+    def reject_stale_token(jwt_header, jwt_data):
+        return jsonify({'error': 'Session is no longer valid, please log in again'}), 401
+
+    @jwt.token_verification_loader
+    def check_token_scope(jwt_header, jwt_data):
+        scope = jwt_data.get('scope')
+        return scope is None or SCOPED_ENDPOINTS.get(scope) == request.endpoint
+
+    @jwt.token_verification_failed_loader
+    def reject_scoped_token(jwt_header, jwt_data):
+        return jsonify({'error': 'Token is not valid for this endpoint'}), 401
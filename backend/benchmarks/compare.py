@@ -0,0 +1,60 @@
+"""Compare two benchmark result files and flag latency regressions
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.15]
+
+Exits with status 1 when any benchmark's p50 or p99 got slower by more than
+the threshold (default 15%), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p99_ms')
+# Sub-millisecond differences are noise, whatever the ratio
+MIN_DELTA_MS = 0.5
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, candidate, threshold):
+    """Return (rows, regressions); rows are (name, metric, old, new, change)"""
+    rows, regressions = [], []
+    for name, new in sorted(candidate['results'].items()):
+        old = baseline['results'].get(name)
+        if not old:
+            continue
+        for metric in METRICS:
+            if metric not in old or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            row = (name, metric, old[metric], new[metric], change)
+            rows.append(row)
+            if change > threshold and new[metric] - old[metric] > MIN_DELTA_MS:
+                regressions.append(row)
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    if baseline['meta'].get('size') != candidate['meta'].get('size'):
+        print(f'warning: comparing different dataset sizes ({baseline["meta"].get("size")} vs {candidate["meta"].get("size")})')
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f'{baseline["meta"].get("commit")} -> {candidate["meta"].get("commit")}')
+    for name, metric, old, new, change in rows:
+        flag = '  REGRESSION' if (name, metric, old, new, change) in regressions else ''
+        print(f'{name:<45} {metric:<7} {old:>10.2f} -> {new:>10.2f} ms  {change:+7.1%}{flag}')
+
+    if regressions:
+        print(f'{len(regressions)} regression(s) over {args.threshold:.0%}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,222 @@
+"""Benchmark the hot API paths against a synthetic dataset
+
+    python -m benchmarks.run --size 10k
+    python -m benchmarks.compare benchmarks/results/<old>-10k.json benchmarks/results/<new>-10k.json
+
+Requests go through the Flask test client, so the numbers measure the
+application and the database rather than a network stack.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import sqlalchemy
+from config import Config
+from app import create_app, db
+from app.models.lead import Lead
+from app.models.user import User
+from app.utils.email_outbox import OutboxWorker
+from app.utils.follow_ups import run_follow_up_pass
+from .seed import seed, SIZES, PASSWORD
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# (name, query string) for GET /api/leads
+LEAD_FILTERS = [
+    ('none', ''),
+    ('status', 'status=interested'),
+    ('search', 'search=acme'),
+    ('date_range', 'start_date={month_ago}&end_date={now}'),
+    ('assigned_to', 'assigned_to={member_id}'),
+    ('status_assigned_to', 'status=interested&assigned_to={member_id}'),
+    ('search_status', 'search=acme&status=interested'),
+    ('all', 'search=acme&status=interested&assigned_to={member_id}&start_date={month_ago}&end_date={now}'),
+    ('fields_projection', 'fields=name,email,status'),
+    ('include_total', 'include_total=true'),
+]
+
+def make_config(database_url):
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        EMAIL_TRANSPORT = 'fake'
+        EMAIL_RATE_PER_SECOND = 1_000_000
+        EMAIL_RATE_BURST = 1_000_000
+        JWT_ACCESS_TOKEN_EXPIRES = False
+    return BenchmarkConfig
+
+def summarize(samples, wall_seconds):
+    samples = sorted(samples)
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(round(p * (len(samples) - 1))))] * 1000
+    return {
+        'iterations': len(samples),
+        'p50_ms': round(percentile(0.50), 3),
+        'p90_ms': round(percentile(0.90), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+        'throughput_per_s': round(len(samples) / wall_seconds, 1) if wall_seconds else None
+    }
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+def expect(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response
+
+class Runner:
+    def __init__(self, app, iterations, warmup):
+        self.app = app
+        self.client = app.test_client()
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results = {}
+
+    def login(self, email):
+        response = expect(self.client.post('/api/auth/login', json={'email': email, 'password': PASSWORD}))
+        return {'Authorization': f'Bearer {response.get_json()["token"]}'}
+
+    def bench(self, name, fn, iterations=None):
+        result = measure(fn, iterations or self.iterations, self.warmup)
+        self.results[name] = result
+        print(f'{name:<45} p50 {result["p50_ms"]:>9.2f} ms  p99 {result["p99_ms"]:>9.2f} ms  {result["throughput_per_s"]:>8} /s', flush=True)
+
+    def run(self):
+        with self.app.app_context():
+            admin = User.query.filter_by(role='admin').first()
+            member = User.query.filter_by(role='team_member').order_by(User.id).first()
+            lead_id = db.session.query(Lead.id).filter(Lead.assigned_to == member.id).order_by(Lead.id.desc()).limit(1).scalar()
+            admin_email, member_email, member_id = admin.email, member.email, member.id
+
+        headers = {'admin': self.login(admin_email), 'member': self.login(member_email)}
+        now = datetime.utcnow()
+        params = {
+            'member_id': member_id,
+            'now': now.isoformat(),
+            'month_ago': (now - timedelta(days=30)).isoformat()
+        }
+
+        # bcrypt dominates login by design; fewer iterations keep runs short
+        self.bench('login', lambda: expect(self.client.post(
+            '/api/auth/login', json={'email': member_email, 'password': PASSWORD}
+        )), iterations=max(5, self.iterations // 10))
+
+        for role in ('admin', 'member'):
+            for name, query in LEAD_FILTERS:
+                url = '/api/leads?' + query.format(**params)
+                self.bench(f'get_leads[{role}:{name}]', lambda url=url, role=role: expect(self.client.get(url, headers=headers[role])))
+
+        self.bench('get_lead_timeline', lambda: expect(self.client.get(f'/api/leads/{lead_id}/timeline', headers=headers['member'])))
+        self.bench('search_leads', lambda: expect(self.client.get('/api/leads/search?q=acme', headers=headers['member'])))
+
+        self.bench('notifications_list', lambda: expect(self.client.get('/api/notifications?status=all', headers=headers['member'])))
+        self.bench('notifications_unread_count', lambda: expect(self.client.get('/api/notifications/unread-count', headers=headers['member'])))
+
+        self.bench('send_lead_email[enqueue]', lambda: expect(self.client.post(
+            f'/api/leads/{lead_id}/send-email',
+            json={'subject': 'Benchmark', 'content': 'Hello from the benchmark'},
+            headers=headers['member']
+        ), 202))
+
+        with self.app.app_context():
+            worker = OutboxWorker(self.app)
+            sent = 0
+            start = time.perf_counter()
+            while True:
+                summary = worker.run_once()
+                if not summary['sent'] and not summary['retried']:
+                    break
+                sent += summary['sent']
+            elapsed = time.perf_counter() - start
+            db.session.remove()
+        self.results['outbox_drain[fake_transport]'] = {
+            'messages': sent,
+            'seconds': round(elapsed, 3),
+            'throughput_per_s': round(sent / elapsed, 1) if elapsed else None
+        }
+        print(f'{"outbox_drain[fake_transport]":<45} {sent} messages in {elapsed:.2f} s', flush=True)
+
+        self.bench('check_follow_ups[endpoint]', lambda: expect(self.client.get('/api/notifications/check-follow-ups', headers=headers['member'])))
+
+        # The first (warm-up) pass creates the due notifications; later passes
+        # measure the steady-state cost of finding nothing new to do
+        def follow_up_pass():
+            with self.app.app_context():
+                run_follow_up_pass()
+                db.session.remove()
+        self.bench('follow_up_pass[scheduler]', follow_up_pass, iterations=max(5, self.iterations // 10))
+
+        return self.results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k', help='Number of leads to seed')
+    parser.add_argument('--database-url', help='Database to seed and benchmark (default: a temporary SQLite file)')
+    parser.add_argument('--reuse', action='store_true', help='Skip seeding if the database already has leads')
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<commit>-<size>.json)')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url or f'sqlite:///{os.path.join(tempfile.gettempdir(), f"crm-benchmark-{args.size}.db")}'
+    app = create_app(make_config(database_url))
+
+    with app.app_context():
+        db.create_all()
+        if args.reuse and db.session.query(Lead.id).first():
+            dataset = {'reused': True, 'leads': db.session.query(Lead).count()}
+        else:
+            db.drop_all()
+            db.create_all()
+            print(f'Seeding {args.size} leads into {database_url} ...', flush=True)
+            dataset = seed(SIZES[args.size])
+            print(f'Seeded {dataset}', flush=True)
+        db.session.remove()
+
+    results = Runner(app, args.iterations, args.warmup).run()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'size': args.size,
+            'dataset': dataset,
+            'database': sqlalchemy.engine.make_url(database_url).get_backend_name(),
+            'iterations': args.iterations,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{report["meta"]["commit"] or "local"}-{args.size}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f'Wrote {output}')
+    return report
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,131 @@
+import random
+import time
+from datetime import datetime, timedelta
+import bcrypt
+from sqlalchemy import insert, select
+from app import db
+from app.models.lead import Lead, Note, EmailLog, LeadStatus, ResponseType
+from app.models.settings import Settings, SettingsKeys
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.models.user import User
+from app.utils.search import rebuild_search_index
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark'
+TEAM_SIZE = 20
+INDUSTRIES = ['software', 'finance', 'retail', 'healthcare', 'logistics', 'media']
+WORDS = ['acme', 'global', 'north', 'data', 'cloud', 'labs', 'systems', 'partners', 'digital', 'works']
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(model, rows):
+    count = 0
+    for batch in _batches(rows):
+        db.session.execute(insert(model), batch)
+        count += len(batch)
+    db.session.commit()
+    return count
+
+def seed(lead_count, rng=None):
+    """Populate an empty database with a synthetic team and lead history
+
+    Per lead: ~2 emails, ~1 note; per user: ~1 notification per 50 leads.
+    Returns row counts per table and the seeding time.
+    """
+    rng = rng or random.Random(42)
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    password_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    users = [{
+        'email': 'admin@bench.local' if i == 0 else f'member{i}@bench.local',
+        'password_hash': password_hash,
+        'first_name': 'Bench',
+        'last_name': f'User{i}',
+        'role': 'admin' if i == 0 else 'team_member',
+        'created_at': now,
+        'is_active': True,
+        'auth_version': 0
+    } for i in range(TEAM_SIZE + 1)]
+    _insert(User, users)
+    # The outbox needs a sender; the benchmark uses the fake transport
+    db.session.add(Settings(key=SettingsKeys.GLOBAL_EMAIL, value='sales@bench.local'))
+    user_ids = db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+    members = user_ids[1:]
+    statuses = [status.value for status in LeadStatus]
+    response_types = [response_type.value for response_type in ResponseType]
+
+    def leads():
+        for i in range(lead_count):
+            created_at = now - timedelta(minutes=i * 3)
+            company = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}'
+            yield {
+                'name': f'Lead {i}',
+                'email': f'lead{i}@{company.replace(" ", "").lower()}.example',
+                'company_name': company,
+                'industry': rng.choice(INDUSTRIES),
+                'status': rng.choice(statuses),
+                'assigned_to': members[i % len(members)],
+                'created_at': created_at,
+                'updated_at': created_at,
+                'last_contact_date': created_at + timedelta(days=1) if i % 3 else None,
+                'next_follow_up': now + timedelta(hours=rng.randint(-72, 72)) if i % 5 == 0 else None
+            }
+    counts = {'users': len(users), 'leads': _insert(Lead, leads())}
+
+    lead_rows = db.session.execute(select(Lead.id, Lead.assigned_to, Lead.created_at)).all()
+
+    def emails():
+        for lead_id, assigned_to, created_at in lead_rows:
+            for n in range(rng.choice((1, 2, 2, 3))):
+                received = n % 2 == 1
+                yield {
+                    'lead_id': lead_id,
+                    'user_id': assigned_to,
+                    'direction': 'received' if received else 'sent',
+                    'subject': f'Re: intro {n}',
+                    'content': 'Hello, following up on our conversation.',
+                    'response_type': rng.choice(response_types) if received else None,
+                    'sent_at': created_at + timedelta(hours=n * 6)
+                }
+    counts['email_logs'] = _insert(EmailLog, emails())
+
+    def notes():
+        for lead_id, assigned_to, created_at in lead_rows:
+            yield {
+                'lead_id': lead_id,
+                'user_id': assigned_to,
+                'content': 'Spoke on the phone, interested in a demo.',
+                'created_at': created_at,
+                'updated_at': created_at
+            }
+    counts['notes'] = _insert(Note, notes())
+
+    def notifications():
+        for lead_id, assigned_to, created_at in lead_rows[::50]:
+            yield {
+                'user_id': assigned_to,
+                'lead_id': lead_id,
+                'type': NotificationType.FOLLOW_UP,
+                'title': 'Follow-up scheduled',
+                'message': 'You have a scheduled follow-up.',
+                'status': rng.choice((NotificationStatus.UNREAD, NotificationStatus.READ)),
+                'created_at': created_at,
+                'scheduled_for': created_at + timedelta(days=2)
+            }
+    counts['notifications'] = _insert(Notification, notifications())
+
+    # Built once at the end; the FTS triggers would otherwise fire per row
+    rebuild_search_index()
+
+    counts['seconds'] = round(time.perf_counter() - start, 2)
+    return counts
@@ -8,10 +8,32 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///crm.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied on every new SQLite connection; ignored for other databases
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),  # durable in WAL mode except on power loss
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    }
     
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key')  # Change in production
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+    JWT_TOKEN_LOCATION = ['headers']
+    # EventSource cannot set headers, so the notification stream also takes a
+    # short-lived stream-only token as ?jwt= (POST /api/notifications/stream-token)
+    NOTIFICATION_STREAM_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('NOTIFICATION_STREAM_TOKEN_EXPIRES', 60)))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # seconds
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+
+    # Passwords
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))  # existing hashes are upgraded on login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # processes per worker; 0 hashes inline
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # seconds before login answers 503
+    LOGIN_RATE_LIMIT_PER_EMAIL = int(os.getenv('LOGIN_RATE_LIMIT_PER_EMAIL', 10))
+    LOGIN_RATE_LIMIT_PER_IP = int(os.getenv('LOGIN_RATE_LIMIT_PER_IP', 50))
+    LOGIN_RATE_LIMIT_WINDOW = int(os.getenv('LOGIN_RATE_LIMIT_WINDOW', 300))  # seconds
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))  # proxies in front of the app whose X-Forwarded-* headers are trusted
     
     # Email
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -23,14 +45,90 @@ class Config:
     # Application
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')  # Change in production
     BASE_URL = os.getenv('BASE_URL', 'http://localhost:3000')
+    SETTINGS_CACHE_CHECK_INTERVAL = float(os.getenv('SETTINGS_CACHE_CHECK_INTERVAL', 5))  # seconds between version checks
+
+    # Notifications stream
+    NOTIFICATION_BROKER_URL = os.getenv('NOTIFICATION_BROKER_URL', 'memory://')  # redis://... to share across workers
+    NOTIFICATION_STREAM_HEARTBEAT = int(os.getenv('NOTIFICATION_STREAM_HEARTBEAT', 15))  # seconds
+    NOTIFICATION_STREAM_MAX_AGE = int(os.getenv('NOTIFICATION_STREAM_MAX_AGE', 300))  # seconds before the client reconnects
+    NOTIFICATION_STREAM_POLL_INTERVAL = float(os.getenv('NOTIFICATION_STREAM_POLL_INTERVAL', 5))  # seconds; memory:// broker only
+    # Open streams per worker process, each holding a thread; more get a 503 and the
+    # browser polls until it gets one. Defaults to half of GUNICORN_THREADS
+    NOTIFICATION_STREAM_MAX_PER_WORKER = int(os.getenv(
+        'NOTIFICATION_STREAM_MAX_PER_WORKER', max(1, int(os.getenv('GUNICORN_THREADS', 8)) // 2)
+    ))
+
+    # Follow-up scheduler (flask follow-ups run)
+    FOLLOW_UP_SCHEDULER_INTERVAL = int(os.getenv('FOLLOW_UP_SCHEDULER_INTERVAL', 60))  # seconds
+    FOLLOW_UP_LOOKAHEAD_HOURS = int(os.getenv('FOLLOW_UP_LOOKAHEAD_HOURS', 24))
+    FOLLOW_UP_REMINDER_MINUTES = int(os.getenv('FOLLOW_UP_REMINDER_MINUTES', 60))
+
+    # Outbound email queue (flask outbox work)
+    EMAIL_TRANSPORT = os.getenv('EMAIL_TRANSPORT', 'gmail')  # 'gmail' or 'fake'
+    EMAIL_WORKER_CONCURRENCY = int(os.getenv('EMAIL_WORKER_CONCURRENCY', 4))
+    EMAIL_WORKER_BATCH_SIZE = int(os.getenv('EMAIL_WORKER_BATCH_SIZE', 50))
+    EMAIL_WORKER_IDLE_INTERVAL = float(os.getenv('EMAIL_WORKER_IDLE_INTERVAL', 2))  # seconds
+    EMAIL_RATE_PER_SECOND = float(os.getenv('EMAIL_RATE_PER_SECOND', 2))  # Gmail API send quota
+    EMAIL_RATE_BURST = int(os.getenv('EMAIL_RATE_BURST', 10))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+    EMAIL_SENDING_TIMEOUT = int(os.getenv('EMAIL_SENDING_TIMEOUT', 600))  # reclaim stuck messages after
+    SUPPRESSION_CHECK_INTERVAL = float(os.getenv('SUPPRESSION_CHECK_INTERVAL', 5))  # seconds between suppression list version checks
+    SUPPRESSION_FILTER_CAPACITY = int(os.getenv('SUPPRESSION_FILTER_CAPACITY', 100000))  # minimum entries the Bloom filter is sized for
+    SUPPRESSION_FILTER_ERROR_RATE = float(os.getenv('SUPPRESSION_FILTER_ERROR_RATE', 0.001))  # share of addresses confirmed in the database
+
+    # Inbound reply sync (flask replies sync)
+    REPLY_SYNC_MAILBOX = os.getenv('REPLY_SYNC_MAILBOX', 'gmail')  # 'gmail' or 'fake'
+    REPLY_SYNC_FAKE_MAILBOX = os.getenv('REPLY_SYNC_FAKE_MAILBOX')  # JSON file of messages preloaded into the fake mailbox
+    REPLY_SYNC_BATCH_SIZE = int(os.getenv('REPLY_SYNC_BATCH_SIZE', 500))  # messages fetched and written per batch
+    REPLY_SYNC_INTERVAL = float(os.getenv('REPLY_SYNC_INTERVAL', 60))  # seconds
+    REPLY_CLASSIFIER_MODEL = os.getenv('REPLY_CLASSIFIER_MODEL', 'reply_classifier.npz')  # written by flask replies train; until then only the rules label replies
+    REPLY_CLASSIFIER_MIN_CONFIDENCE = float(os.getenv('REPLY_CLASSIFIER_MIN_CONFIDENCE', 0.6))  # below this replies stay unlabelled
+    REPLY_CLASSIFIER_BATCH_SIZE = int(os.getenv('REPLY_CLASSIFIER_BATCH_SIZE', 2000))  # rows per backfill batch
+
+    # Delta sync (GET /api/leads/changes)
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))  # older sync tokens get 410
+
+    # Request instrumentation (Server-Timing headers, SQL stats, /metrics); off by default
+    INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'False').lower() == 'true'
+    INSTRUMENTATION_SLOW_REQUEST_MS = int(os.getenv('INSTRUMENTATION_SLOW_REQUEST_MS', 500))  # log requests slower than this
+    INSTRUMENTATION_SLOW_STATEMENTS = int(os.getenv('INSTRUMENTATION_SLOW_STATEMENTS', 5))  # statements included in that log
+    INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(os.getenv('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 10))  # same statement per request
+    INSTRUMENTATION_PROFILE_THRESHOLD_MS = int(os.getenv('INSTRUMENTATION_PROFILE_THRESHOLD_MS', 0))  # 0 disables cProfile
+    INSTRUMENTATION_PROFILE_DIR = os.getenv('INSTRUMENTATION_PROFILE_DIR', 'profiles')
+    INSTRUMENTATION_METRICS_TOKEN = os.getenv('INSTRUMENTATION_METRICS_TOKEN')  # bearer token required by /metrics if set
 
 class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
     DEBUG = False
-    # Add production-specific settings here
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 1))  # nginx, see DEPLOYMENT.md
+    # Per worker process; keep pool_size + max_overflow >= GUNICORN_THREADS
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds to wait for a connection
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # seconds
+        'pool_pre_ping': True
+    }
 
 class TestingConfig(Config):
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:' 
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    EMAIL_TRANSPORT = 'fake'
+    REPLY_SYNC_MAILBOX = 'fake'
+    BCRYPT_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0 
+    REPLY_CLASSIFIER_MODEL = None
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig
+}
+
+def get_config(name=None):
+    """Config class for name, APP_CONFIG or FLASK_ENV (default: development)"""
+    name = name or os.getenv('APP_CONFIG') or os.getenv('FLASK_ENV') or 'development'
+    return config_by_name[name]
@@ -0,0 +1,29 @@
+"""add enqueue progress to campaigns so outbox workers queue recipients in batches
+
+Revision ID: 9e0f1a2b3c4d
+Revises: 8d9e0f1a2b3c
+Create Date: 2024-02-03 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9e0f1a2b3c4d'
+down_revision = '8d9e0f1a2b3c'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('campaigns') as batch_op:
+        batch_op.add_column(sa.Column('scheduled_follow_up', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('enqueued_through', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('enqueued_at', sa.DateTime(), nullable=True))
+    # Existing campaigns were queued in full when they were created
+    op.execute("UPDATE campaigns SET enqueued_at = created_at")
+
+def downgrade():
+    with op.batch_alter_table('campaigns') as batch_op:
+        batch_op.drop_column('enqueued_at')
+        batch_op.drop_column('enqueued_through')
+        batch_op.drop_column('scheduled_follow_up')
@@ -0,0 +1,58 @@
+"""add change_version columns, sync_version and sync_tombstones for delta sync
+
+Revision ID: 4f5a6b7c8d9e
+Revises: 3e4f5a6b7c8d
+Create Date: 2024-01-26 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4f5a6b7c8d9e'
+down_revision = '3e4f5a6b7c8d'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ['leads', 'notes', 'email_logs']
+
+def upgrade():
+    op.create_table('sync_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('pruned_through', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Existing rows start at version 1, so a first sync from 0 picks them up
+    op.execute('INSERT INTO sync_version (id, version, pruned_through) VALUES (1, 1, 0)')
+
+    op.create_table('sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=10), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('moved', sa.Boolean(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sync_tombstones_version', 'sync_tombstones', ['version'], unique=False)
+    op.create_index('ix_sync_tombstones_user_id_version', 'sync_tombstones', ['user_id', 'version'], unique=False)
+
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('change_version', sa.BigInteger(), nullable=False, server_default='1'))
+        op.create_index(f'ix_{table}_change_version', table, ['change_version'], unique=False)
+    op.create_index('ix_leads_assigned_to_change_version', 'leads', ['assigned_to', 'change_version'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_leads_assigned_to_change_version', table_name='leads')
+    for table in VERSIONED_TABLES:
+        op.drop_index(f'ix_{table}_change_version', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('change_version')
+    op.drop_index('ix_sync_tombstones_user_id_version', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_version', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_table('sync_version')
@@ -0,0 +1,25 @@
+"""add response_type_source to email_logs so the classifier trains on manual labels only
+
+Revision ID: 8d9e0f1a2b3c
+Revises: 7c8d9e0f1a2b
+Create Date: 2024-02-02 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8d9e0f1a2b3c'
+down_revision = '7c8d9e0f1a2b'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('email_logs') as batch_op:
+        batch_op.add_column(sa.Column('response_type_source', sa.String(length=10), nullable=True))
+    # Existing labels cannot be told apart from classifier output, so they keep a
+    # NULL source and are not trained on; relabel them by hand to use them
+
+def downgrade():
+    with op.batch_alter_table('email_logs') as batch_op:
+        batch_op.drop_column('response_type_source')
@@ -0,0 +1,36 @@
+"""add composite indexes for lead, email log, note and notification queries
+
+Revision ID: 6d7e8f9a0b1c
+Revises: 5c6d7e8f9a0b
+Create Date: 2024-01-16 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '6d7e8f9a0b1c'
+down_revision = '5c6d7e8f9a0b'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_leads_created_at_id', 'leads', ['created_at', 'id']),
+    ('ix_leads_assigned_to_created_at_id', 'leads', ['assigned_to', 'created_at', 'id']),
+    ('ix_leads_status_created_at_id', 'leads', ['status', 'created_at', 'id']),
+    ('ix_leads_assigned_to_status_created_at', 'leads', ['assigned_to', 'status', 'created_at']),
+    ('ix_leads_assigned_to_next_follow_up', 'leads', ['assigned_to', 'next_follow_up']),
+    ('ix_leads_next_follow_up', 'leads', ['next_follow_up']),
+    ('ix_activities_lead_id_created_at', 'activities', ['lead_id', 'created_at']),
+    ('ix_notes_lead_id_created_at', 'notes', ['lead_id', 'created_at']),
+    ('ix_email_logs_lead_id_sent_at', 'email_logs', ['lead_id', 'sent_at']),
+    ('ix_notifications_user_id_status_created_at', 'notifications', ['user_id', 'status', 'created_at']),
+    ('ix_notifications_lead_id_type_scheduled_for', 'notifications', ['lead_id', 'type', 'scheduled_for']),
+]
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,20 @@
+"""add leads email index for import de-duplication
+
+Revision ID: 7e8f9a0b1c2d
+Revises: 6d7e8f9a0b1c
+Create Date: 2024-01-17 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7e8f9a0b1c2d'
+down_revision = '6d7e8f9a0b1c'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_leads_email', 'leads', ['email'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_leads_email', table_name='leads')
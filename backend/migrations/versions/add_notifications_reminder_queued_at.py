@@ -0,0 +1,34 @@
+"""add reminder_queued_at to notifications so reminders are queued once per follow-up
+
+Revision ID: 7c8d9e0f1a2b
+Revises: 6b7c8d9e0f1a
+Create Date: 2024-02-01 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7c8d9e0f1a2b'
+down_revision = '6b7c8d9e0f1a'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.add_column(sa.Column('reminder_queued_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_notifications_type_scheduled_for', ['type', 'scheduled_for'], unique=False)
+    # Follow-ups that already have a reminder in the outbox must not get a second one
+    op.execute("""
+        UPDATE notifications SET reminder_queued_at = created_at
+        WHERE type = 'follow_up' AND EXISTS (
+            SELECT 1 FROM email_outbox
+            WHERE email_outbox.kind = 'reminder' AND email_outbox.lead_id = notifications.lead_id
+              AND email_outbox.created_at >= notifications.created_at
+        )
+    """)
+
+def downgrade():
+    with op.batch_alter_table('notifications') as batch_op:
+        batch_op.drop_index('ix_notifications_type_scheduled_for')
+        batch_op.drop_column('reminder_queued_at')
@@ -0,0 +1,23 @@
+"""add users.auth_version for token revocation
+
+Revision ID: 0b1c2d3e4f5a
+Revises: 9a0b1c2d3e4f
+Create Date: 2024-01-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0b1c2d3e4f5a'
+down_revision = '9a0b1c2d3e4f'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('auth_version', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('auth_version')
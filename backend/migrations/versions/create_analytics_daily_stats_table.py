@@ -0,0 +1,32 @@
+"""create analytics_daily_stats rollup table
+
+Revision ID: 1c2d3e4f5a6b
+Revises: 0b1c2d3e4f5a
+Create Date: 2024-01-23 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '1c2d3e4f5a6b'
+down_revision = '0b1c2d3e4f5a'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('analytics_daily_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('metric', sa.String(length=40), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'user_id', 'metric', name='uq_analytics_daily_stats_day_user_metric')
+    )
+    op.create_index('ix_analytics_daily_stats_metric_day', 'analytics_daily_stats', ['metric', 'day'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_analytics_daily_stats_metric_day', table_name='analytics_daily_stats')
+    op.drop_table('analytics_daily_stats')
@@ -0,0 +1,43 @@
+"""create campaigns table and link outbox messages to campaigns
+
+Revision ID: 9a0b1c2d3e4f
+Revises: 8f9a0b1c2d3e
+Create Date: 2024-01-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9a0b1c2d3e4f'
+down_revision = '8f9a0b1c2d3e'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('campaigns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('subject_template', sa.String(length=200), nullable=False),
+        sa.Column('body_template', sa.Text(), nullable=False),
+        sa.Column('filters', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('total_recipients', sa.Integer(), nullable=False),
+        sa.Column('skipped_recipients', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.add_column(sa.Column('campaign_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_email_outbox_campaign_id', 'campaigns', ['campaign_id'], ['id'])
+        batch_op.create_index('ix_email_outbox_campaign_id_status', ['campaign_id', 'status'], unique=False)
+
+def downgrade():
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.drop_index('ix_email_outbox_campaign_id_status')
+        batch_op.drop_constraint('fk_email_outbox_campaign_id', type_='foreignkey')
+        batch_op.drop_column('campaign_id')
+    op.drop_table('campaigns')
@@ -0,0 +1,32 @@
+"""create lead_match_keys table for duplicate detection
+
+Revision ID: 5a6b7c8d9e0f
+Revises: 4f5a6b7c8d9e
+Create Date: 2024-01-29 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5a6b7c8d9e0f'
+down_revision = '4f5a6b7c8d9e'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Filled by `flask dedup index` after upgrading
+    op.create_table('lead_match_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['lead_id'], ['leads.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_lead_match_keys_key_lead_id', 'lead_match_keys', ['key', 'lead_id'], unique=False)
+    op.create_index('ix_lead_match_keys_lead_id', 'lead_match_keys', ['lead_id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_lead_match_keys_lead_id', table_name='lead_match_keys')
+    op.drop_index('ix_lead_match_keys_key_lead_id', table_name='lead_match_keys')
+    op.drop_table('lead_match_keys')
@@ -0,0 +1,25 @@
+"""create leads full-text search index
+
+Revision ID: 5c6d7e8f9a0b
+Revises: 4b5c6d7e8f9g
+Create Date: 2024-01-15 09:00:00.000000
+
+"""
+from alembic import op
+from app.utils.search import create_search_index, drop_search_index
+
+# revision identifiers, used by Alembic.
+revision = '5c6d7e8f9a0b'
+down_revision = '4b5c6d7e8f9g'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    create_search_index(bind)
+    if bind.dialect.name == 'sqlite':
+        # Backfill existing rows; the triggers only cover future writes
+        op.execute("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')")
+
+def downgrade():
+    drop_search_index(op.get_bind())
@@ -0,0 +1,37 @@
+"""create mailbox_sync_state table and gmail_message_id on email_logs for reply sync
+
+Revision ID: 3e4f5a6b7c8d
+Revises: 2d3e4f5a6b7c
+Create Date: 2024-01-25 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3e4f5a6b7c8d'
+down_revision = '2d3e4f5a6b7c'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('mailbox_sync_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('address', sa.String(length=120), nullable=False),
+        sa.Column('history_id', sa.String(length=30), nullable=False),
+        sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('messages_ingested', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('address')
+    )
+    with op.batch_alter_table('email_logs') as batch_op:
+        batch_op.add_column(sa.Column('gmail_message_id', sa.String(length=100), nullable=True))
+    op.create_index('ix_email_logs_gmail_message_id', 'email_logs', ['gmail_message_id'], unique=True)
+    op.create_index('ix_leads_email_lower', 'leads', [sa.text('lower(email)')], unique=False)
+
+def downgrade():
+    op.drop_index('ix_leads_email_lower', table_name='leads')
+    op.drop_index('ix_email_logs_gmail_message_id', table_name='email_logs')
+    with op.batch_alter_table('email_logs') as batch_op:
+        batch_op.drop_column('gmail_message_id')
+    op.drop_table('mailbox_sync_state')
@@ -0,0 +1,26 @@
+"""create settings_version table for settings cache invalidation
+
+Revision ID: 2d3e4f5a6b7c
+Revises: 1c2d3e4f5a6b
+Create Date: 2024-01-24 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2d3e4f5a6b7c'
+down_revision = '1c2d3e4f5a6b'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('settings_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO settings_version (id, version) VALUES (1, 0)')
+
+def downgrade():
+    op.drop_table('settings_version')
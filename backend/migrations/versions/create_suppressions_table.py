@@ -0,0 +1,49 @@
+"""create suppressions and suppression_state tables, suppression_reason on email_outbox
+
+Revision ID: 6b7c8d9e0f1a
+Revises: 5a6b7c8d9e0f
+Create Date: 2024-01-30 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '6b7c8d9e0f1a'
+down_revision = '5a6b7c8d9e0f'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('suppressions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.String(length=255), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('reason', sa.String(length=20), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('value')
+    )
+    op.create_index('ix_suppressions_version', 'suppressions', ['version'], unique=False)
+    op.create_table('suppression_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('generation', sa.Integer(), nullable=False),
+        sa.Column('filter', sa.LargeBinary(), nullable=True),
+        sa.Column('filter_generation', sa.Integer(), nullable=True),
+        sa.Column('filter_version', sa.Integer(), nullable=True),
+        sa.Column('filter_built_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.add_column(sa.Column('suppression_reason', sa.String(length=20), nullable=True))
+
+def downgrade():
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.drop_column('suppression_reason')
+    op.drop_table('suppression_state')
+    op.drop_index('ix_suppressions_version', table_name='suppressions')
+    op.drop_table('suppressions')
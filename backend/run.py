@@ -1,8 +1,10 @@
 from app import create_app
 from app.utils.init_db import init_db
+from config import get_config
 
-app = create_app()
+app = create_app(get_config())
 
 if __name__ == '__main__':
     init_db()  # Initialize database and create admin user if needed
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    app.run(debug=app.config.get('DEBUG', False), host='0.0.0.0', port=5000)
@@ -0,0 +1,25 @@
+import pytest
+from config import TestingConfig
+from app import create_app, db as _db
+from app.models.user import User
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+@pytest.fixture
+def db(app):
+    return _db
+
+@pytest.fixture
+def user(db):
+    user = User(email='owner@example.com', first_name='Olive', last_name='Owner', role='team_member')
+    user.set_password('password')
+    db.session.add(user)
+    db.session.commit()
+    return user
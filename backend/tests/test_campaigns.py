@@ -0,0 +1,72 @@
+import pytest
+from app.models.campaign import Campaign, CampaignStatus
+from app.models.lead import Lead
+from app.models.outbox import OutboundEmail, OutboxStatus
+from app.models.settings import Settings, SettingsKeys
+from app.models.user import User
+from app.utils import campaigns
+from app.utils.email_outbox import OutboxWorker
+
+@pytest.fixture
+def client(app, db, user):
+    db.session.add(Settings(key=SettingsKeys.GLOBAL_EMAIL, value='sales@example.com'))
+    for name, email in [('Ada', 'ada@example.com'), ('Bob', 'bob@example.com'), ('Ada again', ' ADA@example.com')]:
+        db.session.add(Lead(name=name, email=email, company_name='Engines', assigned_to=user.id))
+    db.session.commit()
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+def campaign_status(client, campaign_id):
+    return client.get(f'/api/campaigns/{campaign_id}').json['status']
+
+def test_workers_queue_recipients_in_batches(app, db, client, monkeypatch):
+    monkeypatch.setattr(campaigns, 'BATCH_SIZE', 2)
+    response = client.post('/api/campaigns', json={'name': 'Launch', 'subject': 'Hi {{name}}', 'body': 'Hello'})
+    assert response.status_code == 202
+    campaign_id = response.json['campaign']['id']
+    assert response.json['campaign']['status'] == CampaignStatus.QUEUED
+    assert OutboundEmail.query.count() == 0
+
+    worker = OutboxWorker(app)
+    assert worker.run_once() == {'sent': 2, 'retried': 0, 'failed': 0, 'suppressed': 0, 'enqueued': 2}
+    assert campaign_status(client, campaign_id) == CampaignStatus.QUEUED
+
+    worker.run_once()  # the repeated address; nothing new to queue
+    worker.run_once()  # no leads left: the campaign is queued in full and already sent
+    campaign = db.session.get(Campaign, campaign_id)
+    assert (campaign.status, campaign.total_recipients, campaign.skipped_recipients) == (CampaignStatus.COMPLETED, 2, 1)
+    assert sorted(message.to_address for message in OutboundEmail.query) == ['ada@example.com', 'bob@example.com']
+
+def test_progress_is_read_only_and_workers_complete_campaigns(app, db, client):
+    campaign_id = client.post('/api/campaigns', json={'name': 'Launch', 'subject': 'Hi', 'body': 'Hello'}).json['campaign']['id']
+    worker = OutboxWorker(app)
+    worker.run_once()
+    # As if the workers' own completion checks had raced each other
+    OutboundEmail.query.update({'status': OutboxStatus.SENT})
+    Campaign.query.filter_by(id=campaign_id).update({'status': CampaignStatus.SENDING})
+    db.session.commit()
+
+    assert campaign_status(client, campaign_id) == CampaignStatus.SENDING
+    db.session.expire_all()
+    assert db.session.get(Campaign, campaign_id).status == CampaignStatus.SENDING
+
+    worker.run_once()
+    db.session.expire_all()
+    assert db.session.get(Campaign, campaign_id).status == CampaignStatus.COMPLETED
+
+def test_members_cannot_mail_other_owners_leads(app, db, client):
+    other = User(email='other@example.com', first_name='Otto', last_name='Other', role='team_member')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Lead(name='Cy', email='cy@example.com', company_name='Engines', assigned_to=other.id))
+    db.session.commit()
+
+    for filters in ({'assigned_to': other.id}, {'lead_ids': [lead.id for lead in Lead.query.filter_by(assigned_to=other.id)]}):
+        response = client.post('/api/campaigns', json={'name': 'Poach', 'subject': 'Hi', 'body': 'Hello', 'filters': filters})
+        assert response.status_code == 202
+    OutboxWorker(app).run_once()
+    OutboxWorker(app).run_once()
+    assert OutboundEmail.query.count() == 0
@@ -0,0 +1,25 @@
+from app.models.lead import Lead
+from app.utils import delta_sync
+
+def add_lead(db, user, name):
+    lead = Lead(name=name, email=f'{name.lower()}@example.com', company_name='Engines', assigned_to=user.id)
+    db.session.add(lead)
+    db.session.commit()
+    return lead
+
+def test_changes_past_the_settled_version_wait_for_the_next_sync(app, db, user, monkeypatch):
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+    first = add_lead(db, user, 'Ada')
+    second = add_lead(db, user, 'Bob')
+
+    # As if Bob's transaction were still running when the versions were read
+    settled = delta_sync.settled_change_version
+    monkeypatch.setattr(delta_sync, 'settled_change_version', lambda connection: first.change_version)
+    changes = client.get('/api/leads/changes', headers=headers).json
+    assert [lead['id'] for lead in changes['leads']] == [first.id]
+
+    monkeypatch.setattr(delta_sync, 'settled_change_version', settled)
+    changes = client.get('/api/leads/changes', headers=headers, query_string={'since': changes['version']}).json
+    assert [lead['id'] for lead in changes['leads']] == [second.id]
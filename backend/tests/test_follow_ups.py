@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+from app.models.lead import Lead
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.models.outbox import OutboundEmail, OutboxKind
+from app.utils.follow_ups import run_follow_up_pass
+
+NOW = datetime(2030, 1, 1, 9, 0)
+
+def make_lead(db, user, follow_up):
+    lead = Lead(name='Ada Lovelace', email='ada@example.com', company_name='Engines', assigned_to=user.id,
+                next_follow_up=follow_up)
+    db.session.add(lead)
+    db.session.commit()
+    return lead
+
+def reminders():
+    return OutboundEmail.query.filter_by(kind=OutboxKind.REMINDER).all()
+
+def test_reminder_queued_when_follow_up_enters_window(db, user):
+    lead = make_lead(db, user, NOW + timedelta(hours=3))
+
+    first = run_follow_up_pass(NOW)
+    assert first == {'notifications_created': 1, 'reminders_queued': 0}
+
+    second = run_follow_up_pass(NOW + timedelta(hours=2, minutes=30))
+    assert second == {'notifications_created': 0, 'reminders_queued': 1}
+    assert [(message.lead_id, message.to_address) for message in reminders()] == [(lead.id, user.email)]
+
+    third = run_follow_up_pass(NOW + timedelta(hours=2, minutes=45))
+    assert third == {'notifications_created': 0, 'reminders_queued': 0}
+    assert len(reminders()) == 1
+
+def test_reminder_for_notification_created_elsewhere(db, user):
+    lead = make_lead(db, user, NOW + timedelta(minutes=30))
+    # e.g. created by update_lead when the follow-up was set
+    db.session.add(Notification(user_id=user.id, lead_id=lead.id, type=NotificationType.FOLLOW_UP, title='t',
+                                message='m', status=NotificationStatus.UNREAD, scheduled_for=lead.next_follow_up))
+    db.session.commit()
+
+    assert run_follow_up_pass(NOW) == {'notifications_created': 0, 'reminders_queued': 1}
+    assert run_follow_up_pass(NOW + timedelta(minutes=5)) == {'notifications_created': 0, 'reminders_queued': 0}
+
+def test_no_reminder_for_dismissed_or_moved_follow_up(db, user):
+    lead = make_lead(db, user, NOW + timedelta(hours=3))
+    run_follow_up_pass(NOW)
+
+    lead.next_follow_up = NOW + timedelta(days=2)
+    db.session.commit()
+    assert run_follow_up_pass(NOW + timedelta(hours=2, minutes=30))['reminders_queued'] == 0
+    assert reminders() == []
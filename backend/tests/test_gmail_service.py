@@ -0,0 +1,40 @@
+import threading
+from app.utils import gmail_service
+
+class SlowCredentials:
+    def __init__(self, subject, release):
+        self.subject = subject
+        self.valid = False
+        self.release = release
+        self.refreshing = threading.Event()
+
+    def refresh(self, request):
+        self.refreshing.set()
+        if self.subject == 'slow@example.com':
+            assert self.release.wait(5)
+        self.valid = True
+
+class BaseCredentials:
+    def __init__(self):
+        self.release = threading.Event()
+        self.issued = {}
+
+    def with_subject(self, subject):
+        return self.issued.setdefault(subject, SlowCredentials(subject, self.release))
+
+def test_refreshing_one_subject_does_not_block_others(monkeypatch):
+    base = BaseCredentials()
+    monkeypatch.setattr(gmail_service, '_base_credentials', base)
+    monkeypatch.setattr(gmail_service, '_delegated_credentials', {})
+
+    slow = threading.Thread(target=gmail_service._get_delegated_credentials, args=('slow@example.com',))
+    slow.start()
+    try:
+        assert base.with_subject('slow@example.com').refreshing.wait(5)
+        # Neither another sender nor the stats wait for the slow token request
+        assert gmail_service._get_delegated_credentials('fast@example.com').valid
+        gmail_service.get_gmail_stats()
+    finally:
+        base.release.set()
+        slow.join(5)
+    assert base.issued['slow@example.com'].valid
@@ -0,0 +1,20 @@
+import os
+from config import TestingConfig
+from app import create_app
+from app.utils import instrumentation
+
+def test_requests_are_not_profiled_while_another_one_is(tmp_path):
+    class ProfilingConfig(TestingConfig):
+        INSTRUMENTATION_ENABLED = True
+        INSTRUMENTATION_PROFILE_THRESHOLD_MS = 1e-6
+        INSTRUMENTATION_PROFILE_DIR = str(tmp_path)
+
+    client = create_app(ProfilingConfig).test_client()
+    with instrumentation._profiler_lock:  # as if another request were being profiled
+        assert client.get('/metrics').status_code == 200
+    assert os.listdir(tmp_path) == []
+
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics').status_code == 200
+    assert len(os.listdir(tmp_path)) == 2
+    assert not instrumentation._profiler_lock.locked()
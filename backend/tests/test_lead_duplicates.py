@@ -0,0 +1,24 @@
+from app.models.lead import Lead
+from app.models.user import User
+
+def test_duplicate_409_only_details_the_members_own_leads(app, db, user):
+    other = User(email='other@example.com', first_name='Otto', last_name='Other', role='team_member')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Lead(name='Ada', email='ada@example.com', company_name='Engines', assigned_to=user.id))
+    db.session.add(Lead(name='Cy', email='cy@example.com', company_name='Engines', assigned_to=other.id))
+    db.session.commit()
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    response = client.post('/api/leads', json={'name': 'Ada', 'email': 'ada@example.com', 'company_name': 'Engines'})
+    assert response.status_code == 409
+    assert [lead['name'] for lead in response.json['duplicates']] == ['Ada']
+    assert response.json['other_duplicates'] == 0
+
+    response = client.post('/api/leads', json={'name': 'Cy', 'email': 'cy@example.com', 'company_name': 'Engines'})
+    assert response.status_code == 409
+    assert response.json['duplicates'] == []
+    assert response.json['other_duplicates'] == 1
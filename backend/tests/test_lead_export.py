@@ -0,0 +1,31 @@
+import pytest
+from app.models.lead import Lead, EmailLog
+from app.models.user import User
+
+@pytest.fixture
+def client(app, db, user):
+    other = User(email='other@example.com', first_name='Otto', last_name='Other', role='team_member')
+    other.set_password('password')
+    db.session.add(other)
+    db.session.flush()
+    for owner, name in [(user, 'Ada'), (other, 'Cy')]:
+        lead = Lead(name=name, email=f'{name.lower()}@example.com', company_name='Engines', assigned_to=owner.id)
+        db.session.add(lead)
+        db.session.flush()
+        db.session.add(EmailLog(lead_id=lead.id, user_id=owner.id, direction='sent', subject=f'Hello {name}',
+                                content='Private pricing'))
+    db.session.commit()
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    client.other_id = other.id
+    return client
+
+def test_members_cannot_filter_to_other_owners_leads(client):
+    own = client.get('/api/leads/export').get_data(as_text=True)
+    assert 'ada@example.com' in own and 'cy@example.com' not in own
+
+    for path in ('/api/leads/export', '/api/leads/export/emails'):
+        body = client.get(path, query_string={'assigned_to': client.other_id}).get_data(as_text=True)
+        assert 'cy@example.com' not in body and 'Hello Cy' not in body
+    assert client.get('/api/leads', query_string={'assigned_to': client.other_id}).json['leads'] == []
@@ -0,0 +1,20 @@
+from app.models.lead import Lead, EmailLog
+
+def test_relabelling_an_email_changes_the_timeline_etag(app, db, user):
+    lead = Lead(name='Ada Lovelace', email='ada@example.com', company_name='Engines', assigned_to=user.id)
+    db.session.add(lead)
+    db.session.flush()
+    email = EmailLog(lead_id=lead.id, user_id=user.id, direction='received', subject='Re: hi', content='maybe later')
+    db.session.add(email)
+    db.session.commit()
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    etag = client.get(f'/api/leads/{lead.id}/timeline').headers['ETag']
+    assert client.get(f'/api/leads/{lead.id}/timeline', headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.put(f'/api/leads/{lead.id}/emails/{email.id}', json={'response_type': 'follow_up_requested'}).status_code == 200
+    response = client.get(f'/api/leads/{lead.id}/timeline', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
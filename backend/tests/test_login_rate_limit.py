@@ -0,0 +1,37 @@
+import pytest
+from config import TestingConfig
+from app import create_app, db
+from app.models.user import User
+
+class ProxiedConfig(TestingConfig):
+    TRUSTED_PROXY_COUNT = 1
+    LOGIN_RATE_LIMIT_PER_IP = 3
+    LOGIN_RATE_LIMIT_PER_EMAIL = 100
+
+@pytest.fixture
+def client():
+    app = create_app(ProxiedConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(email='owner@example.com', first_name='Olive', last_name='Owner', role='team_member')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+def login(client, password, client_ip):
+    return client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': password},
+                       headers={'X-Forwarded-For': client_ip}, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+
+def test_successful_logins_are_not_limited(client):
+    for _ in range(10):
+        assert login(client, 'password', '203.0.113.5').status_code == 200
+
+def test_failed_logins_limit_the_forwarded_client_only(client):
+    for _ in range(3):
+        assert login(client, 'wrong', '203.0.113.5').status_code == 401
+    assert login(client, 'password', '203.0.113.5').status_code == 429
+    # Same proxy, different client behind it
+    assert login(client, 'password', '198.51.100.7').status_code == 200
@@ -0,0 +1,54 @@
+from datetime import datetime
+from sqlalchemy import insert
+from app.models.notification import Notification, NotificationStatus, NotificationType
+
+def test_stream_polls_for_notifications_from_other_processes(app, db, user):
+    app.config.update(NOTIFICATION_STREAM_POLL_INTERVAL=0.01, NOTIFICATION_STREAM_HEARTBEAT=0.05,
+                      NOTIFICATION_STREAM_MAX_AGE=1)
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': user.email, 'password': 'password'}).get_json()['token']
+
+    response = client.get('/api/notifications/stream', headers={'Authorization': f'Bearer {token}'}, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    assert next(chunks) == b': heartbeat\n\n'  # connected and caught up
+
+    # As the follow-up scheduler would: a Core insert published to its own process only
+    db.session.execute(insert(Notification).values(
+        user_id=user.id, type=NotificationType.FOLLOW_UP, title='Follow-up with Ada', message='m',
+        status=NotificationStatus.UNREAD, created_at=datetime.utcnow()
+    ))
+    db.session.commit()
+
+    received = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks)
+    response.close()
+    assert b'Follow-up with Ada' in received
+
+def test_streams_over_the_per_worker_cap_get_503(app, user):
+    app.config.update(NOTIFICATION_STREAM_MAX_PER_WORKER=1, NOTIFICATION_STREAM_MAX_AGE=1)
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': user.email, 'password': 'password'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = client.get('/api/notifications/stream', headers=headers, buffered=False)
+    refused = client.get('/api/notifications/stream', headers=headers)
+    assert (refused.status_code, refused.headers['Retry-After']) == (503, '30')
+
+    first.close()  # frees the slot
+    second = client.get('/api/notifications/stream', headers=headers, buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+def test_query_string_tokens_are_stream_only(app, user):
+    app.config.update(NOTIFICATION_STREAM_MAX_AGE=0)
+    client = app.test_client()
+    session_token = client.post('/api/auth/login', json={'email': user.email, 'password': 'password'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {session_token}'}
+
+    assert client.get('/api/notifications', query_string={'jwt': session_token}).status_code == 401
+    assert client.get('/api/notifications/stream', query_string={'jwt': session_token}).status_code == 401
+
+    stream_token = client.post('/api/notifications/stream-token', headers=headers).get_json()['token']
+    response = client.get('/api/notifications/stream', query_string={'jwt': stream_token})
+    assert response.status_code == 200
+    assert client.get('/api/notifications', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
@@ -0,0 +1,98 @@
+"""The hot queries of leads.py and notifications.py must be served by indexes
+
+Each statement is built the way the route builds it and explained on the
+SQLite schema from the models; a plan line that scans a table without an
+index, or sorts in a temporary B-tree, fails the test.
+"""
+import re
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, func, select, exists, and_
+from sqlalchemy.dialects import sqlite
+from app.models.lead import Lead, Note, EmailLog, Activity
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.utils.follow_ups import find_due_follow_ups, find_due_reminders
+from app.utils.lead_query import apply_lead_filters, apply_keyset, encode_cursor
+
+NOW = datetime(2030, 1, 1, 9, 0)
+CURSOR = encode_cursor(NOW, 1000)
+
+class Admin:
+    id = 1
+    role = 'admin'
+
+class Member:
+    id = 2
+    role = 'team_member'
+
+def lead_page(args, user, cursor=None):
+    return apply_keyset(apply_lead_filters(Lead.query, args, user), cursor).limit(51).statement
+
+def lead_count(args, user):
+    return apply_lead_filters(Lead.query, args, user).with_entities(func.count(Lead.id)).statement
+
+def notification_page(status):
+    return (
+        select(Notification).where(Notification.user_id == 2, Notification.status == status)
+        .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(51)
+    )
+
+HOT_QUERIES = {
+    'leads: admin, first page': lambda: lead_page({}, Admin),
+    'leads: admin, next page': lambda: lead_page({}, Admin, CURSOR),
+    'leads: member, next page': lambda: lead_page({}, Member, CURSOR),
+    'leads: status filter': lambda: lead_page({'status': 'interested'}, Admin, CURSOR),
+    'leads: member and status': lambda: lead_page({'status': 'interested'}, Member),
+    'leads: member and created_at range': lambda: lead_page(
+        {'start_date': '2029-01-01', 'end_date': '2030-01-01'}, Member),
+    'leads: member count': lambda: lead_count({}, Member),
+    'leads: status count': lambda: lead_count({'status': 'new'}, Admin),
+    'leads: by email': lambda: select(Lead.id).where(Lead.email == 'ada@example.com'),
+    'notes: per lead': lambda: select(Note).where(Note.lead_id == 7).order_by(Note.created_at.desc()),
+    'emails: per lead': lambda: select(EmailLog).where(EmailLog.lead_id == 7).order_by(EmailLog.sent_at.desc()),
+    'activities: per lead': lambda: select(Activity).where(Activity.lead_id == 7).order_by(Activity.created_at.desc()),
+    'notifications: unread page': lambda: notification_page(NotificationStatus.UNREAD),
+    'notifications: unread count': lambda: select(func.count(Notification.id)).where(
+        Notification.user_id == 2, Notification.status == NotificationStatus.UNREAD),
+    'notifications: follow-up exists': lambda: select(exists().where(and_(
+        Notification.lead_id == 7, Notification.type == NotificationType.FOLLOW_UP,
+        Notification.scheduled_for == NOW))),
+}
+
+# Statements executed directly by the scheduler; captured from a real run
+SCHEDULER_QUERIES = {
+    'follow-ups: due leads': lambda: find_due_follow_ups(NOW, timedelta(hours=24)),
+    'follow-ups: due reminders': lambda: find_due_reminders(NOW, timedelta(minutes=60)),
+}
+
+def explain(db, statement):
+    sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+def assert_indexed(plan):
+    for line in plan:
+        # 'SCAN leads' alone is a full table scan; 'SCAN leads USING INDEX ...' walks an index in order
+        assert not re.fullmatch(r'SCAN \w+', line), plan
+        assert 'TEMP B-TREE' not in line, plan
+    assert any('USING' in line and 'INDEX' in line for line in plan), plan
+
+@pytest.mark.parametrize('name', sorted(HOT_QUERIES))
+def test_hot_query_uses_index(db, name):
+    assert_indexed(explain(db, HOT_QUERIES[name]()))
+
+@pytest.mark.parametrize('name', sorted(SCHEDULER_QUERIES))
+def test_scheduler_query_uses_index(db, name):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        SCHEDULER_QUERIES[name]()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    [(statement, parameters)] = statements
+    plan = [row[-1] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    assert_indexed(plan)
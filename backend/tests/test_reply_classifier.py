@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime
+from app.models.lead import Lead, EmailLog, ResponseTypeSource
+from app.utils.reply_classifier import classify_replies, train_from_labelled, rule_label, reply_text
+
+RECEIVED_AT = datetime(2030, 1, 1, 9, 0)
+RULE_REPLY = "sounds great, let's schedule a call"
+MODEL_REPLY = 'yes this looks useful, can we talk tomorrow'
+
+def make_lead(db, user):
+    lead = Lead(name='Ada Lovelace', email='ada@example.com', company_name='Engines', assigned_to=user.id)
+    db.session.add(lead)
+    db.session.commit()
+    return lead
+
+def test_only_rules_label_until_a_model_is_trained(app):
+    assert classify_replies([RULE_REPLY, MODEL_REPLY], [RECEIVED_AT] * 2) == [
+        ('positive', ResponseTypeSource.RULE, None),
+        (None, None, None),
+    ]
+
+def test_train_uses_manual_labels_only(app, db, user):
+    lead = make_lead(db, user)
+    client = app.test_client()
+    token = client.post('/api/auth/login', json={'email': 'owner@example.com', 'password': 'password'}).json['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    logged = client.post(f'/api/leads/{lead.id}/emails', headers=headers,
+                         json={'direction': 'received', 'subject': 'Re: hi', 'content': RULE_REPLY}).json['email']
+    assert (logged['response_type'], logged['response_type_source']) == ('positive', ResponseTypeSource.RULE)
+    db.session.add(EmailLog(lead_id=lead.id, user_id=user.id, direction='received', subject='Re: hi',
+                            content='not now', response_type='negative', response_type_source=ResponseTypeSource.MODEL))
+    db.session.commit()
+    assert train_from_labelled()[1] == 0
+
+    relabelled = client.put(f'/api/leads/{lead.id}/emails/{logged["id"]}', headers=headers,
+                            json={'response_type': 'follow_up_requested'}).json['email']
+    assert (relabelled['response_type'], relabelled['response_type_source']) == \
+        ('follow_up_requested', ResponseTypeSource.MANUAL)
+    assert client.put(f'/api/leads/{lead.id}/emails/{logged["id"]}', headers=headers,
+                      json={'response_type': 'maybe'}).status_code == 400
+
+    classifier, labelled = train_from_labelled()
+    assert labelled == 1
+    app.extensions['reply_classifier'] = classifier
+    [(_, source, _)] = classify_replies([MODEL_REPLY], [RECEIVED_AT], min_confidence=0)
+    assert source == ResponseTypeSource.MODEL
+
+@pytest.mark.parametrize('reply, label', [
+    ("Sounds great! Please don't hesitate to send me a few times that work.", 'positive'),
+    ("We're interested - no thanks needed, let's talk", 'positive'),
+    ('No thanks, we are all set.', 'negative'),
+    ("Please don't contact me again", 'negative'),
+    ('Not now, but try us again in March', 'follow_up_requested'),
+    # Mixed signals are left to the model
+    ("Sounds interesting, but we're not looking right now", None),
+    ('Happy to chat, though honestly not a fit for us', None),
+    # Auto-replies quote the message they answer
+    ('I am out of the office until Monday.\n\nRe: not interested, please remove me', 'no_response'),
+])
+def test_rule_precedence_on_mixed_signals(reply, label):
+    assert rule_label(reply_text(reply)) == label
@@ -0,0 +1,24 @@
+from sqlalchemy.dialects import postgresql
+from app.models.lead import Lead
+from app.utils import search
+
+def compiled_postgres_filter(monkeypatch, term):
+    monkeypatch.setattr(search, '_dialect', lambda bind=None: 'postgresql')
+    monkeypatch.setattr(search, 'search_index_available', lambda: True)
+    return search.search_filter(term).compile(dialect=postgresql.dialect())
+
+def test_postgres_matches_addresses_with_email_ilike(app, monkeypatch):
+    # to_tsvector('simple') keeps john@gmail.com as one lexeme; john:* & gmail:* & com:* would miss it
+    address = compiled_postgres_filter(monkeypatch, 'john@gmail.com')
+    assert str(address) == "leads.email ILIKE %(email_1)s ESCAPE '\\\\'"
+    assert address.params == {'email_1': '%john@gmail.com%'}
+
+    mixed = compiled_postgres_filter(monkeypatch, 'john 50%_off.io')
+    assert 'to_tsquery' in str(mixed)
+    assert mixed.params['email_1'] == '%50\\%\\_off.io%'
+    assert mixed.params['to_tsquery_2'] == 'john:*'
+
+def test_sqlite_search_finds_addresses(app, db, user):
+    db.session.add(Lead(name='John Smith', email='john@gmail.com', company_name='Acme', assigned_to=user.id))
+    db.session.commit()
+    assert [lead.email for lead in Lead.query.filter(search.search_filter('john@gmail.com'))] == ['john@gmail.com']
@@ -0,0 +1,22 @@
+from app.models.user import User
+
+def login(client, email):
+    token = client.post('/api/auth/login', json={'email': email, 'password': 'password'}).json['token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_only_admins_suppress_domains_or_other_reasons(app, db, user):
+    admin = User(email='admin@example.com', first_name='Ann', last_name='Admin', role='admin')
+    admin.set_password('password')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    member, admin = login(client, user.email), login(client, admin.email)
+
+    def add(headers, entries, reason):
+        return client.post('/api/suppressions', headers=headers, json={'entries': entries, 'reason': reason}).status_code
+
+    assert add(member, ['gmail.com'], 'unsubscribed') == 403
+    assert add(member, ['ada@example.com', '@gmail.com'], 'unsubscribed') == 403
+    assert add(member, ['ada@example.com'], 'manual') == 403
+    assert add(member, ['ada@example.com'], 'unsubscribed') == 201
+    assert add(admin, ['gmail.com'], 'manual') == 201
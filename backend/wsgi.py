@@ -0,0 +1,6 @@
+import os
+from app import create_app
+from config import get_config
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app(get_config(os.getenv('APP_CONFIG', 'production')))
@@ -25,6 +25,7 @@ import {
     Settings as SettingsIcon,
 } from '@mui/icons-material';
 import authService from '../services/authService';
+import leadService from '../services/leadService';
 
 const DRAWER_WIDTH = 240;
 
@@ -44,6 +45,7 @@ const Layout = () => {
 
     const handleLogout = () => {
         authService.logout();
+        leadService.clearLeadCache();
         navigate('/login');
     };
 
@@ -31,25 +31,13 @@ const ActivityLog = ({ leadId }) => {
     const fetchActivities = async () => {
         setLoading(true);
         try {
-            // Fetch emails, notes, and other activities
-            const [emails, notes] = await Promise.all([
-                leadService.getEmails(leadId),
-                leadService.getNotes(leadId),
-            ]);
-
-            // Combine and sort activities by date
-            const allActivities = [
-                ...emails.map(email => ({
-                    type: 'email',
-                    data: email,
-                    date: new Date(email.sent_at),
-                })),
-                ...notes.map(note => ({
-                    type: 'note',
-                    data: note,
-                    date: new Date(note.created_at),
-                })),
-            ].sort((a, b) => b.date - a.date);
+            // Notes, emails and activities arrive merged and sorted by the server
+            const timeline = await leadService.getTimeline(leadId, { limit: 100 });
+            const allActivities = timeline.items.map(item => ({
+                type: item.type,
+                data: item.data,
+                date: new Date(item.timestamp),
+            }));
 
             setActivities(allActivities);
         } catch (error) {
@@ -66,6 +54,8 @@ const ActivityLog = ({ leadId }) => {
                 return <EventIcon color="secondary" />;
             case 'note':
                 return <NoteIcon color="action" />;
+            case 'activity':
+                return <StatusIcon color="success" />;
             case 'status':
                 return <StatusIcon color="success" />;
             default:
@@ -101,6 +91,12 @@ const ActivityLog = ({ leadId }) => {
                         {activity.data.content}
                     </Typography>
                 );
+            case 'activity':
+                return (
+                    <Typography variant="body2">
+                        {activity.data.description}
+                    </Typography>
+                );
             default:
                 return null;
         }
@@ -86,7 +86,7 @@ const LeadEmail = () => {
             await leadService.sendEmail(id, emailData);
             setNotification({
                 open: true,
-                message: 'Email sent successfully',
+                message: 'Email queued for sending',
                 severity: 'success',
             });
             navigate(`/leads/${id}`);
@@ -47,12 +47,13 @@ const LeadList = () => {
 
     useEffect(() => {
         fetchLeads();
-    }, [searchParams]);
+    }, []);
 
+    // Only what changed since the last visit is downloaded; filters run locally
     const fetchLeads = async () => {
         try {
-            const fetchedLeads = await leadService.getLeads(searchParams);
-            setLeads(fetchedLeads);
+            const syncedLeads = await leadService.syncLeads();
+            setLeads(syncedLeads);
         } catch (error) {
             console.error('Failed to fetch leads:', error);
         } finally {
@@ -60,6 +61,29 @@ const LeadList = () => {
         }
     };
 
+    const matchesFilters = (lead) => {
+        const search = searchParams.search.trim().toLowerCase();
+        if (search && ![lead.name, lead.email, lead.company_name].some(
+            (value) => value && value.toLowerCase().includes(search)
+        )) {
+            return false;
+        }
+        if (searchParams.status && lead.status !== searchParams.status) {
+            return false;
+        }
+        if (searchParams.start_date && searchParams.end_date) {
+            const createdAt = lead.created_at.slice(0, 10);
+            if (createdAt < searchParams.start_date || createdAt > searchParams.end_date) {
+                return false;
+            }
+        }
+        return true;
+    };
+
+    const filteredLeads = leads
+        .filter(matchesFilters)
+        .sort((a, b) => (a.created_at < b.created_at ? 1 : a.created_at > b.created_at ? -1 : b.id - a.id));
+
     const handleSearchChange = (event) => {
         setSearchParams({
             ...searchParams,
@@ -210,7 +234,7 @@ const LeadList = () => {
 
                     <div style={{ height: 600, width: '100%' }}>
                         <DataGrid
-                            rows={leads}
+                            rows={filteredLeads}
                             columns={columns}
                             pageSize={10}
                             rowsPerPageOptions={[10, 25, 50]}
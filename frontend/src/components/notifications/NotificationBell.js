@@ -21,39 +21,47 @@ import notificationService from '../../services/notificationService';
 
 const NotificationBell = () => {
     const [notifications, setNotifications] = useState([]);
+    const [unreadCount, setUnreadCount] = useState(0);
     const [loading, setLoading] = useState(false);
     const [anchorEl, setAnchorEl] = useState(null);
-    const checkInterval = useRef(null);
+    const unreadCountRef = useRef(0);
+
+    useEffect(() => {
+        unreadCountRef.current = unreadCount;
+    }, [unreadCount]);
 
     useEffect(() => {
         fetchNotifications();
-        // Check for new notifications every minute
-        checkInterval.current = setInterval(checkForNewNotifications, 60000);
+        // New notifications are pushed by the server; while the stream is
+        // unavailable, poll the unread count and refetch when it changes
+        const unsubscribe = notificationService.subscribe((notification) => {
+            setNotifications((current) => [notification, ...current.filter((n) => n.id !== notification.id)]);
+            setUnreadCount((count) => count + 1);
+        }, pollUnreadCount);
 
-        return () => {
-            if (checkInterval.current) {
-                clearInterval(checkInterval.current);
-            }
-        };
+        return unsubscribe;
     }, []);
 
     const fetchNotifications = async () => {
         setLoading(true);
         try {
-            const fetchedNotifications = await notificationService.getNotifications();
-            setNotifications(fetchedNotifications);
+            const data = await notificationService.getNotifications();
+            setNotifications(data.notifications);
+            setUnreadCount(data.unread_count);
         } catch (error) {
             console.error('Failed to fetch notifications:', error);
         }
         setLoading(false);
     };
 
-    const checkForNewNotifications = async () => {
+    const pollUnreadCount = async () => {
         try {
-            await notificationService.checkFollowUps();
-            await fetchNotifications();
+            const count = await notificationService.getUnreadCount();
+            if (count !== unreadCountRef.current) {
+                await fetchNotifications();
+            }
         } catch (error) {
-            console.error('Failed to check for new notifications:', error);
+            console.error('Failed to fetch unread count:', error);
         }
     };
 
@@ -83,6 +91,15 @@ const NotificationBell = () => {
         }
     };
 
+    const handleMarkAllAsRead = async () => {
+        try {
+            await notificationService.bulkUpdate('read');
+            await fetchNotifications();
+        } catch (error) {
+            console.error('Failed to mark notifications as read:', error);
+        }
+    };
+
     const formatNotificationDate = (date) => {
         const notificationDate = new Date(date);
         if (isToday(notificationDate)) {
@@ -100,9 +117,9 @@ const NotificationBell = () => {
             <IconButton
                 color="inherit"
                 onClick={handleClick}
-                aria-label={`${notifications.length} unread notifications`}
+                aria-label={`${unreadCount} unread notifications`}
             >
-                <Badge badgeContent={notifications.length} color="error">
+                <Badge badgeContent={unreadCount} color="error">
                     <NotificationsIcon />
                 </Badge>
             </IconButton>
@@ -124,9 +141,16 @@ const NotificationBell = () => {
                 }}
             >
                 <Box sx={{ p: 2 }}>
-                    <Typography variant="h6" gutterBottom>
-                        Notifications
-                    </Typography>
+                    <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
+                        <Typography variant="h6" gutterBottom>
+                            Notifications
+                        </Typography>
+                        {unreadCount > 0 && (
+                            <Button size="small" onClick={handleMarkAllAsRead}>
+                                Mark all as read
+                            </Button>
+                        )}
+                    </Box>
                     {loading ? (
                         <Box sx={{ display: 'flex', justifyContent: 'center', p: 2 }}>
                             <CircularProgress />
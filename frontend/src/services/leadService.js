@@ -20,6 +20,44 @@ const getLeads = async (params = {}) => {
     }
 };
 
+// Local copy of the user's leads, kept current through /changes
+let leadCache = { leads: new Map(), version: null };
+
+const getChanges = async (since, params = {}) => {
+    const response = await axios.get(`${API_URL}/changes`, { params: { ...params, since } });
+    return response.data;
+};
+
+const syncLeads = async () => {
+    try {
+        let hasMore = true;
+        while (hasMore) {
+            let data;
+            try {
+                data = await getChanges(leadCache.version);
+            } catch (error) {
+                if (error.response?.status !== 410) {
+                    throw error;
+                }
+                // Too far behind for tombstones to be kept: start over
+                leadCache = { leads: new Map(), version: null };
+                continue;
+            }
+            data.deleted.lead.forEach((id) => leadCache.leads.delete(id));
+            data.leads.forEach((lead) => leadCache.leads.set(lead.id, lead));
+            leadCache.version = data.version;
+            hasMore = data.has_more;
+        }
+        return Array.from(leadCache.leads.values());
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to sync leads';
+    }
+};
+
+const clearLeadCache = () => {
+    leadCache = { leads: new Map(), version: null };
+};
+
 const getLead = async (leadId) => {
     try {
         const response = await axios.get(`${API_URL}/${leadId}`);
@@ -38,6 +76,15 @@ const updateLead = async (leadId, leadData) => {
     }
 };
 
+const bulkUpdateLeads = async (target, changes) => {
+    try {
+        const response = await axios.post(`${API_URL}/bulk`, { ...target, changes });
+        return response.data;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to update leads';
+    }
+};
+
 const addNote = async (leadId, content) => {
     try {
         const response = await axios.post(`${API_URL}/${leadId}/notes`, { content });
@@ -74,6 +121,15 @@ const getEmails = async (leadId) => {
     }
 };
 
+const getTimeline = async (leadId, params = {}) => {
+    try {
+        const response = await axios.get(`${API_URL}/${leadId}/timeline`, { params });
+        return response.data;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to fetch timeline';
+    }
+};
+
 const searchLeads = async (searchParams) => {
     try {
         const response = await axios.get(API_URL, { params: searchParams });
@@ -83,6 +139,24 @@ const searchLeads = async (searchParams) => {
     }
 };
 
+const getDuplicates = async (params = {}) => {
+    try {
+        const response = await axios.get(`${API_URL}/duplicates`, { params });
+        return response.data;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to fetch duplicate leads';
+    }
+};
+
+const mergeLeads = async (leadIds) => {
+    try {
+        const response = await axios.post(`${API_URL}/merge`, { lead_ids: leadIds });
+        return response.data;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to merge leads';
+    }
+};
+
 const sendEmail = async (leadId, emailData) => {
     try {
         const response = await axios.post(`${API_URL}/${leadId}/send-email`, emailData);
@@ -95,13 +169,20 @@ const sendEmail = async (leadId, emailData) => {
 const leadService = {
     createLead,
     getLeads,
+    getChanges,
+    syncLeads,
+    clearLeadCache,
     getLead,
     updateLead,
+    bulkUpdateLeads,
     addNote,
     getNotes,
     logEmail,
     getEmails,
+    getTimeline,
     searchLeads,
+    getDuplicates,
+    mergeLeads,
     sendEmail
 };
 
@@ -2,10 +2,11 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:5000/api/notifications';
 
-const getNotifications = async (status = 'unread') => {
+// Returns { notifications, next_cursor, unread_count }
+const getNotifications = async (status = 'unread', params = {}) => {
     try {
-        const response = await axios.get(API_URL, { params: { status } });
-        return response.data.notifications;
+        const response = await axios.get(API_URL, { params: { status, ...params } });
+        return response.data;
     } catch (error) {
         throw error.response?.data?.error || 'Failed to fetch notifications';
     }
@@ -29,6 +30,26 @@ const dismissNotification = async (notificationId) => {
     }
 };
 
+// action is 'read' or 'dismiss'; pass ids = null to apply it to every notification
+const bulkUpdate = async (action, ids = null) => {
+    try {
+        const body = ids ? { action, ids } : { action, all: true };
+        const response = await axios.put(`${API_URL}/bulk`, body);
+        return response.data;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to update notifications';
+    }
+};
+
+const getUnreadCount = async () => {
+    try {
+        const response = await axios.get(`${API_URL}/unread-count`);
+        return response.data.unread_count;
+    } catch (error) {
+        throw error.response?.data?.error || 'Failed to fetch unread count';
+    }
+};
+
 const checkFollowUps = async () => {
     try {
         const response = await axios.get(`${API_URL}/check-follow-ups`);
@@ -38,11 +59,97 @@ const checkFollowUps = async () => {
     }
 };
 
+// Reopen delays after a stream error, doubling up to the maximum, with jitter
+// so tabs refused together (503 when a worker has no free stream slots) do
+// not retry together
+const STREAM_RETRY_MS = 3000;
+const STREAM_RETRY_MAX_MS = 30000;
+// While the stream is down, e.g. refused for want of slots, onPoll runs this often
+const STREAM_POLL_MS = 60000;
+
+// Stream tokens are short-lived and only accepted by /stream, so the session
+// token never appears in a URL
+const getStreamToken = async () => {
+    const response = await axios.post(`${API_URL}/stream-token`);
+    return response.data.token;
+};
+
+// Opens a Server-Sent Events stream. EventSource would reconnect with the
+// same, by then expired, token, so every error closes it and it is reopened
+// here with a fresh token from the last event id. Stops when the session
+// itself is no longer valid. onPoll, if given, is called every STREAM_POLL_MS
+// from the first error until the stream opens again, so callers can poll instead.
+const subscribe = (onNotification, onPoll = null) => {
+    let source = null;
+    let retryTimer = null;
+    let pollTimer = null;
+    let retryMs = STREAM_RETRY_MS;
+    let lastEventId = null;
+    let stopped = false;
+
+    const stopPolling = () => {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    const retry = () => {
+        if (onPoll && !pollTimer) {
+            pollTimer = setInterval(onPoll, STREAM_POLL_MS);
+        }
+        retryTimer = setTimeout(open, retryMs * (0.5 + Math.random()));
+        retryMs = Math.min(retryMs * 2, STREAM_RETRY_MAX_MS);
+    };
+
+    const open = async () => {
+        let token;
+        try {
+            token = await getStreamToken();
+        } catch (error) {
+            if (error.response?.status === 401) {
+                stopPolling();
+            } else if (!stopped) {
+                retry();
+            }
+            return;
+        }
+        if (stopped) {
+            return;
+        }
+        const since = lastEventId ? `&last_event_id=${encodeURIComponent(lastEventId)}` : '';
+        source = new EventSource(`${API_URL}/stream?jwt=${encodeURIComponent(token)}${since}`);
+        source.onopen = () => {
+            retryMs = STREAM_RETRY_MS;
+            stopPolling();
+        };
+        source.addEventListener('notification', (event) => {
+            lastEventId = event.lastEventId || lastEventId;
+            onNotification(JSON.parse(event.data));
+        });
+        source.onerror = () => {
+            source.close();
+            retry();
+        };
+    };
+
+    open();
+    return () => {
+        stopped = true;
+        clearTimeout(retryTimer);
+        stopPolling();
+        if (source) {
+            source.close();
+        }
+    };
+};
+
 const notificationService = {
     getNotifications,
     markAsRead,
     dismissNotification,
+    bulkUpdate,
+    getUnreadCount,
     checkFollowUps,
+    subscribe,
 };
 
 export default notificationService; 
\ No newline at end of file